@@ -1,9 +1,14 @@
+import json
 import os
+import shutil
 import tempfile
 from unittest import mock
 import pytest
 from vidtoolz.cli import main
 import threading
+import time
+import subprocess
+import sys
 
 # Define if we're running in GitHub Actions
 IN_GITHUB_ACTIONS = os.environ.get("GITHUB_ACTIONS") == "true"
@@ -24,6 +29,102 @@ def test_plugins(capsys):
         assert "vidtoolz.default_plugins.reverse" in captured.out
 
 
+def test_load_plugins_does_not_import_moviepy():
+    """Loading the default plugins should not pull in MoviePy"""
+    code = (
+        "import sys; from vidtoolz.plugins import load_plugins; load_plugins(); "
+        "print('moviepy' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_plugin_index_is_reused(tmp_path, monkeypatch):
+    """The entry point index is rebuilt once and then reused"""
+    from vidtoolz import plugins
+
+    monkeypatch.setenv("VIDTOOLZ_CACHE_DIR", str(tmp_path))
+    assert plugins.read_plugin_index() is None
+
+    entries = plugins.build_plugin_index()
+    assert os.path.exists(tmp_path / plugins.PLUGIN_INDEX_FILE)
+    assert plugins.read_plugin_index() == entries
+
+    plugins.invalidate_plugin_index()
+    assert plugins.read_plugin_index() is None
+
+
+def test_plugins_rebuild_index_registers_new_plugins(tmp_path, monkeypatch, capsys):
+    """plugins --rebuild-index lists plugins the stale index didn't know about"""
+    from vidtoolz import plugins
+
+    monkeypatch.setenv("VIDTOOLZ_CACHE_DIR", str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "vidtoolz_fake_plugin.py").write_text(
+        "from vidtoolz.hookspecs import hookimpl\n\n"
+        "@hookimpl\ndef register_commands(subparser):\n    pass\n"
+    )
+    entry = {
+        "name": "fake",
+        "value": "vidtoolz_fake_plugin",
+        "dist": "vidtoolz-fake",
+        "version": "1.0",
+    }
+    monkeypatch.setattr(plugins, "build_plugin_index", lambda: [entry])
+    try:
+        with mock.patch("sys.argv", ["vidtoolz", "plugins", "--rebuild-index"]):
+            main()
+        captured = capsys.readouterr()
+        assert "- vidtoolz-fake (version: 1.0)" in captured.out
+        assert "Plugin index: rebuilt" in captured.out
+    finally:
+        if plugins.pm.get_plugin("fake"):
+            plugins.pm.unregister(name="fake")
+        plugins.plugin_distinfo.pop("fake", None)
+
+
+def test_profile_startup_json(capsys):
+    """--profile-startup reports the startup stages as JSON on stderr"""
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "--profile-startup", "--profile-format", "json", "plugins"],
+    ):
+        main()
+        captured = capsys.readouterr()
+        report = json.loads(captured.err)
+        stages = [s["stage"] for s in report["stages"]]
+        assert "argparse construction" in stages
+        assert "register_commands vidtoolz.default_plugins.info" in stages
+        assert "Installed Plugins:" in captured.out
+
+
+def test_ffmpeg_state_is_cached(tmp_path, monkeypatch):
+    """ffmpeg is probed once and then served from the state cache"""
+    from vidtoolz import utils
+
+    monkeypatch.setenv("VIDTOOLZ_CACHE_DIR", str(tmp_path))
+    assert utils.ensure_ffmpeg_available()
+    state = utils.load_ffmpeg_state()
+    assert state["ffmpeg"]["path"]
+
+    with mock.patch("vidtoolz.utils.subprocess.run") as run:
+        assert utils.ensure_ffmpeg_available()
+        run.assert_not_called()
+
+
+def test_parse_ffmpeg_encoders():
+    from vidtoolz.utils import parse_ffmpeg_list
+
+    output = (
+        "Encoders:\n V..... = Video\n ------\n"
+        " V....D libx264              libx264 H.264\n"
+        " A....D aac                  AAC (Advanced Audio Coding)\n"
+    )
+    assert parse_ffmpeg_list("encoders", output) == {"libx264", "aac"}
+
+
 def test_invalid_command():
     with mock.patch("sys.argv", ["vidtoolz", "invalid_command"]):
         with pytest.raises(SystemExit) as e:
@@ -44,6 +145,55 @@ def test_info_plugin(capsys):
         assert "Duration" in captured.out or "duration" in captured.out.lower()
 
 
+def test_info_plugin_bulk_jsonl(capsys):
+    """info probes a directory and reports per-file failures as JSON lines"""
+    with mock.patch(
+        "sys.argv", ["vidtoolz", "info", "tests/test_data", "missing.mp4", "-j", "2"]
+    ):
+        main()
+        captured = capsys.readouterr()
+
+    records = {
+        r["path"]: r for r in map(json.loads, captured.out.strip().splitlines())
+    }
+    assert records["tests/test_data/test.mp4"]["width"] == 1920
+    assert records["tests/test_data/Hello-World.mp4"]["duration"] == 10.0
+    assert "error" in records["missing.mp4"]
+    assert "Probed 3 files, 1 failed." in captured.err
+
+
+def test_info_uses_media_cache(capsys, tmp_path, monkeypatch):
+    """A second info call on an unchanged file is served from the cache"""
+    monkeypatch.setenv("VIDTOOLZ_CACHE_DIR", str(tmp_path))
+    test_video = "tests/test_data/test.mp4"
+    for _ in range(2):
+        with mock.patch("sys.argv", ["vidtoolz", "info", test_video]):
+            main()
+
+    with mock.patch("sys.argv", ["vidtoolz", "cache"]):
+        main()
+    captured = capsys.readouterr()
+    assert "hits:    1" in captured.out
+    assert "misses:  1" in captured.out
+
+    with mock.patch("sys.argv", ["vidtoolz", "cache", "--prune"]):
+        main()
+    assert "Pruned 0 stale entries." in capsys.readouterr().out
+
+
+def test_fast_probe():
+    """fast_probe returns a typed result with the commonly needed fields"""
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    probe = fast_probe("tests/test_data/Hello-World.mp4", keyframes=True)
+    assert (probe.width, probe.height) == (1920, 1080)
+    assert probe.duration == 10.0
+    assert probe.fps == 60.0
+    assert probe.video_codec == "h264"
+    assert probe.has_audio
+    assert probe.keyframe_interval > 0
+
+
 def test_clip_plugin():
     """Test the clip plugin with test video data"""
     test_video = "tests/test_data/Hello-World.mp4"
@@ -211,6 +361,70 @@ def test_reverse_plugin():
         if os.path.exists(output_file):
             os.unlink(output_file)
 
+def test_reverse_plugin_segmented(tmp_path):
+    """segmented reverse keeps the full duration"""
+    test_video = "tests/test_data/Hello-World.mp4"
+    output_file = str(tmp_path / "reversed.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "reverse",
+            test_video,
+            output_file,
+            "-m",
+            "segmented",
+            "--segment-seconds",
+            "3",
+            "-j",
+            "2",
+        ],
+    ):
+        main()
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    probe = fast_probe(output_file)
+    assert 9.5 < probe.duration < 10.5
+    assert probe.has_audio
+    streams = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,duration"]
+        + ["-of", "csv=p=0", output_file],
+        capture_output=True,
+        text=True,
+    )
+    durations = dict(line.split(",") for line in streams.stdout.split())
+    # The audio is encoded once, so chunk boundaries add no priming gaps
+    assert abs(float(durations["audio"]) - float(durations["video"])) < 0.03
+
+
+def test_reverse_segment_seconds():
+    from vidtoolz.default_plugins.ffmpegtools import (
+        VideoProbe,
+        reverse_segment_seconds,
+    )
+
+    short_sd = VideoProbe(
+        path="a.mp4", duration=30, width=640, height=360, fps=30, pix_fmt="yuv420p"
+    )
+    assert reverse_segment_seconds(short_sd) is None
+
+    long_hd = VideoProbe(
+        path="b.mp4", duration=3600, width=1920, height=1080, fps=60, pix_fmt="yuv420p"
+    )
+    seconds = reverse_segment_seconds(long_hd)
+    assert 1 <= seconds < 10
+
+    # Chunks reversed at the same time share the budget
+    long_720p = VideoProbe(
+        path="c.mp4", duration=3600, width=1280, height=720, fps=30, pix_fmt="yuv420p"
+    )
+    seconds = reverse_segment_seconds(long_720p)
+    assert reverse_segment_seconds(long_720p, jobs=4) == pytest.approx(seconds / 4)
+    assert reverse_segment_seconds(short_sd, jobs=4) is None
+
+
 @pytest.mark.skipif(IN_GITHUB_ACTIONS, reason="It is slow in GITHUB so skipping it")
 def test_reverse_plugin_moviepy():
     test_video = "tests/test_data/Hello-World.mp4"
@@ -233,6 +447,8 @@ def test_reverse_plugin_moviepy():
 
         assert os.path.exists(output_file)
         assert os.path.getsize(output_file) > 0
+        # MoviePy's temporary audio file doesn't land in the current directory
+        assert not [f for f in os.listdir(".") if "TEMP_MPY_" in f]
 
     finally:
         if os.path.exists(output_file):
@@ -252,6 +468,547 @@ def test_play_plugin(capsys):
         assert True
 
 
+def test_batch_plugin(capsys, tmp_path):
+    """batch runs a command for every input and writes to the output dir"""
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "batch",
+            "-i",
+            "tests/test_data/test.mp4",
+            "missing.mp4",
+            "-o",
+            str(tmp_path),
+            "clip",
+            "-d",
+            "1",
+        ],
+    ):
+        main()
+        captured = capsys.readouterr()
+
+    assert os.path.exists(tmp_path / "test_clip.mp4")
+    assert "[failed] missing.mp4" in captured.out
+    assert "1 succeeded, 1 failed" in captured.out
+
+
+def test_batch_plan_workers():
+    from vidtoolz.resources import plan_workers
+
+    assert plan_workers(cpus=16) == (4, 4)
+    assert plan_workers(jobs=3, cpus=16) == (3, 5)
+    assert plan_workers(jobs=8, cpus=2) == (2, 1)
+
+
+def test_thread_caps_are_built_into_commands(monkeypatch):
+    """Thread caps are set once per input and output, at the lower of both caps"""
+    from vidtoolz.default_plugins.ffmpegtools import (
+        concat_filter_command,
+        ffmpeg_threads,
+        run_ffmpeg,
+    )
+
+    monkeypatch.setenv("VIDTOOLZ_FFMPEG_THREADS", "2")
+    assert ffmpeg_threads() == 2
+    assert ffmpeg_threads(3) == 2
+    assert ffmpeg_threads(1) == 1
+
+    cmd = concat_filter_command(["a b.mp4", "c.mp4"], "out.mp4", threads=3)
+    assert cmd.count("-threads 2 -i ") == 2
+    assert cmd.count("-threads") == 3
+
+    code, log = run_ffmpeg("-version", threads=3)
+    assert log.count("-filter_threads 2 ") == 1
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Limits are applied on POSIX only")
+def test_resource_policy_applied_to_children(monkeypatch):
+    """The resource policy from the environment limits child processes"""
+    from vidtoolz.default_plugins.ffmpegtools import run_command
+    from vidtoolz.resources import current_policy
+
+    monkeypatch.setenv("VIDTOOLZ_NICE", "5")
+    monkeypatch.setenv("VIDTOOLZ_MEMORY_LIMIT", "2G")
+    monkeypatch.setenv("VIDTOOLZ_CPUS", "0")
+    policy = current_policy()
+    assert policy.describe() == "cpus=0 nice=5 memory=2.0G"
+
+    base_nice = os.nice(0)
+    code, out, err = run_command("nice; ulimit -v")
+    assert code == 0
+    nice, limit = out.split()
+    assert int(nice) == min(base_nice + 5, 19)
+    assert int(limit) == 2 * 1024 * 1024
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Reads the affinity from /proc"
+)
+def test_resource_policy_applied_from_worker_threads(monkeypatch):
+    """Limits reach children started concurrently from a thread pool"""
+    from vidtoolz.default_plugins.ffmpegtools import run_command
+    from vidtoolz.utils import bounded_map
+
+    monkeypatch.setenv("VIDTOOLZ_NICE", "3")
+    monkeypatch.setenv("VIDTOOLZ_CPUS", "0")
+    base_nice = os.nice(0)
+    command = "nice; grep Cpus_allowed_list /proc/self/status"
+    for _, result, error in bounded_map(lambda _: run_command(command), range(8), 4):
+        assert error is None
+        code, out, err = result
+        assert code == 0
+        nice, _, cpus = out.split()
+        assert int(nice) == min(base_nice + 3, 19)
+        assert cpus == "0"
+
+
+def test_run_ffmpeg_reports_progress(tmp_path):
+    """run_ffmpeg streams progress reports to the callback"""
+    from vidtoolz.default_plugins.ffmpegtools import run_ffmpeg
+
+    test_video = "tests/test_data/Hello-World.mp4"
+    output_file = str(tmp_path / "out.mp4")
+    reports = []
+    code, log = run_ffmpeg(
+        f'-i "{test_video}" -t 2 -y "{output_file}"', progress=reports.append
+    )
+
+    assert code == 0
+    assert reports[-1].done
+    assert reports[-1].frame > 0
+    assert 1.9 < reports[-1].out_time < 2.1
+    assert reports[-1].duration == 10.0
+
+
+def test_progress_display_and_ffmpeg_log(tmp_path, monkeypatch, capsys):
+    """--progress draws a status line, --ffmpeg-log keeps the full stderr"""
+    from vidtoolz.progress import set_progress_handler
+
+    test_video = "tests/test_data/Hello-World.mp4"
+    log_file = tmp_path / "ffmpeg.log"
+    monkeypatch.setenv("VIDTOOLZ_FFMPEG_LOG", str(log_file))
+
+    try:
+        with mock.patch(
+            "sys.argv",
+            [
+                "vidtoolz",
+                "--progress",
+                "--ffmpeg-log",
+                str(log_file),
+                "clip",
+                test_video,
+                str(tmp_path / "clip.mp4"),
+                "-d",
+                "2",
+            ],
+        ):
+            main()
+    finally:
+        set_progress_handler(None)
+
+    err = capsys.readouterr().err
+    assert "ETA" in err
+    assert "time=" in err
+    assert "Stream mapping" in log_file.read_text()
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="Needs a named pipe")
+def test_watchdog_aborts_stalled_ffmpeg(tmp_path, monkeypatch):
+    """A run that stops making progress is killed by the watchdog"""
+    from vidtoolz.default_plugins.ffmpegtools import run_ffmpeg
+
+    # Nothing ever writes to the pipe, so FFmpeg waits on it forever
+    fifo = str(tmp_path / "never")
+    os.mkfifo(fifo)
+    monkeypatch.setenv("VIDTOOLZ_STALL_TIMEOUT", "2")
+
+    start = time.monotonic()
+    code, log = run_ffmpeg(f'-f s16le -i "{fifo}" -f null -y "{tmp_path / "out"}"')
+    assert code == -1
+    assert "No progress for 2s" in log
+    assert time.monotonic() - start < 30
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/proc") or not hasattr(os, "mkfifo"),
+    reason="Needs /proc and a named pipe",
+)
+def test_watchdog_counts_input_read(tmp_path, monkeypatch):
+    """A run that reads input but buffers its output isn't a stall"""
+    from vidtoolz.default_plugins.ffmpegtools import run_ffmpeg
+
+    fifo = str(tmp_path / "slow")
+    os.mkfifo(fifo)
+    monkeypatch.setenv("VIDTOOLZ_STALL_TIMEOUT", "2")
+
+    def feed():
+        # 6s of trickled input; areverse outputs nothing until the end
+        with open(fifo, "wb") as f:
+            for _ in range(30):
+                f.write(b"\0" * 4096)
+                f.flush()
+                time.sleep(0.2)
+
+    writer = threading.Thread(target=feed)
+    writer.start()
+    code, log = run_ffmpeg(
+        f'-f s16le -ar 8000 -ac 1 -i "{fifo}" -af areverse -f null -y "{tmp_path / "out"}"'
+    )
+    writer.join()
+    assert code == 0, log
+
+
+def test_watchdog_rejects_bad_setting(tmp_path, monkeypatch):
+    from vidtoolz.default_plugins.ffmpegtools import scale_video
+    from vidtoolz.progress import Watchdog
+
+    monkeypatch.setenv("VIDTOOLZ_STALL_TIMEOUT", "2m")
+    with pytest.raises(ValueError, match="VIDTOOLZ_STALL_TIMEOUT must be a number"):
+        Watchdog.from_environment()
+
+    output_file = str(tmp_path / "scaled.mp4")
+    code, log, _ = scale_video("tests/test_data/test.mp4", 320, output_path=output_file)
+    assert code == -1
+    assert "VIDTOOLZ_STALL_TIMEOUT must be a number >= 0" in log
+
+
+def test_watchdog_deadline_from_measured_speed():
+    from vidtoolz.progress import FFmpegProgress, Watchdog
+
+    watchdog = Watchdog(stall_timeout=None, deadline_factor=2)
+    # 10s of a 100s input encoded in the first 20s: 200s expected
+    watchdog.start -= 20
+    watchdog.update(FFmpegProgress(frame=300, out_time=10.0, duration=100.0))
+    assert watchdog.deadline == pytest.approx(watchdog.start + 400)
+    assert watchdog.check() is None
+
+    watchdog.deadline = time.monotonic() - 1
+    assert "Exceeded deadline of" in watchdog.check()
+
+
+def test_metrics_jsonl(tmp_path, monkeypatch):
+    """--metrics records the cost of every FFmpeg/FFprobe run"""
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("VIDTOOLZ_METRICS", str(metrics_file))
+    output_file = str(tmp_path / "scaled.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "--metrics",
+            str(metrics_file),
+            "scale",
+            "tests/test_data/test.mp4",
+            output_file,
+            "320",
+        ],
+    ):
+        main()
+
+    records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    ffmpeg = [r for r in records if r["command"].startswith("ffmpeg")][-1]
+    assert ffmpeg["returncode"] == 0
+    assert ffmpeg["wall_seconds"] > 0
+    assert ffmpeg["input_duration"] == 3.0
+    assert ffmpeg["output_bytes"] == os.path.getsize(output_file)
+    assert ffmpeg["frames"] == 180
+    assert ffmpeg["fps"] > 0 and ffmpeg["realtime_factor"] > 0
+    if hasattr(os, "wait4"):
+        assert ffmpeg["user_cpu_seconds"] > 0
+        assert ffmpeg["peak_rss_bytes"] > 1024 * 1024
+
+
+@pytest.mark.parametrize("mode", ["smart", "copy"])
+def test_clip_plugin_modes(tmp_path, mode):
+    """smart cuts are exact, copy cuts start on a keyframe"""
+    test_video = "tests/test_data/Hello-World.mp4"
+    output_file = str(tmp_path / f"{mode}.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "clip", test_video, output_file, "-s", "1", "-e", "9", "-m", mode],
+    ):
+        main()
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    duration = fast_probe(output_file).duration
+    if mode == "smart":
+        assert 7.5 < duration < 8.5
+    else:
+        assert duration > 7.5
+
+
+def test_clip_plugin_smart_decodes(tmp_path):
+    """smart cut copied GOPs decode with the source's parameter sets"""
+    # CAVLC and B-frames: the edges would get other SPS/PPS by default
+    source = str(tmp_path / "source.mp4")
+    subprocess.run(
+        "ffmpeg -v error -f lavfi -i testsrc2=s=320x240:r=25:d=10 "
+        "-f lavfi -i sine=d=10 -c:v libx264 -profile:v main "
+        "-x264-params cabac=0:keyint=50:bframes=2 -c:a aac -shortest "
+        f"{source}",
+        shell=True,
+        check=True,
+    )
+    output_file = str(tmp_path / "smart.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "clip", source, output_file, "-s", "1", "-e", "9", "-m", "smart"],
+    ):
+        main()
+
+    decode = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", output_file, "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    assert decode.returncode == 0
+    assert decode.stderr == ""
+
+    frames = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=nb_frames", "-of", "csv=p=0", output_file,
+        ],
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert 195 <= int(frames) <= 205
+
+    # Compare frame by frame with an accurate re-encode of the range
+    reference = str(tmp_path / "reference.mkv")
+    subprocess.run(
+        f"ffmpeg -v error -ss 1 -i {source} -t 8 -an -c:v libx264 -crf 10 {reference}",
+        shell=True,
+        check=True,
+    )
+    psnr = subprocess.run(
+        ["ffmpeg", "-i", output_file, "-i", reference, "-lavfi", "[0:v][1:v]psnr", "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    ).stderr
+    assert float(psnr.rsplit("min:", 1)[1].split()[0]) > 30
+
+
+@pytest.mark.parametrize("mode", ["reencode", "copy"])
+def test_clip_plugin_ranges(tmp_path, mode):
+    """clip --ranges cuts every range of the file"""
+    test_video = "tests/test_data/Hello-World.mp4"
+    ranges_file = tmp_path / "ranges.txt"
+    ranges_file.write_text(
+        "# highlights\n1 3\n0:04 +2 intro\n\n6 9 outro#2.mp4  # the ending\n"
+    )
+    output_dir = tmp_path / "clips"
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "clip",
+            test_video,
+            str(output_dir),
+            "--ranges",
+            str(ranges_file),
+            "-m",
+            mode,
+        ],
+    ):
+        main()
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    outputs = sorted(os.listdir(output_dir))
+    assert outputs == ["Hello-World_clip001.mp4", "intro.mp4", "outro#2.mp4"]
+    if mode == "reencode":
+        assert 1.8 < fast_probe(str(output_dir / "intro.mp4")).duration < 2.2
+        assert 2.8 < fast_probe(str(output_dir / "outro#2.mp4")).duration < 3.2
+
+
+def test_parse_ranges_duplicate_names(tmp_path):
+    """ranges that would write the same file are rejected"""
+    from vidtoolz.default_plugins.ffmpegtools import parse_ranges, range_output_paths
+
+    ranges_file = tmp_path / "ranges.txt"
+    ranges_file.write_text("1 3 intro\n4 6 outro\n7 9 intro\n")
+    with pytest.raises(ValueError, match="ranges.txt:3: name intro is already used"):
+        parse_ranges(str(ranges_file))
+
+    ranges = [(1, 3, "intro"), (4, 6, "intro.mp4")]
+    with pytest.raises(ValueError, match="both be written to"):
+        range_output_paths("talk.mp4", ranges)
+
+
+def test_speed_plugin_parallel(tmp_path, capsys):
+    """parallel speed change keeps audio and reports each chunk"""
+    test_video = "tests/test_data/Hello-World.mp4"
+    output_file = str(tmp_path / "fast.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "speed", test_video, output_file, "2", "--chunks", "3", "-j", "2"],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert "chunk00000 encoded in" in out
+    assert "audio encoded in" in out
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    probe = fast_probe(output_file)
+    assert 4.5 < probe.duration < 5.5
+    assert probe.has_audio
+
+
+def test_speed_plugin_copy(tmp_path, capsys):
+    """copy mode retimes without re-encoding and falls back when it can't"""
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    test_video = "tests/test_data/test.mp4"
+    output_file = str(tmp_path / "fast.mp4")
+
+    with mock.patch(
+        "sys.argv", ["vidtoolz", "speed", test_video, output_file, "2", "-m", "copy"]
+    ):
+        main()
+
+    probe = fast_probe(output_file)
+    assert 1.4 < probe.duration < 1.6
+    assert probe.has_audio
+    frames = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0"]
+        + ["-show_entries", "stream=nb_frames", "-of", "csv=p=0", output_file],
+        capture_output=True,
+        text=True,
+    )
+    # Every frame is kept, at twice the rate
+    assert int(frames.stdout.strip()) == 180
+    assert "Stream copy not possible" not in capsys.readouterr().out
+
+    # GIF can't hold the H.264 stream, so the video is re-encoded
+    gif_file = str(tmp_path / "fast.gif")
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "speed", test_video, gif_file, "4", "-m", "copy", "-a", "mute"],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert "Stream copy not possible (Could not write header" in out
+    assert f"Video speed changed and saved to {gif_file}" in out
+    assert os.path.getsize(gif_file) > 0
+
+
+def test_speed_plugin_timelapse(tmp_path, capsys):
+    """timelapse decodes only keyframes when they are dense enough"""
+    from vidtoolz.default_plugins.ffmpegtools import (
+        fast_probe,
+        timelapse_blend_frames,
+        timelapse_skip_frame,
+    )
+
+    assert timelapse_skip_frame(100, 30, 2.0) == "nokey"
+    assert timelapse_skip_frame(32, 30, 10.0) == "noref"
+    assert timelapse_skip_frame(2, 30, 10.0) is None
+    # Blending spans output frame intervals: 20 source frames each, or two
+    # keyframes each when one is decoded per second at 10 fps
+    assert timelapse_blend_frames(1, 20, 10) == 20
+    assert timelapse_blend_frames(2, 20, 10, 1.0, "nokey") == 4
+    assert timelapse_blend_frames(100, 100, 30) == 1024
+
+    test_video = str(tmp_path / "capture.mp4")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=s=160x120:r=10:d=60"]
+        + ["-c:v", "libx264", "-g", "10", "-y", test_video],
+        check=True,
+    )
+    output_file = str(tmp_path / "timelapse.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "speed", test_video, output_file, "20"]
+        + ["-m", "timelapse", "--blend", "2"],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert "decoding keyframes only" in out
+    assert "Timelapse drops the audio (audio mode adjust ignored)" in out
+    probe = fast_probe(output_file)
+    assert 2.8 < probe.duration < 3.2
+    assert probe.fps == 10
+    assert not probe.has_audio
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "speed", test_video, output_file, "20", "-m", "timelapse", "-p"],
+    ):
+        main()
+    assert "doesn't encode in parallel chunks" in capsys.readouterr().out
+
+
+def test_chain_plugin(tmp_path):
+    """chain applies clip, scale and speed in one pass"""
+    test_video = "tests/test_data/Hello-World.mp4"
+    output_file = str(tmp_path / "chained.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "chain",
+            test_video,
+            output_file,
+            "--clip",
+            "2",
+            "+4",
+            "--scale",
+            "320",
+            "-2",
+            "--speed",
+            "2",
+        ],
+    ):
+        main()
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    probe = fast_probe(output_file)
+    assert probe.width == 320
+    assert 1.8 < probe.duration < 2.2
+
+
+def test_compile_chain_leading_clip_is_input_seek():
+    from vidtoolz.default_plugins.ffmpegtools import compile_chain
+
+    input_opts, video_filter, audio_filter = compile_chain(
+        [
+            ("clip", {"start": 10, "end": 30}),
+            ("clip", {"start": 5, "duration": 5}),
+            ("speed", {"speed": 4}),
+            ("clip", {"start": 1}),
+        ]
+    )
+    assert input_opts == "-ss 15.0 -t 5.0 "
+    assert video_filter == "setpts=0.25*PTS,trim=start=1.0,setpts=PTS-STARTPTS"
+    assert audio_filter == "atempo=2.0,atempo=2.0,atrim=start=1.0,asetpts=PTS-STARTPTS"
+
+    # A second clip is relative to the first and can't reach past its end
+    input_opts, _, _ = compile_chain(
+        [("clip", {"start": 10, "end": 30}), ("clip", {"start": 5, "end": 40})]
+    )
+    assert input_opts == "-ss 15.0 -t 15.0 "
+    with pytest.raises(ValueError, match="past the end"):
+        compile_chain(
+            [("clip", {"start": 10, "end": 30}), ("clip", {"start": 25, "end": 40})]
+        )
+
+
 def test_speed_plugin():
     """Test the speed plugin with test video data"""
     test_video = "tests/test_data/Hello-World.mp4"
@@ -578,6 +1335,141 @@ def test_overlay_without_duration_still_works():
             os.unlink(output_file)
 
 
+def test_concat_plugin_smart(tmp_path, capsys):
+    """smart concat re-encodes only the input that doesn't match"""
+    test_video1 = "tests/test_data/Hello-World.mp4"
+    test_video2 = "tests/test_data/test.mp4"
+    small_silent = str(tmp_path / "small.mp4")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", test_video2, "-vf", "scale=640:-2", "-an", small_silent],
+        check=True,
+    )
+    output_file = str(tmp_path / "merged.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "ffconcat",
+            test_video1,
+            small_silent,
+            test_video2,
+            "-m",
+            "smart",
+            "-o",
+            output_file,
+        ],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert f"Normalizing {small_silent}" in out
+    assert "width 640 != 1920" in out
+    assert "Normalizing tests/test_data/test.mp4" not in out
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    probe = fast_probe(output_file)
+    assert probe.width == 1920
+    assert probe.has_audio
+    assert 15.5 < probe.duration < 16.5
+
+    # --no-fast would contradict the mode, so the two can't be combined
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "ffconcat", test_video1, test_video2, "-m", "smart", "--no-fast"],
+    ):
+        with pytest.raises(SystemExit):
+            main()
+    assert "not allowed with argument" in capsys.readouterr().err
+
+
+def test_concat_plugin_smart_decodes(tmp_path, capsys):
+    """smart concat output decodes with every input's parameter sets"""
+    sources = {}
+    for name, seconds, x264 in [
+        ("cavlc", 2, "-profile:v main -x264-params cabac=0:keyint=50:bframes=2"),
+        ("cabac", 2, "-profile:v main"),
+        ("high", 5, "-profile:v high"),
+    ]:
+        sources[name] = str(tmp_path / f"{name}.mp4")
+        subprocess.run(
+            f"ffmpeg -v error -f lavfi -i testsrc2=s=320x240:r=25:d={seconds} "
+            f"-f lavfi -i sine=d={seconds} -c:v libx264 {x264} "
+            f"-c:a aac -ar 44100 -ac 1 -shortest {sources[name]}",
+            shell=True,
+            check=True,
+        )
+    # The main profile covers 8s against 5s only when repeats are counted
+    inputs = [sources[n] for n in ("cavlc", "cabac", "cavlc", "cavlc", "high")]
+    output_file = str(tmp_path / "merged.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "ffconcat", *inputs, "-m", "smart", "-o", output_file],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert f"Normalizing {sources['high']}" in out
+    assert f"Normalizing {sources['cavlc']}" not in out
+
+    decode = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", output_file, "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    assert decode.returncode == 0
+    assert decode.stderr == ""
+
+    # Copied inputs decode to exactly the frames of the source files
+    def frame_hashes(path):
+        framemd5 = subprocess.run(
+            f"ffmpeg -v error -i {path} -an -fps_mode passthrough -f framemd5 -",
+            shell=True,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        lines = [line for line in framemd5.splitlines() if not line.startswith("#")]
+        return [line.split(",")[-1].strip() for line in lines]
+
+    merged = frame_hashes(output_file)
+    copied = [frame_hashes(path) for path in inputs[:4]]
+    assert merged[: sum(map(len, copied))] == [h for hashes in copied for h in hashes]
+    assert len(merged) == sum(map(len, copied)) + 125
+
+
+def test_concat_plugin_tree(tmp_path, capsys):
+    """re-encoding more inputs than the group size merges them in groups"""
+    input_list = tmp_path / "inputs.txt"
+    input_list.write_text("tests/test_data/test.mp4\n" * 5)
+    output_file = str(tmp_path / "merged.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "ffconcat",
+            "-i",
+            str(input_list),
+            "--no-fast",
+            "--group-size",
+            "2",
+            "-o",
+            output_file,
+        ],
+    ):
+        main()
+
+    out = capsys.readouterr().out
+    assert "Merged group 3 (1 inputs)" in out
+
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe
+
+    assert 14.5 < fast_probe(output_file).duration < 15.5
+
+
 def test_concat_with_input_list_file():
     """Test ffconcat plugin with input list file"""
     test_video1 = "tests/test_data/Hello-World.mp4"
@@ -683,3 +1575,352 @@ def test_concat_with_no_input_files():
     ):
         main()
         # Should not crash, just print error message
+
+
+def test_encoding_profiles(tmp_path, monkeypatch, capsys):
+    """--profile selects a built-in or config-defined encoding profile"""
+    from vidtoolz.profiles import available_profiles, encoding_args, get_profile
+
+    config_file = tmp_path / "config.json"
+    config_file.write_text(
+        json.dumps({"profiles": {"preview": {"base": "draft", "crf": 35}}})
+    )
+    monkeypatch.setenv("VIDTOOLZ_CONFIG", str(config_file))
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("VIDTOOLZ_METRICS", str(metrics_file))
+
+    profiles = available_profiles()
+    assert {"draft", "balanced", "archive", "preview"} <= set(profiles)
+    assert profiles["preview"].preset == "ultrafast"
+    assert profiles["preview"].crf == 35
+    assert encoding_args(None) == ""
+    with pytest.raises(ValueError, match="Unknown profile"):
+        get_profile("nope")
+
+    output_file = str(tmp_path / "preview.mp4")
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "scale",
+            "tests/test_data/test.mp4",
+            output_file,
+            "320",
+            "--profile",
+            "preview",
+        ],
+    ):
+        main()
+
+    assert os.path.getsize(output_file) > 0
+    records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    command = [r for r in records if r["command"].startswith("ffmpeg")][-1]["command"]
+    assert "-c:v libx264 -preset ultrafast -crf 35 -tune fastdecode" in command
+    assert "-c:a aac -b:a 96k" in command
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "scale",
+            "tests/test_data/test.mp4",
+            output_file,
+            "320",
+            "--profile",
+            "nope",
+        ],
+    ):
+        main()
+    assert "Unknown profile 'nope'" in capsys.readouterr().out
+
+
+def test_overlay_layers_single_pass(tmp_path, monkeypatch):
+    """--layer composites extra videos and images in the same FFmpeg run"""
+    background_video = "tests/test_data/test.mp4"
+    logo = str(tmp_path / "logo.png")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "color=red:s=32x32"]
+        + ["-frames:v", "1", "-y", logo],
+        check=True,
+    )
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("VIDTOOLZ_METRICS", str(metrics_file))
+    output_file = str(tmp_path / "layers.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "ffoverlay",
+            background_video,
+            "tests/test_data/Hello-World.mp4",
+            output_file,
+            "-n",
+            "0.25",
+            "0.25",
+            "-d",
+            "1",
+            "--layer",
+            logo,
+            "position=BottomRight",
+            "scale=64x64",
+            "start=1",
+            "duration=1.5",
+            "fade=0",
+        ],
+    ):
+        main()
+
+    records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    # One FFmpeg run; inputs are probed at most for their audio streams
+    runs = [r["command"] for r in records if r["command"].startswith("ffmpeg")]
+    assert len(runs) == 1
+    assert all("stream=width" not in r["command"] for r in records if r not in runs)
+    command = runs[0]
+    assert "normalize=0" in command
+    assert '-t 1.0 -i "tests/test_data/Hello-World.mp4"' in command
+    assert f'-t 1.5 -loop 1 -i "{logo}"' in command
+    assert "scale2ref=w=main_w*0.25:h=main_h*0.25" in command
+
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0"]
+        + ["-show_entries", "stream=width,height:format=duration", "-of", "json"]
+        + [output_file],
+        capture_output=True,
+        text=True,
+    )
+    info = json.loads(probe.stdout)
+    assert (info["streams"][0]["width"], info["streams"][0]["height"]) == (1920, 1080)
+    assert 2.9 < float(info["format"]["duration"]) < 3.2
+
+
+def test_overlay_layers_without_audio(tmp_path, capsys):
+    """silent inputs are left out of the audio mix"""
+    silent_background = str(tmp_path / "silent.mp4")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", "tests/test_data/test.mp4", "-an"]
+        + ["-c:v", "copy", silent_background],
+        check=True,
+    )
+    output_file = str(tmp_path / "layers.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "ffoverlay",
+            silent_background,
+            silent_background,
+            output_file,
+            "-s",
+            "320",
+            "180",
+            "--layer",
+            "tests/test_data/Hello-World.mp4",
+            "position=BottomRight",
+            "scale=320x180",
+            "start=1",
+            "duration=1",
+        ],
+    ):
+        main()
+
+    assert "saved to" in capsys.readouterr().out
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type:format=duration"]
+        + ["-of", "json", output_file],
+        capture_output=True,
+        text=True,
+    )
+    info = json.loads(probe.stdout)
+    assert [s["codec_type"] for s in info["streams"]] == ["video", "audio"]
+    assert 2.9 < float(info["format"]["duration"]) < 3.2
+
+    with mock.patch(
+        "sys.argv",
+        [
+            "vidtoolz",
+            "ffoverlay",
+            silent_background,
+            silent_background,
+            output_file,
+            "--layer",
+            silent_background,
+            "position=Middle",
+        ],
+    ):
+        main()
+    assert "Invalid layer position 'Middle', expected one of TopLeft" in capsys.readouterr().out
+
+
+def test_thumbnails_plugin(tmp_path, capsys):
+    """thumbnails writes contact sheets and images, one or many videos"""
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe, sheet_layout
+
+    assert sheet_layout(12) == (4, 3)
+    assert sheet_layout(5, columns=2) == (2, 3)
+
+    test_video = "tests/test_data/Hello-World.mp4"
+    sheet_file = str(tmp_path / "sheet.jpg")
+    # Keyframes are ~4s apart: 2 frames come from keyframe seeks, 6 from one decode
+    with mock.patch(
+        "sys.argv", ["vidtoolz", "thumbnails", test_video, "-o", sheet_file, "-n", "2"]
+    ):
+        main()
+    sheet = fast_probe(sheet_file)
+    assert (sheet.width, sheet.height) == (2 * 320 + 4 + 8, 180 + 8)
+
+    images_dir = tmp_path / "images"
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "thumbnails", test_video, "-o", str(images_dir), "-n", "6"]
+        + ["--images", "-w", "160"],
+    ):
+        main()
+    assert sorted(os.listdir(images_dir)) == [f"thumb_00{i}.jpg" for i in range(1, 7)]
+
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "more").mkdir()
+    for name in ("a.mp4", "b.mp4", "more/a.mp4"):
+        shutil.copy("tests/test_data/test.mp4", library / name)
+    capsys.readouterr()
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "thumbnails", str(library), "-o", str(tmp_path / "sheets")]
+        + ["-m", "scene", "-j", "2"],
+    ):
+        main()
+    # Same name from another directory gets a number instead of overwriting
+    assert sorted(os.listdir(tmp_path / "sheets")) == [
+        "a_2_sheet.jpg",
+        "a_sheet.jpg",
+        "b_sheet.jpg",
+    ]
+    assert "Thumbnails done: 3 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def test_thumbnails_many_frames_single_input(tmp_path):
+    """beyond THUMBNAIL_SEEK_INPUTS frames come from one input"""
+    from vidtoolz.default_plugins.ffmpegtools import (
+        THUMBNAIL_SEEK_INPUTS,
+        extract_thumbnails,
+        thumbnail_command,
+    )
+
+    test_video = str(tmp_path / "capture.mp4")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=s=160x120:r=10:d=60"]
+        + ["-c:v", "libx264", "-g", "10", "-y", test_video],
+        check=True,
+    )
+    count = THUMBNAIL_SEEK_INPUTS + 6
+    scenes = [(2.0 * i, 2.0 * i + 2) for i in range(count)]
+
+    with mock.patch(
+        "vidtoolz.default_plugins.ffmpegtools.scene_ranges", return_value=scenes
+    ):
+        for mode in ("even", "scene"):
+            command = thumbnail_command(test_video, "out.jpg", count, mode, threads=2)
+            assert command.split().count("-i") == 1
+            # The decoder and the encoder are both capped
+            assert command.count("-threads 2 ") == 2
+            images_dir = str(tmp_path / mode)
+            code, log, _ = extract_thumbnails(
+                test_video, images_dir, count, mode, width=80, sheet=False
+            )
+            assert code == 0, log
+            assert len(os.listdir(images_dir)) == count
+
+
+def test_scene_index(tmp_path, monkeypatch, capsys):
+    """scenes are analyzed once, reused by clip and dropped when the file changes"""
+    from vidtoolz.default_plugins.ffmpegtools import fast_probe, scene_changes
+    from vidtoolz.mediacache import get_media_cache
+
+    monkeypatch.setenv("VIDTOOLZ_CACHE_DIR", str(tmp_path / "cache"))
+    test_video = str(tmp_path / "scenes.mp4")
+    # Three 3 second scenes, with no keyframes at the cuts
+    subprocess.run(
+        ["ffmpeg", "-v", "error"]
+        + ["-f", "lavfi", "-i", "testsrc=s=320x240:r=25:d=3"]
+        + ["-f", "lavfi", "-i", "smptebars=s=320x240:r=25:d=3"]
+        + ["-f", "lavfi", "-i", "mandelbrot=s=320x240:r=25"]
+        + ["-filter_complex", "[2:v]trim=duration=3[m];[0:v][1:v][m]concat=n=3[v]"]
+        + ["-map", "[v]", "-c:v", "libx264", "-g", "250", "-sc_threshold", "0"]
+        + ["-y", test_video],
+        check=True,
+    )
+
+    with mock.patch("sys.argv", ["vidtoolz", "scenes", test_video]):
+        main()
+    out = capsys.readouterr().out
+    assert f"3 scenes in {test_video}" in out
+    assert get_media_cache().get(test_video, kind="scenes@0.3") is not None
+
+    with mock.patch(
+        "vidtoolz.default_plugins.ffmpegtools.detect_scenes",
+        side_effect=AssertionError("analyzed again"),
+    ):
+        clips_dir = tmp_path / "clips"
+        clips_dir.mkdir()
+        with mock.patch(
+            "sys.argv",
+            ["vidtoolz", "clip", test_video, str(clips_dir), "--scenes", "2-3"],
+        ):
+            main()
+        assert sorted(os.listdir(clips_dir)) == [
+            "scenes_scene002.mp4",
+            "scenes_scene003.mp4",
+        ]
+        assert 2.8 < fast_probe(str(clips_dir / "scenes_scene003.mp4")).duration < 3.1
+
+        with mock.patch(
+            "sys.argv",
+            ["vidtoolz", "clip", test_video, str(tmp_path / "snapped.mp4")]
+            + ["-s", "2.5", "-e", "5.5", "--snap"],
+        ):
+            main()
+        assert "Snapped to scene boundaries: 3.0" in capsys.readouterr().out
+
+        # Both ends snap to the cut at 3s
+        with mock.patch(
+            "sys.argv",
+            ["vidtoolz", "clip", test_video, str(tmp_path / "empty.mp4")]
+            + ["-s", "2.5", "-e", "3.4", "--snap"],
+        ):
+            main()
+        assert "Snapping leaves nothing to clip: 3.0" in capsys.readouterr().out
+        assert not os.path.exists(tmp_path / "empty.mp4")
+
+    with mock.patch(
+        "sys.argv",
+        ["vidtoolz", "clip", test_video, str(clips_dir), "--scenes", "2"]
+        + ["--ranges", "ranges.txt"],
+    ):
+        with pytest.raises(SystemExit):
+            main()
+    assert "not allowed with argument" in capsys.readouterr().err
+
+    from vidtoolz.default_plugins.ffmpegtools import VideoProbe, scene_ranges
+
+    with mock.patch(
+        "vidtoolz.default_plugins.ffmpegtools.fast_probe",
+        return_value=VideoProbe(path=test_video),
+    ):
+        with pytest.raises(ValueError, match="Unknown duration"):
+            scene_ranges(test_video)
+
+    # The index entry is ignored once the file changes
+    stat = os.stat(test_video)
+    os.utime(test_video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert get_media_cache().get(test_video, kind="scenes@0.3") is None
+    from vidtoolz.default_plugins.ffmpegtools import run_ffmpeg
+
+    with mock.patch(
+        "vidtoolz.default_plugins.ffmpegtools.run_ffmpeg", wraps=run_ffmpeg
+    ) as run:
+        assert len(scene_changes(test_video, threads=2)) == 2
+    # The analysis stays within its share of the CPUs
+    assert "-threads 2 " in run.call_args.args[0]
+    assert run.call_args.kwargs["threads"] == 2
@@ -0,0 +1,171 @@
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from functools import partial, lru_cache
+
+from .progress import set_progress_handler
+from .resources import plan_workers
+from .utils import bounded_map, iter_media_files
+
+# Suffix each default command appends to the input name for its output
+BATCH_SUFFIXES = {
+    "clip": "clip",
+    "scale": "scaled",
+    "speed": "speed",
+    "reverse": "reversed",
+    "ffoverlay": "overlay",
+    "chain": "chain",
+}
+
+# Commands that make no sense once per input file
+NOT_BATCHABLE = (
+    "batch",
+    "plugins",
+    "install",
+    "cache",
+    "play",
+    "ffconcat",
+    # Take directories and run their own jobs
+    "thumbnails",
+    "scenes",
+)
+
+
+def iter_batch_inputs(inputs, input_list):
+    """Yield input files from paths/globs/directories and a list file."""
+    if inputs:
+        yield from iter_media_files(inputs)
+    if input_list:
+        with open(input_list, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+
+def batch_output_path(input_file, output_dir, suffix):
+    name, ext = os.path.splitext(os.path.basename(input_file))
+    return os.path.join(output_dir, f"{name}_{suffix}{ext or '.mp4'}")
+
+
+@lru_cache(maxsize=1)
+def worker_parser():
+    # Imported here, cli imports this module
+    from .cli import build_parser
+
+    return build_parser()
+
+
+def run_batch_job(command, command_args, output_dir, suffix, threads, input_file):
+    """
+    Run one subcommand on input_file inside a worker process. Returns
+    (return code, output path, captured output, seconds).
+    """
+    os.environ["VIDTOOLZ_FFMPEG_THREADS"] = str(threads)
+    # Output is captured per job, so no live progress from the workers
+    set_progress_handler(None)
+    output_path = None
+    if output_dir:
+        output_path = batch_output_path(input_file, output_dir, suffix)
+
+    captured = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(captured), redirect_stderr(captured):
+        try:
+            args = worker_parser().parse_args([command, input_file] + command_args)
+            if output_path and hasattr(args, "output_file"):
+                args.output_file = output_path
+            code = args.func(args)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+    elapsed = time.perf_counter() - start
+    return code or 0, output_path, captured.getvalue(), elapsed
+
+
+def run_batch(
+    command,
+    command_args,
+    inputs=None,
+    input_list=None,
+    output_dir=None,
+    suffix=None,
+    jobs=None,
+):
+    """
+    Run `vidtoolz <command> <input> <command_args>` for every input on a
+    process pool and print a summary. Returns (succeeded, failed).
+    """
+    jobs, threads = plan_workers(jobs)
+    suffix = suffix or BATCH_SUFFIXES.get(command, command)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Running {command} with {jobs} workers, {threads} FFmpeg threads each")
+
+    job = partial(
+        run_batch_job, command, list(command_args), output_dir, suffix, threads
+    )
+    succeeded = failed = 0
+    input_bytes = 0
+    start = time.perf_counter()
+    for input_file, result, error in bounded_map(
+        job, iter_batch_inputs(inputs, input_list), jobs, executor=ProcessPoolExecutor
+    ):
+        if error is not None:
+            code, output_path, log, elapsed = 1, None, str(error), 0.0
+        else:
+            code, output_path, log, elapsed = result
+
+        if code == 0:
+            succeeded += 1
+            try:
+                input_bytes += os.path.getsize(input_file)
+            except OSError:
+                pass
+            target = f" -> {output_path}" if output_path else ""
+            print(f"[ok] {input_file}{target} ({elapsed:.1f}s)")
+        else:
+            failed += 1
+            lines = log.strip().splitlines()
+            reason = lines[-1] if lines else f"return code {code}"
+            print(f"[failed] {input_file}: {reason}")
+        sys.stdout.flush()
+
+    total = time.perf_counter() - start
+    done = succeeded + failed
+    print(
+        f"Batch finished: {succeeded} succeeded, {failed} failed in {total:.1f}s "
+        f"({done / total if total else 0:.2f} files/s, "
+        f"{input_bytes / total / 1e6 if total else 0:.1f} MB/s input)"
+    )
+    return succeeded, failed
+
+
+def batch_command(args):
+    if args.subcommand in NOT_BATCHABLE:
+        print(f"Error: {args.subcommand} can't be run with batch.")
+        return 1
+    if not (args.inputs or args.input_list):
+        print("Error: No inputs provided. Use -i/--inputs or -l/--input-list.")
+        return 1
+
+    try:
+        succeeded, failed = run_batch(
+            args.subcommand,
+            args.command_args,
+            inputs=args.inputs,
+            input_list=args.input_list,
+            output_dir=args.output_dir,
+            suffix=args.suffix,
+            jobs=args.jobs,
+        )
+        return 1 if failed else 0
+
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return 1
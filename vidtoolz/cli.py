@@ -1,4 +1,9 @@
+from .batch import batch_command
 from .plugins import pm, get_plugins, load_plugins, install_plugin
+from .metrics import add_metrics_arguments, apply_metrics_arguments
+from .profiling import profiler
+from .progress import add_progress_arguments, apply_progress_arguments
+from .resources import add_resource_arguments, apply_resource_arguments, current_policy
 from .utils import ensure_ffmpeg_available
 import argparse
 
@@ -30,36 +35,148 @@ def install_cmd(args):
     )
 
 
-def main():
-    # Ensure FFmpeg is available before doing anything else
-    ensure_ffmpeg_available()
-
-    parser = argparse.ArgumentParser(
-        description="Video Tools for editing videos using python",
-        formatter_class=CustomHelpFormatter,
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report time and memory spent in each startup stage (on stderr)",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=["table", "json"],
+        default="table",
+        help="Format of the --profile-startup report",
     )
-    parser.set_defaults(func=show_help)
-
-    subparser = parser.add_subparsers(dest="command")
 
-    # add plugins command
-    pugs_p = subparser.add_parser("plugins", description="Get all listed plugins")
-    pugs_p.set_defaults(func=get_plugins)
 
-    install_parser = subparser.add_parser(
-        "install", description="Install plugins in the same environemnt as vidtoolz"
-    )
-    install_parser.add_argument("-u", "--upgrade", action="store_true")
-    install_parser.add_argument("-e", "--editable", help="Edit mode for packages")
-    install_parser.add_argument("-fr", "--force-reinstall", action="store_true")
-    install_parser.add_argument("-ncd", "--no-cache-dir", action="store_true")
-    install_parser.add_argument("packages", nargs="+")
-    install_parser.set_defaults(func=install_cmd)
+def startup_options():
+    # The profiler has to be switched on before the plugins are loaded,
+    # which is before the full parser exists.
+    pre_parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_profile_arguments(pre_parser)
+    options, _ = pre_parser.parse_known_args()
+    return options
+
+
+def register_commands(subparser):
+    if not profiler.enabled:
+        pm.hook.register_commands(subparser=subparser)
+        return
+
+    # Call each implementation separately, in the order pluggy would
+    for impl in reversed(pm.hook.register_commands.get_hookimpls()):
+        with profiler.stage(f"register_commands {impl.plugin_name}"):
+            impl.function(subparser=subparser)
+
+
+def build_parser():
+    with profiler.stage("argparse construction"):
+        parser = argparse.ArgumentParser(
+            description="Video Tools for editing videos using python",
+            formatter_class=CustomHelpFormatter,
+            # Abbreviations would make the subcommands' --profile
+            # ambiguous with --profile-startup/--profile-format
+            allow_abbrev=False,
+        )
+        parser.set_defaults(func=show_help)
+        add_profile_arguments(parser)
+        add_resource_arguments(parser)
+        add_progress_arguments(parser)
+        add_metrics_arguments(parser)
+
+        subparser = parser.add_subparsers(dest="command")
+
+        # add plugins command
+        pugs_p = subparser.add_parser("plugins", description="Get all listed plugins")
+        pugs_p.add_argument(
+            "--rebuild-index",
+            action="store_true",
+            help="Rescan installed packages for plugins and rebuild the plugin index",
+        )
+        pugs_p.set_defaults(func=get_plugins, needs_ffmpeg=False)
+
+        install_parser = subparser.add_parser(
+            "install", description="Install plugins in the same environemnt as vidtoolz"
+        )
+        install_parser.add_argument("-u", "--upgrade", action="store_true")
+        install_parser.add_argument("-e", "--editable", help="Edit mode for packages")
+        install_parser.add_argument("-fr", "--force-reinstall", action="store_true")
+        install_parser.add_argument("-ncd", "--no-cache-dir", action="store_true")
+        install_parser.add_argument("packages", nargs="+")
+        install_parser.set_defaults(func=install_cmd, needs_ffmpeg=False)
+
+        batch_parser = subparser.add_parser(
+            "batch", description="Run a command over many input files in parallel"
+        )
+        batch_parser.add_argument(
+            "-i",
+            "--inputs",
+            nargs="+",
+            help="Input files, glob patterns or directories (searched recursively)",
+        )
+        batch_parser.add_argument(
+            "-l",
+            "--input-list",
+            help="Text file with one input path per line",
+        )
+        batch_parser.add_argument(
+            "-o",
+            "--output-dir",
+            help="Directory for the outputs (default: next to each input)",
+        )
+        batch_parser.add_argument(
+            "-s",
+            "--suffix",
+            help="Suffix for output names in --output-dir (default: per command)",
+        )
+        batch_parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="Concurrent jobs (default: one per 4 available CPUs)",
+        )
+        batch_parser.add_argument("subcommand", help="Command to run, e.g. scale")
+        batch_parser.add_argument(
+            "command_args",
+            nargs=argparse.REMAINDER,
+            help="Arguments passed to the command after the input file",
+        )
+        batch_parser.set_defaults(func=batch_command)
 
     load_plugins()
 
-    pm.hook.register_commands(subparser=subparser)
-    args = parser.parse_args()
+    register_commands(subparser)
+    return parser
+
+
+def main():
+    options = startup_options()
+    if options.profile_startup:
+        profiler.enable()
+
+    parser = build_parser()
+
+    try:
+        with profiler.stage("parse_args"):
+            args = parser.parse_args()
+
+        apply_resource_arguments(args)
+        apply_progress_arguments(args)
+        apply_metrics_arguments(args)
+        try:
+            current_policy()
+        except ValueError as e:
+            parser.error(f"invalid resource limit: {e}")
+
+        # Ensure FFmpeg is available before running anything that uses it.
+        # Commands opt out with set_defaults(needs_ffmpeg=False).
+        if args.command and getattr(args, "needs_ffmpeg", True):
+            with profiler.stage("ensure_ffmpeg_available"):
+                ensure_ffmpeg_available()
+    finally:
+        if options.profile_startup:
+            profiler.report(options.profile_format)
+            profiler.disable()
 
     if args.command:
         args.func(args)
@@ -0,0 +1,39 @@
+import json
+import os
+from functools import lru_cache
+
+
+def config_path():
+    """
+    Path of the user config file: VIDTOOLZ_CONFIG, else
+    $XDG_CONFIG_HOME/vidtoolz/config.json (~/.config by default).
+    """
+    path = os.environ.get("VIDTOOLZ_CONFIG")
+    if path:
+        return path
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return os.path.join(base, "vidtoolz", "config.json")
+
+
+@lru_cache(maxsize=None)
+def read_config(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"[Config Error] Could not read {path}: {e}")
+        return {}
+
+
+def load_config():
+    """Return the user config as a dict (empty if there is none)."""
+    return read_config(config_path())
+
+
+def config_section(name):
+    section = load_config().get(name) or {}
+    return section if isinstance(section, dict) else {}
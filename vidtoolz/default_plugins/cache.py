@@ -0,0 +1,46 @@
+from vidtoolz.hookspecs import hookimpl
+from vidtoolz.mediacache import get_media_cache, NullCache
+
+
+@hookimpl
+def register_commands(subparser):
+    cache_parser = subparser.add_parser(
+        "cache", description="Show, prune or clear the video metadata cache"
+    )
+    action = cache_parser.add_mutually_exclusive_group()
+    action.add_argument(
+        "--prune",
+        action="store_true",
+        help="Remove entries for files that were deleted or changed",
+    )
+    action.add_argument(
+        "--clear", action="store_true", help="Remove all entries and counters"
+    )
+    cache_parser.set_defaults(func=cache_command, needs_ffmpeg=False)
+
+
+def cache_command(args):
+    cache = get_media_cache()
+    if isinstance(cache, NullCache):
+        print("Media cache is disabled (VIDTOOLZ_NO_MEDIA_CACHE is set).")
+        return
+
+    try:
+        if args.prune:
+            removed = cache.prune()
+            print(f"Pruned {removed} stale entries.")
+        elif args.clear:
+            cache.clear()
+            print("Media cache cleared.")
+
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = 100.0 * stats["hits"] / lookups if lookups else 0.0
+        print(f"Media cache: {cache.path}")
+        print(f"  entries: {stats['entries']}")
+        print(f"  hits:    {stats['hits']}")
+        print(f"  misses:  {stats['misses']}")
+        print(f"  hit rate: {hit_rate:.1f}%")
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,99 @@
+from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
+import argparse
+from .ffmpegtools import chain_video
+
+
+class AppendOperation(argparse.Action):
+    """Collect operations in the order they appear on the command line."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        operations = list(getattr(namespace, "operations", None) or [])
+        name = self.dest
+        if name == "clip":
+            start, end = values
+            if end.startswith("+"):
+                params = {"start": start, "duration": end[1:]}
+            else:
+                params = {"start": start, "end": end}
+        elif name == "scale":
+            params = {"width": values[0], "height": values[1]}
+        elif name == "speed":
+            params = {"speed": values}
+        else:
+            params = {}
+        operations.append((name, params))
+        namespace.operations = operations
+
+
+@hookimpl
+def register_commands(subparser):
+    chain_parser = subparser.add_parser(
+        "chain",
+        description="Clip, scale, speed up and reverse in one FFmpeg pass",
+    )
+    chain_parser.add_argument("input_file", help="Path to the input video file")
+    chain_parser.add_argument(
+        "output_file", nargs="?", help="Path to the output video file (optional)"
+    )
+    chain_parser.add_argument(
+        "--clip",
+        nargs=2,
+        metavar=("START", "END"),
+        action=AppendOperation,
+        help="Keep START to END (seconds, MM:SS or HH:MM:SS); END as +DURATION is relative",
+    )
+    chain_parser.add_argument(
+        "--scale",
+        nargs=2,
+        type=int,
+        metavar=("WIDTH", "HEIGHT"),
+        action=AppendOperation,
+        help="Scale to WIDTH x HEIGHT (-2 keeps the aspect ratio)",
+    )
+    chain_parser.add_argument(
+        "--speed", type=float, action=AppendOperation, help="Speed factor"
+    )
+    chain_parser.add_argument(
+        "--reverse", nargs=0, action=AppendOperation, help="Reverse video and audio"
+    )
+    chain_parser.add_argument(
+        "-a",
+        "--audio-mode",
+        choices=["adjust", "mute"],
+        default="adjust",
+        help="Audio handling mode: adjust (default) or mute",
+    )
+    add_encoding_profile_argument(chain_parser)
+    chain_parser.set_defaults(func=chain_video_command, operations=None)
+
+
+def chain_video_command(args):
+    try:
+        if not args.operations:
+            print("Error: No operations given. Use --clip, --scale, --speed or --reverse.")
+            return 1
+
+        code, log, output_path = chain_video(
+            args.input_file,
+            args.operations,
+            output_path=args.output_file,
+            audio_mode=args.audio_mode,
+            profile=args.profile,
+        )
+
+        if code == 0:
+            steps = " -> ".join(name for name, _ in args.operations)
+            print(f"Video processed ({steps}) and saved to {output_path}")
+        else:
+            print(f"Error processing video. Return code: {code}")
+            print("FFmpeg output:")
+            print(log)
+        return code
+
+    except FileNotFoundError:
+        print(f"Error: Input file {args.input_file} not found.")
+        return 1
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return 1
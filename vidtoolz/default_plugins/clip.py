@@ -1,7 +1,18 @@
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
 import argparse
 import os
-from .ffmpegtools import clip_video, convert_to_seconds
+from .ffmpegtools import (
+    SCENE_THRESHOLD,
+    clip_ranges,
+    clip_video,
+    convert_to_seconds,
+    fast_probe,
+    parse_ranges,
+    parse_scene_numbers,
+    scene_ranges,
+    snap_time,
+)
 
 
 @hookimpl
@@ -9,7 +20,9 @@ def register_commands(subparser):
     clip_parser = subparser.add_parser("clip", description="Clip a video file")
     clip_parser.add_argument("input_file", help="Path to the input video file")
     clip_parser.add_argument(
-        "output_file", nargs="?", help="Path to the output video file (optional)"
+        "output_file",
+        nargs="?",
+        help="Path to the output video file, or the output directory with --ranges (optional)",
     )
 
     # Time arguments
@@ -23,21 +36,97 @@ def register_commands(subparser):
         "-d", "--duration", help="Duration to clip (seconds or MM:SS or HH:MM:SS)"
     )
 
+    clip_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=["reencode", "copy", "smart"],
+        default="reencode",
+        help="reencode: exact, re-encodes the range (default). "
+        "copy: no re-encoding, starts on the nearest keyframe. "
+        "smart: exact, re-encodes only the edges of the range",
+    )
+
+    # Both cut several clips, each from its own list
+    clip_list = clip_parser.add_mutually_exclusive_group()
+    clip_list.add_argument(
+        "-r",
+        "--ranges",
+        help='File with one "START END [NAME]" range per line (END as +DURATION '
+        "is relative). All ranges are cut in a few FFmpeg runs",
+    )
+
+    scene_group = clip_parser.add_argument_group(
+        "scenes", "Use the scene index (see the scenes command)"
+    )
+    clip_list.add_argument(
+        "--scenes",
+        metavar="NUMBERS",
+        help='Cut whole scenes, e.g. "3" or "2-4,7", one clip each; '
+        "OUTPUT_FILE is the output directory",
+    )
+    scene_group.add_argument(
+        "--snap",
+        nargs="?",
+        type=float,
+        const=float("inf"),
+        metavar="SECONDS",
+        help="Move start and end (or every range) to the nearest scene "
+        "boundary, optionally only if it is within SECONDS",
+    )
+    scene_group.add_argument(
+        "--scene-threshold",
+        type=float,
+        default=SCENE_THRESHOLD,
+        help=f"Scene change score (0-1) of the scene index (default: {SCENE_THRESHOLD})",
+    )
+
+    add_encoding_profile_argument(clip_parser)
+
     clip_parser.set_defaults(func=clip_video_command)
 
 
+def scene_boundaries(args):
+    scenes = scene_ranges(args.input_file, args.scene_threshold)
+    return [start for start, _ in scenes] + [scenes[-1][1]] if scenes else []
+
+
+def snap(args, boundaries, time_value):
+    tolerance = None if args.snap == float("inf") else args.snap
+    return snap_time(time_value, boundaries, tolerance)
+
+
 def clip_video_command(args):
+    if args.ranges or args.scenes:
+        return clip_ranges_command(args)
+
     try:
         start = convert_to_seconds(args.start) if args.start else None
         end = convert_to_seconds(args.end) if args.end else None
         duration = convert_to_seconds(args.duration) if args.duration else None
 
+        if args.snap is not None:
+            boundaries = scene_boundaries(args)
+            if duration is not None and end is None:
+                end, duration = (start or 0) + duration, None
+            if start is not None:
+                start = snap(args, boundaries, start)
+            if end is None:
+                end = fast_probe(args.input_file).duration
+            end = snap(args, boundaries, end)
+            if end <= (start or 0):
+                raise ValueError(
+                    f"Snapping leaves nothing to clip: {start or 0:.3f} - {end:.3f}"
+                )
+            print(f"Snapped to scene boundaries: {start or 0:.3f} - {end:.3f}")
+
         code, log, output_path = clip_video(
             args.input_file,
             start=start,
             end=end,
             duration=duration,
             output_path=args.output_file,
+            mode=args.mode,
+            profile=args.profile,
         )
 
         if code == 0:
@@ -46,8 +135,71 @@ def clip_video_command(args):
             print(f"Error clipping video. Return code: {code}")
             print("FFmpeg output:")
             print(log)
+        return code
 
     except FileNotFoundError:
         print(f"Error: Input file {args.input_file} not found.")
+        return 1
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return 1
+
+
+def select_scenes(args):
+    """Ranges of the scenes picked with --scenes, named after their number."""
+    scenes = scene_ranges(args.input_file, args.scene_threshold)
+    name, ext = os.path.splitext(os.path.basename(args.input_file))
+    ranges = []
+    for number in parse_scene_numbers(args.scenes):
+        if number > len(scenes):
+            raise ValueError(f"There are only {len(scenes)} scenes")
+        start, end = scenes[number - 1]
+        ranges.append((start, end, f"{name}_scene{number:03d}{ext}"))
+    return ranges
+
+
+def clip_ranges_command(args):
+    try:
+        if args.scenes:
+            ranges = select_scenes(args)
+        else:
+            ranges = parse_ranges(args.ranges)
+        if not ranges:
+            print(f"Error: No ranges found in {args.ranges}.")
+            return 1
+
+        if args.snap is not None and not args.scenes:
+            boundaries = scene_boundaries(args)
+            ranges = [
+                (snap(args, boundaries, start), snap(args, boundaries, end), name)
+                for start, end, name in ranges
+            ]
+            ranges = [(start, end, name) for start, end, name in ranges if end > start]
+            if not ranges:
+                print("Error: Snapping leaves no range with anything to clip.")
+                return 1
+
+        code, log, outputs = clip_ranges(
+            args.input_file,
+            ranges,
+            output_dir=args.output_file,
+            mode=args.mode,
+            profile=args.profile,
+        )
+
+        if code == 0:
+            print(f"{len(outputs)} clips saved:")
+            for output_path in outputs:
+                print(f"  {output_path}")
+        else:
+            print(f"Error clipping video. Return code: {code}")
+            print("FFmpeg output:")
+            print(log)
+        return code
+
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
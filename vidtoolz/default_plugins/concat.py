@@ -1,6 +1,7 @@
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
 import argparse
-from .ffmpegtools import concat_videos
+from .ffmpegtools import CONCAT_GROUP_SIZE, concat_videos
 
 
 @hookimpl
@@ -17,31 +18,61 @@ def register_commands(subparser):
     concat_parser.add_argument(
         "-o", "--output", help="Path to the output video file (optional)"
     )
-    concat_parser.add_argument(
+    concat_method = concat_parser.add_mutually_exclusive_group()
+    concat_method.add_argument(
         "-f",
         "--no-fast",
         action="store_false",
         dest="fast",
         help="Use slower but more compatible concatenation method",
     )
+    concat_method.add_argument(
+        "-m",
+        "--mode",
+        choices=["copy", "smart", "reencode"],
+        help="copy: stream copy, inputs must match (default). "
+        "smart: re-encode only the inputs that differ from the rest, then stream copy. "
+        "reencode: re-encode everything (same as --no-fast)",
+    )
+    concat_parser.add_argument(
+        "-j", "--jobs", type=int, help="Inputs probed and re-encoded at the same time"
+    )
+    concat_parser.add_argument(
+        "--group-size",
+        type=int,
+        default=CONCAT_GROUP_SIZE,
+        help="Inputs merged per FFmpeg process when re-encoding "
+        f"(default: {CONCAT_GROUP_SIZE})",
+    )
+    add_encoding_profile_argument(concat_parser)
     concat_parser.set_defaults(func=concat_video_command)
 
 
-def concat_video_command(args):
-    try:
-        input_files = list(args.input_files) if args.input_files else []
+def iter_concat_inputs(input_files, input_list):
+    """Yield the positional inputs, then the lines of the input list file."""
+    yield from input_files or []
+    if input_list:
+        with open(input_list, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
 
-        if args.input_list:
-            with open(args.input_list, "r") as f:
-                file_list = [line.strip() for line in f if line.strip()]
-                input_files.extend(file_list)
 
-        if not input_files:
+def concat_video_command(args):
+    try:
+        if not (args.input_files or args.input_list):
             print("Error: No input files provided. Use positional arguments or -i/--input-list.")
-            return
+            return 1
 
         code, log, output_path = concat_videos(
-            input_files, output_path=args.output, fast=args.fast
+            iter_concat_inputs(args.input_files, args.input_list),
+            output_path=args.output,
+            fast=args.fast,
+            mode=args.mode,
+            jobs=args.jobs,
+            report=print,
+            group_size=args.group_size,
+            profile=args.profile,
         )
 
         if code == 0:
@@ -50,8 +81,11 @@ def concat_video_command(args):
             print(f"Error FFmpeg concatenating videos. Return code: {code}")
             print("FFmpeg output:")
             print(log)
+        return code
 
     except FileNotFoundError as e:
         print(f"Error: {e}")
+        return 1
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
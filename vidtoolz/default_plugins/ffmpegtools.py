@@ -1,9 +1,32 @@
+import json
+import math
 import os
+import re
 import subprocess
 import tempfile
+import threading
+import time
+from collections import deque
+from itertools import chain, islice
+from dataclasses import dataclass, asdict
 from enum import Enum
-from typing import List
+from typing import Optional
 import platform
+import signal
+
+from vidtoolz.mediacache import get_media_cache
+from vidtoolz.metrics import record_job
+from vidtoolz.profiles import encoding_args, get_profile
+from vidtoolz.progress import (
+    FFMPEG_LOG_ENV,
+    STDERR_TAIL_LINES,
+    ProgressParser,
+    Watchdog,
+    get_progress_handler,
+    parse_duration,
+)
+from vidtoolz.resources import current_policy, plan_workers
+from vidtoolz.utils import bounded_map, has_encoder
 
 
 def is_windows():
@@ -26,30 +49,279 @@ class Position(Enum):
 # ---------------- CORE HELPERS ----------------
 
 
-def run_command(command: str, timeout: int = 300):
-    """Run a shell command and capture stdout/stderr."""
+# Seconds between checks of the timeout and watchdog
+WATCHDOG_INTERVAL = 1.0
+
+
+def process_tree_read_bytes(pid):
+    """
+    Bytes read so far by pid and its descendants (rchar in /proc/<pid>/io,
+    so reads served from the page cache count too), or None where /proc
+    isn't available. Descendants come from /proc/<pid>/task/*/children,
+    so only the child's own tree is visited.
+    """
+    if not os.path.isdir(f"/proc/{pid}"):
+        return None
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/io", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("rchar:"):
+                        total += int(line.split()[1])
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", encoding="utf-8") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def spawn_command(
+    command: str, timeout, policy, read_stdout, read_stderr, watchdog=None
+):
+    """
+    Run a shell command under the resource policy, passing its stdout pipe
+    to read_stdout and its stderr pipe to read_stderr (on a thread). The
+    child is killed after timeout seconds (None for no limit) or when the
+    watchdog asks for it. Input read by the child counts as watchdog
+    activity. Returns (return code, reason it was aborted or
+    None, resource usage); the usage comes from os.wait4 and is None where
+    that isn't available.
+    """
+    process = subprocess.Popen(
+        policy.wrap_command(command),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=True,
+        text=True,
+        errors="replace",
+        # Own process group, so a kill reaches FFmpeg and not just the shell
+        start_new_session=os.name == "posix",
+    )
+    policy.apply_to(process.pid)
+    lock = threading.Lock()
+    finished = threading.Event()
+    aborted = []
+
+    def kill_group():
+        if os.name == "posix":
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            process.kill()
+
+    def monitor():
+        start = time.monotonic()
+        read_bytes = None
+        while not finished.wait(WATCHDOG_INTERVAL):
+            reason = None
+            if timeout and time.monotonic() - start > timeout:
+                reason = f"Process timed out after {timeout}s"
+            elif watchdog:
+                if os.name == "posix":
+                    current = process_tree_read_bytes(process.pid)
+                    if current is not None and current != read_bytes:
+                        read_bytes = current
+                        watchdog.touch()
+                reason = watchdog.check()
+            if reason:
+                with lock:
+                    if process.returncode is None:
+                        aborted.append(reason)
+                        kill_group()
+                return
+
+    reader = threading.Thread(target=read_stderr, args=(process.stderr,), daemon=True)
+    reader.start()
+    if timeout or watchdog:
+        threading.Thread(target=monitor, daemon=True).start()
+
     try:
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-            shell=True,
-            text=True,
-        )
-        return result.returncode, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
-        return -1, "", "Process timed out"
+        read_stdout(process.stdout)
+    except BaseException:
+        with lock:
+            kill_group()
+        raise
+    finally:
+        if hasattr(os, "wait4"):
+            # Reap the child ourselves to get its CPU time and peak RSS
+            _, status, rusage = os.wait4(process.pid, 0)
+            with lock:
+                process.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            process.wait()
+            rusage = None
+        finished.set()
+        reader.join()
+        process.stdout.close()
+        process.stderr.close()
 
+    return process.returncode, (aborted or [None])[0], rusage
 
-def run_ffmpeg(cmd: str, timeout: int = 300):
-    """Execute FFmpeg command."""
-    command = f"ffmpeg {cmd}"
-    code, out, err = run_command(command, timeout)
+
+def run_command(command: str, timeout: int = 300, policy=None):
+    """
+    Run a shell command and capture stdout/stderr. The resource policy
+    (CPU affinity, niceness, IO priority, memory limit) is applied to the
+    child process by wrapping the command (see ResourcePolicy.wrap_command;
+    no preexec_fn, which isn't safe with the worker threads that call
+    this), and its metrics are recorded (see vidtoolz.metrics).
+    """
+    policy = policy or current_policy()
+    out, err = [], []
+    start = time.perf_counter()
+    code, aborted, rusage = spawn_command(
+        command,
+        timeout,
+        policy,
+        lambda pipe: out.append(pipe.read()),
+        lambda pipe: err.append(pipe.read()),
+    )
+    record_job(command, code, time.perf_counter() - start, rusage)
+    if aborted:
+        return -1, "", aborted
+    return code, "".join(out), "".join(err)
+
+
+def ffmpeg_threads(threads=None):
+    """
+    Threads per FFmpeg decoder, encoder and filtergraph: threads or the
+    resource policy's cap, whichever is lower (None when neither is set).
+    """
+    cap = current_policy().threads
+    if threads and cap:
+        return min(threads, cap)
+    return threads or cap
+
+
+def thread_args(threads=None):
+    """
+    The -threads option capping one input's decoder or one output's
+    encoder at ffmpeg_threads(threads), or "". Command builders put it
+    before each -i and in each output's options; run_ffmpeg, given the
+    same threads, caps the filtergraphs.
+    """
+    threads = ffmpeg_threads(threads)
+    return f"-threads {threads} " if threads else ""
+
+
+def stream_command(
+    command: str,
+    timeout=None,
+    policy=None,
+    progress=None,
+    duration=None,
+    watchdog=None,
+):
+    """
+    Run an FFmpeg shell command that writes `-progress` reports to stdout.
+    Each report is passed to the progress callback as an FFmpegProgress
+    and to the watchdog, which aborts the run when it stalls or overruns;
+    stderr output and input being read also count as activity.
+    Only the last STDERR_TAIL_LINES lines of stderr are kept in memory;
+    the full stderr is appended to the file named by VIDTOOLZ_FFMPEG_LOG,
+    if set. duration (seconds) is used for the ETA and the deadline, and
+    defaults to the duration of the first input. The run's metrics are
+    recorded.
+    """
+    policy = policy or current_policy()
+    watchdog = watchdog or Watchdog.from_environment()
+    tail = deque(maxlen=STDERR_TAIL_LINES)
+    state = {"duration": duration, "last": None}
+    log_path = os.environ.get(FFMPEG_LOG_ENV)
+
+    def read_stderr(pipe):
+        log_file = open(log_path, "a", encoding="utf-8") if log_path else None
+        try:
+            if log_file:
+                log_file.write(f"--- {command}\n")
+            for line in pipe:
+                watchdog.touch()
+                tail.append(line.rstrip("\n"))
+                if log_file:
+                    log_file.write(line)
+                if state["duration"] is None:
+                    state["duration"] = parse_duration(line)
+        finally:
+            if log_file:
+                log_file.close()
+
+    def read_progress(pipe):
+        parser = ProgressParser(duration)
+        for line in pipe:
+            parser.duration = parser.duration or state["duration"]
+            report = parser.feed(line)
+            if report:
+                state["last"] = report
+                watchdog.update(report)
+                if progress:
+                    progress(report)
+
+    start = time.perf_counter()
+    code, aborted, rusage = spawn_command(
+        command, timeout, policy, read_progress, read_stderr, watchdog
+    )
+    record_job(
+        command,
+        code,
+        time.perf_counter() - start,
+        rusage,
+        input_duration=state["duration"],
+        progress=state["last"],
+    )
+
+    err = "\n".join(tail)
+    if aborted:
+        return -1, "", f"{aborted}\n{err}"
+    return code, "", err
+
+
+def run_ffmpeg(cmd: str, timeout=None, progress=None, duration=None, threads=None):
+    """
+    Execute FFmpeg command under the current resource policy. The limits
+    applied are recorded at the top of the log. Progress is reported to
+    progress, or to the handler set with set_progress_handler. Rather than
+    a fixed timeout, the run is aborted by the watchdog configured with
+    --stall-timeout/--deadline-factor; see stream_command. timeout is an
+    optional hard limit on top.
+
+    The filtergraph threads are capped at ffmpeg_threads(threads); the
+    decoder and encoder caps are part of cmd (see thread_args).
+    """
+    policy = current_policy()
+    threads = ffmpeg_threads(threads)
+    if threads:
+        cmd = f"-filter_threads {threads} -filter_complex_threads {threads} {cmd}"
+    command = f"ffmpeg -nostats -progress pipe:1 {cmd}"
+    code, out, err = stream_command(
+        command, timeout, policy, progress or get_progress_handler(), duration
+    )
     log = f"{command}\n{out}\n{err}"
+    if not policy.is_empty():
+        log = f"[resources] {policy.describe()}\n{log}"
     return code, log
 
 
+ERROR_LINE_RE = re.compile(r"error|could not|invalid|not supported|unsupported", re.I)
+
+
+def ffmpeg_error(log):
+    """Return the first error message in an FFmpeg log, or None."""
+    for line in log.strip().splitlines():
+        # Skip the command line at the top of run_ffmpeg's log
+        if line.startswith(("ffmpeg ", "[resources]")):
+            continue
+        if ERROR_LINE_RE.search(line):
+            # Drop the "[muxer @ 0x...]" context prefix
+            return re.sub(r"^\[[^]]*\]\s*", "", line.strip()).rstrip(": ")
+    return None
+
+
 def run_ffprobe(cmd: str, timeout: int = 60):
     """Execute FFprobe command."""
     command = f"ffprobe {cmd}"
@@ -90,150 +362,596 @@ def convert_to_seconds(time_value):
 
 
 def clip_video(
-    video_path, start=None, end=None, duration=None, output_path=None, timeout=60
+    video_path,
+    start=None,
+    end=None,
+    duration=None,
+    output_path=None,
+    timeout=None,
+    mode="reencode",
+    profile=None,
 ):
-    """Clip a video."""
+    """
+    Clip a video.
+
+    mode:
+        "reencode" → (default) Re-encode the selected range with the
+                     encoding profile, if one is given
+        "copy"     → Stream copy, with the start snapped to the nearest keyframe
+        "smart"    → Frame accurate; re-encode only the partial GOPs at the
+                     edges and stream copy everything in between
+    """
+    if mode == "copy":
+        return copy_clip_video(video_path, start, end, duration, output_path, timeout)
+    if mode == "smart":
+        return smart_clip_video(video_path, start, end, duration, output_path, timeout)
+
     try:
         if output_path is None:
             base, ext = os.path.splitext(video_path)
             output_path = f"{base}_clip{ext}"
 
+        thread_opts = thread_args()
         cmd = ""
 
         if start is not None:
             cmd += f"-ss {convert_to_seconds(start)} "
 
-        cmd += f'-i "{video_path}" '
+        cmd += f'{thread_opts}-i "{video_path}" '
 
         if end is None and duration is not None:
             end = convert_to_seconds(start or 0) + convert_to_seconds(duration)
 
+        length = None
         if end is not None:
-            cmd += f"-to {convert_to_seconds(end)} "
+            # Output timestamps restart at 0 after an input seek, so the
+            # end has to be given as a duration
+            length = convert_to_seconds(end) - convert_to_seconds(start or 0)
+            cmd += f"-t {length} "
 
+        cmd += f"{thread_opts}{encoding_args(profile)}"
         cmd += f'-y "{output_path}"'
 
-        code, log = run_ffmpeg(cmd, timeout)
+        code, log = run_ffmpeg(cmd, timeout, duration=length)
         return code, log, output_path
 
     except Exception as e:
         return -1, str(e), ""
 
 
-def scale_video(video_path, width, height=-2, output_path=None, timeout=120):
-    """Scale a video."""
+def clip_bounds(video_path, start=None, end=None, duration=None):
+    """Resolve clip arguments to (start, end) seconds, probing for the end."""
+    start = convert_to_seconds(start or 0)
+    if end is None and duration is not None:
+        end = start + convert_to_seconds(duration)
+    if end is None:
+        end = fast_probe(video_path).duration
+        if end is None:
+            raise ValueError(f"Could not determine the duration of {video_path}")
+    end = convert_to_seconds(end)
+    if end <= start:
+        raise ValueError(f"Clip end ({end}) must be after start ({start})")
+    return start, end
+
+
+# Seconds of packets scanned around a cut point to find keyframes
+KEYFRAME_SCAN_SECONDS = 60
+
+
+def copy_clip_video(
+    video_path, start=None, end=None, duration=None, output_path=None, timeout=None
+):
+    """
+    Clip without re-encoding. Stream copy can only start on a keyframe,
+    so the start is moved to the keyframe nearest to it.
+    """
     try:
         if output_path is None:
             base, ext = os.path.splitext(video_path)
-            output_path = f"{base}_scaled{ext}"
+            output_path = f"{base}_clip{ext}"
 
-        cmd = f'-i "{video_path}" ' f"-vf scale={width}:{height} " f'-y "{output_path}"'
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"{video_path} not found")
 
+        start, end = clip_bounds(video_path, start, end, duration)
+        # Seeking lands on the keyframe before start, so this scan sees the
+        # keyframes on both sides of it
+        keyframes = probe_keyframes(
+            video_path, read_intervals=f"{start}%+{KEYFRAME_SCAN_SECONDS}"
+        )
+        if keyframes:
+            start = min(keyframes, key=lambda k: abs(k - start))
+
+        cmd = (
+            f'-ss {start} -i "{video_path}" -t {end - start} '
+            "-map 0 -c copy -avoid_negative_ts make_zero "
+            f'-y "{output_path}"'
+        )
         code, log = run_ffmpeg(cmd, timeout)
-        return code, log, output_path
+        return code, f"Copy cut snapped to keyframe at {start:.3f}s\n{log}", output_path
 
     except Exception as e:
         return -1, str(e), ""
 
 
-def overlay_video(
-    background_video,
-    overlay_video,
-    output_path=None,
-    position=Position.TopLeft,
-    dx=0,
-    dy=0,
-    overlay_scale=None,
-    normalized_scale=None,
-    duration=None,
-    fade_duration=0.5,
-    timeout=180,
+# Encoders used to re-encode the edges of a smart cut, by source codec
+SMART_CUT_ENCODERS = {
+    "h264": ("libx264", "-crf 16 -preset fast"),
+    "hevc": ("libx265", "-crf 18 -preset fast"),
+    "mpeg4": ("mpeg4", "-q:v 2"),
+    "vp9": ("libvpx-vp9", "-crf 20 -b:v 0"),
+}
+
+# Encoder profile names, by codec and FFprobe profile name
+ENCODER_PROFILES = {
+    "h264": {
+        "Constrained Baseline": "baseline",
+        "Baseline": "baseline",
+        "Main": "main",
+        "High": "high",
+        "High 10": "high10",
+        "High 4:2:2": "high422",
+        "High 4:4:4 Predictive": "high444",
+    },
+    "hevc": {"Main": "main", "Main 10": "main10"},
+}
+
+# Bitstream filters that put the parameter sets (SPS/PPS, VOL headers) in
+# front of every keyframe of a stream copied part, and the encoder options
+# that do the same for a re-encoded one. Codecs missing from
+# INBAND_HEADER_FILTERS keep no parameter sets outside the frames.
+INBAND_HEADER_FILTERS = {
+    "h264": "h264_mp4toannexb",
+    "hevc": "hevc_mp4toannexb",
+    "mpeg4": "dump_extra",
+}
+INBAND_HEADER_ARGS = {
+    "h264": "repeat-headers=1",
+    "hevc": "repeat-headers=1",
+    "mpeg4": "-bsf:v dump_extra",
+}
+
+
+def matching_encoder_args(stream):
+    """
+    Return the output options that encode video like the FFprobe video
+    stream: same codec, profile, level and pixel format, with the
+    parameter sets repeated in front of every keyframe. Parts encoded
+    this way can be joined with stream copied parts of the source: the
+    container keeps the first part's parameter sets, but every part
+    carries its own in-band. Raises ValueError when that isn't possible.
+    """
+    codec = stream.get("codec_name")
+    encoder, quality = SMART_CUT_ENCODERS.get(codec, (None, ""))
+    if encoder is None:
+        raise ValueError(f"no encoder for {codec}")
+    if not has_encoder(encoder):
+        raise ValueError(f"FFmpeg has no {encoder} encoder")
+
+    args = f"-c:v {encoder} {quality}"
+    params = INBAND_HEADER_ARGS.get(codec, "")
+    if codec in ENCODER_PROFILES:
+        profile = ENCODER_PROFILES[codec].get(stream.get("profile"))
+        if profile is None:
+            raise ValueError(f"no {encoder} profile for {codec} {stream.get('profile')}")
+        args += f" -profile:v {profile}"
+        level = stream.get("level") or 0
+        if codec == "h264" and level >= 10:
+            args += f" -level:v {level / 10:g}"
+        elif codec == "hevc" and level > 0:
+            params += f":level-idc={level / 30:g}"
+    if stream.get("pix_fmt"):
+        args += f" -pix_fmt {stream['pix_fmt']}"
+    if encoder in ("libx264", "libx265"):
+        args += f" -{encoder[3:]}-params {params}"
+    elif params:
+        args += f" {params}"
+    return args
+
+
+def inband_copy_args(codec):
+    """Output options that stream copy video with in-band parameter sets."""
+    copy = "-c:v copy"
+    if codec in INBAND_HEADER_FILTERS:
+        copy += f" -bsf:v {INBAND_HEADER_FILTERS[codec]}"
+    return copy
+
+
+def smart_clip_video(
+    video_path, start=None, end=None, duration=None, output_path=None, timeout=None
 ):
-    """Overlay one video onto another."""
+    """
+    Frame accurate clip that re-encodes only the partial GOPs at each edge.
+
+    The GOPs that lie entirely inside the range are stream copied, the
+    pieces before the first and after the last keyframe in the range are
+    re-encoded to match the source (see matching_encoder_args), and the
+    three video parts are joined with the concat demuxer. Every part
+    carries its parameter sets in-band, so the copied GOPs are decoded
+    with the source's and not with those of the first part. Audio is cut
+    once for the whole range and muxed back in. Falls back to a normal
+    re-encode when the source can't be matched or there is no keyframe
+    inside the range.
+    """
     try:
         if output_path is None:
-            base, ext = os.path.splitext(background_video)
-            output_path = f"{base}_overlay{ext}"
+            base, ext = os.path.splitext(video_path)
+            output_path = f"{base}_clip{ext}"
 
-        # Get background video dimensions for normalized scale
-        bg_width, bg_height = None, None
-        if normalized_scale:
-            code, out, err = run_command(
-                f'ffprobe -v error -select_streams v:0 -show_entries stream=width,height -of csv=p=0 "{background_video}"'
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"{video_path} not found")
+
+        start, end = clip_bounds(video_path, start, end, duration)
+        probe = fast_probe(video_path)
+        # Only the keyframes near each edge matter, so scan two short windows
+        # instead of every packet in the range
+        scan = KEYFRAME_SCAN_SECONDS
+        keyframes = probe_keyframes(
+            video_path, read_intervals=f"{start}%{min(end, start + scan)}", with_dts=True
+        )
+        if end - start > scan:
+            keyframes += probe_keyframes(
+                video_path, read_intervals=f"{end - scan}%{end}", with_dts=True
+            )
+        keyframes = sorted(k for k in set(keyframes) if start <= k[0] <= end)
+
+        reasons = []
+        try:
+            encode = matching_encoder_args(video_stream(probe_video(video_path)) or {})
+        except ValueError as e:
+            reasons.append(str(e))
+        if not keyframes:
+            reasons.append("no keyframe in range")
+        if reasons:
+            code, log, output_path = clip_video(
+                video_path, start, end, output_path=output_path, timeout=timeout
             )
-            if code == 0 and out.strip():
-                try:
-                    bg_width, bg_height = map(int, out.strip().split(","))
-                except ValueError:
-                    return -1, f"Failed to parse background video dimensions: {out}", ""
+            reason = ", ".join(reasons)
+            return code, f"Smart cut not possible ({reason}), re-encoded\n{log}", output_path
+
+        (first_key, _), (last_key, last_key_dts) = keyframes[0], keyframes[-1]
+        half_frame = 0.5 / (probe.fps or 30)
+        thread_opts = thread_args()
+        encode = f"-an {thread_opts}{encode}"
+
+        logs = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            parts = []
+            pieces = [
+                (start, first_key, encode),
+                # A stream copy stops by decode time, so end the copied part
+                # before the last keyframe is decoded; with B-frames that is
+                # earlier than when it is shown
+                (
+                    first_key,
+                    min(last_key, last_key_dts) - half_frame,
+                    f"-an {inband_copy_args(probe.video_codec)}",
+                ),
+                (last_key, end, encode),
+            ]
+            for index, (piece_start, piece_end, codec_args) in enumerate(pieces):
+                if piece_end - piece_start < half_frame:
+                    continue
+                # No -avoid_negative_ts: shifting a part that starts with a
+                # B-frame delay leaves a gap where the parts are joined
+                part = os.path.join(tmpdir, f"part{index}.mkv")
+                code, log = run_ffmpeg(
+                    f"-ss {piece_start} {thread_opts}"
+                    f'-i "{video_path}" -t {piece_end - piece_start} '
+                    f'{codec_args} -y "{part}"',
+                    timeout,
+                )
+                logs.append(log)
+                if code != 0:
+                    return code, "\n".join(logs), output_path
+                parts.append(part)
+
+            list_path = os.path.join(tmpdir, "parts.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for part in parts:
+                    f.write(f"file '{part}'\n")
+
+            cmd = f'-f concat -safe 0 -i "{list_path}" '
+            if probe.has_audio:
+                cmd += f'-ss {start} -t {end - start} -i "{video_path}" '
+                cmd += "-map 0:v -map 1:a -c:v copy -c:a aac "
             else:
-                return -1, f"Failed to get background video dimensions: {err}", ""
-
-        if position == Position.TopLeft:
-            x, y = f"{dx}", f"{dy}"
-        elif position == Position.TopCenter:
-            x, y = f"(W-w)/2+{dx}", f"{dy}"
-        elif position == Position.TopRight:
-            x, y = f"(W-w)+{dx}", f"{dy}"
-        elif position == Position.RightCenter:
-            x, y = f"(W-w)+{dx}", f"(H-h)/2+{dy}"
-        elif position == Position.BottomRight:
-            x, y = f"(W-w)+{dx}", f"(H-h)+{dy}"
-        elif position == Position.BottomCenter:
-            x, y = f"(W-w)/2+{dx}", f"(H-h)+{dy}"
-        elif position == Position.BottomLeft:
-            x, y = f"{dx}", f"(H-h)+{dy}"
-        elif position == Position.LeftCenter:
-            x, y = f"{dx}", f"(H-h)/2+{dy}"
+                cmd += "-map 0:v -c copy "
+            cmd += f'-y "{output_path}"'
+            code, log = run_ffmpeg(cmd, timeout)
+            logs.append(log)
+
+        summary = (
+            f"Smart cut: copied {first_key:.3f}s-{last_key:.3f}s, "
+            f"re-encoded {first_key - start:.3f}s + {end - last_key:.3f}s at the edges"
+        )
+        return code, "\n".join([summary] + logs), output_path
+
+    except Exception as e:
+        return -1, str(e), ""
+
+
+# Ranges cut by each FFmpeg process in clip_ranges
+RANGES_PER_PROCESS = 16
+
+# A # comment starts a line or follows whitespace; "take#2" is a name
+RANGE_COMMENT_RE = re.compile(r"(^|\s)#.*")
+
+
+def parse_ranges(path):
+    """
+    Read a ranges file with one "START END [NAME]" per line. END written
+    as +DURATION is relative to START. Blank lines and # comments are
+    skipped; a # inside a name is part of it. Names must be unique.
+    Returns a list of (start, end, name or None).
+    """
+    ranges = []
+    names = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = RANGE_COMMENT_RE.sub("", line).strip()
+            if not line:
+                continue
+            fields = line.split(None, 2)
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{number}: expected START END [NAME]")
+            start = convert_to_seconds(fields[0])
+            if fields[1].startswith("+"):
+                end = start + convert_to_seconds(fields[1][1:])
+            else:
+                end = convert_to_seconds(fields[1])
+            if end <= start:
+                raise ValueError(f"{path}:{number}: end must be after start")
+            name = fields[2] if len(fields) > 2 else None
+            if name in names:
+                raise ValueError(
+                    f"{path}:{number}: name {name} is already used "
+                    f"on line {names[name]}"
+                )
+            if name:
+                names[name] = number
+            ranges.append((start, end, name))
+    return ranges
+
+
+def range_output_paths(video_path, ranges, output_dir=None):
+    base, ext = os.path.splitext(video_path)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    paths = []
+    for index, (_, _, name) in enumerate(ranges, 1):
+        if name:
+            if not os.path.splitext(name)[1]:
+                name += ext
+            paths.append(os.path.join(os.path.dirname(base), name))
         else:
-            x, y = f"(W-w)/2+{dx}", f"(H-h)/2+{dy}"
-
-        filter_parts = []
-        overlay_input = "[1:v]"
-        current_label = "[1:v]"
-
-        # Apply normalized scale first if specified
-        if normalized_scale:
-            if bg_width and bg_height:
-                ow = int(bg_width * normalized_scale[0])
-                oh = int(bg_height * normalized_scale[1])
-                filter_parts.append(f"[1:v]scale={ow}:{oh}[ovr_norm]")
-                current_label = "[ovr_norm]"
-                overlay_input = "[ovr_norm]"
-
-        # Apply absolute scale if specified (overrides normalized scale output)
-        if overlay_scale:
-            ow, oh = overlay_scale
-            scale_input = current_label
-            filter_parts.append(f"{scale_input}scale={ow}:{oh}[ovr]")
-            overlay_input = "[ovr]"
-
-        # Apply duration trim and fade-out if specified
-        if duration:
-            trim_input = overlay_input
-            # Trim the overlay video and add fade-out at the end
-            filter_parts.append(
-                f"{trim_input}trim=duration={duration},setpts=PTS-STARTPTS,fade=t=out:st={duration-fade_duration}:d={fade_duration}[ovr_trim]"
-            )
-            overlay_input = "[ovr_trim]"
+            paths.append(f"{base}_clip{index:03d}{ext}")
+    if len(set(paths)) < len(paths):
+        duplicate = next(path for path in paths if paths.count(path) > 1)
+        raise ValueError(f"Two ranges would both be written to {duplicate}")
+    return paths
+
+
+def clip_ranges(
+    video_path,
+    ranges,
+    output_dir=None,
+    mode="reencode",
+    group_size=RANGES_PER_PROCESS,
+    timeout=None,
+    profile=None,
+):
+    """
+    Cut many (start, end, name) ranges out of one source.
+
+    Ranges are sorted and cut in groups, one FFmpeg process per group, so
+    the number of processes does not grow with the number of ranges.
+
+    mode:
+        "reencode" → Each group seeks once and decodes from its first start
+                     to its last end; every range is an output of the same
+                     process, trimmed with output -ss/-t, so the decode is
+                     shared
+        "copy"     → Each range is a separately seeked input of the group's
+                     process and is stream copied, starting on the keyframe
+                     at or before its start
+
+    Returns (code, log, output paths in the order of ranges).
+    """
+    try:
+        if mode not in ("reencode", "copy"):
+            raise ValueError(f"Mode {mode} can't be used with multiple ranges")
+
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"{video_path} not found")
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        outputs = range_output_paths(video_path, ranges, output_dir)
+        jobs = sorted(
+            zip(ranges, outputs), key=lambda job: (job[0][0], job[0][1])
+        )
+
+        logs = []
+        for first in range(0, len(jobs), group_size):
+            group = jobs[first : first + group_size]
+            if mode == "copy":
+                cmd = "".join(
+                    f'-ss {start} -t {end - start} -i "{video_path}" '
+                    for (start, end, _), _ in group
+                )
+                cmd += " ".join(
+                    f"-map {index} -c copy -avoid_negative_ts make_zero "
+                    f'-y "{output}"'
+                    for index, (_, output) in enumerate(group)
+                )
+            else:
+                group_start = group[0][0][0]
+                group_end = max(end for (_, end, _), _ in group)
+                thread_opts = thread_args()
+                cmd = (
+                    f"-ss {group_start} -t {group_end - group_start} "
+                    f'{thread_opts}-i "{video_path}" '
+                )
+                cmd += " ".join(
+                    f"-ss {start - group_start} -t {end - start} "
+                    f'{thread_opts}{encoding_args(profile)}-y "{output}"'
+                    for (start, end, _), output in group
+                )
 
-            # Trim and fade overlay audio to match video
-            filter_parts.append(
-                f"[1:a]atrim=duration={duration},asetpts=PTS-STARTPTS,afade=t=out:st={duration-fade_duration}:d={fade_duration}[a_trim]"
+            code, log = run_ffmpeg(cmd, timeout)
+            logs.append(log)
+            if code != 0:
+                return code, "\n".join(logs), outputs
+
+        return 0, "\n".join(logs), outputs
+
+    except Exception as e:
+        return -1, str(e), []
+
+
+def parallel_encode(
+    video_path,
+    output_path,
+    video_filter,
+    audio_args=None,
+    chunks=None,
+    jobs=None,
+    timeout=None,
+    report=None,
+    profile=None,
+):
+    """
+    Apply video_filter by encoding keyframe-aligned chunks of the video
+    concurrently (with the video settings of the encoding profile) and
+    joining them with the concat demuxer. The audio is processed
+    separately in a single pass with audio_args (None drops it), so there
+    are no gaps at chunk boundaries.
+
+    chunks defaults to twice the number of workers. report, if given, is
+    called with a line of text as each chunk finishes.
+    """
+    jobs, threads = plan_workers(jobs)
+    chunks = chunks or 2 * jobs
+    probe = fast_probe(video_path)
+    if not probe.duration:
+        raise ValueError(f"Could not determine the duration of {video_path}")
+
+    ext = os.path.splitext(output_path)[1] or ".mp4"
+    report = report or (lambda line: None)
+    logs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        start = time.perf_counter()
+        code, log = run_ffmpeg(
+            f'-i "{video_path}" -map 0:v:0 -c copy -f segment '
+            f"-segment_time {probe.duration / chunks} -reset_timestamps 1 "
+            f'-y "{os.path.join(tmpdir, "chunk%05d.mkv")}"',
+            timeout,
+        )
+        logs.append(log)
+        if code != 0:
+            return code, "\n".join(logs), output_path
+        report(f"split into chunks in {time.perf_counter() - start:.2f}s")
+
+        tasks = []
+        audio_path = None
+        if audio_args is not None and probe.has_audio:
+            audio_path = os.path.join(tmpdir, "audio.mka")
+            tasks.append(
+                (
+                    "audio",
+                    f'{thread_args(threads)}-i "{video_path}" -vn -map 0:a:0 '
+                    f'{audio_args} -y "{audio_path}"',
+                )
             )
-            audio_input = "[a_trim]"
-        else:
-            audio_input = "[1:a]"
+        encoded = []
+        for name in sorted(f for f in os.listdir(tmpdir) if f.startswith("chunk")):
+            chunk = os.path.join(tmpdir, name)
+            target = os.path.join(tmpdir, f"encoded_{name[:-4]}{ext}")
+            encoded.append(target)
+            thread_opts = thread_args(threads)
+            cmd = (
+                f'{thread_opts}-i "{chunk}" -vf "{video_filter}" -an '
+                f'{thread_opts}{encoding_args(profile, audio=False)}-y "{target}"'
+            )
+            tasks.append((name[:-4], cmd))
+
+        def encode(task):
+            name, cmd = task
+            task_start = time.perf_counter()
+            code, log = run_ffmpeg(cmd, timeout, threads=threads)
+            return code, log, time.perf_counter() - task_start
+
+        timings = []
+        for (name, _), result, error in bounded_map(encode, tasks, jobs):
+            if error is not None:
+                raise error
+            code, log, seconds = result
+            if code != 0:
+                return code, "\n".join(logs + [log]), output_path
+            timings.append(f"{name}: {seconds:.2f}s")
+            report(f"{name} encoded in {seconds:.2f}s")
+
+        list_path = os.path.join(tmpdir, "chunks.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for target in encoded:
+                f.write(f"file '{target}'\n")
+
+        cmd = f'-f concat -safe 0 -i "{list_path}" '
+        if audio_path:
+            cmd += f'-i "{audio_path}" -map 0:v -map 1:a '
+        cmd += f'-c copy -y "{output_path}"'
+        code, log = run_ffmpeg(cmd, timeout)
+        logs.append(log)
 
-        filter_parts.append(f"[0:v]{overlay_input}overlay={x}:{y}[vout]")
-        filter_parts.append(f"[0:a]{audio_input}amix=inputs=2:duration=first[aout]")
+    summary = (
+        f"Parallel encode: {len(encoded)} chunks, {jobs} workers, "
+        f"{time.perf_counter() - start:.2f}s total\n" + "\n".join(timings)
+    )
+    return code, "\n".join([summary] + logs), output_path
 
-        filter_complex = ";".join(filter_parts)
 
+def scale_video(
+    video_path,
+    width,
+    height=-2,
+    output_path=None,
+    timeout=None,
+    parallel=False,
+    chunks=None,
+    jobs=None,
+    report=None,
+    profile=None,
+):
+    """
+    Scale a video, encoding with the given encoding profile. With
+    parallel, chunks of the video are scaled concurrently (see
+    parallel_encode) and the audio is copied.
+    """
+    try:
+        if output_path is None:
+            base, ext = os.path.splitext(video_path)
+            output_path = f"{base}_scaled{ext}"
+
+        if parallel:
+            return parallel_encode(
+                video_path,
+                output_path,
+                f"scale={width}:{height}",
+                audio_args="-c:a copy",
+                chunks=chunks,
+                jobs=jobs,
+                timeout=timeout,
+                report=report,
+                profile=profile,
+            )
+
+        thread_opts = thread_args()
         cmd = (
-            f'-i "{background_video}" -i "{overlay_video}" '
-            f'-filter_complex "{filter_complex}" '
-            f'-map "[vout]" -map "[aout]" '
+            f'{thread_opts}-i "{video_path}" '
+            f"-vf scale={width}:{height} "
+            f"{thread_opts}{encoding_args(profile)}"
             f'-y "{output_path}"'
         )
 
@@ -244,56 +962,781 @@ def overlay_video(
         return -1, str(e), ""
 
 
-def concat_videos(input_files: List[str], output_path=None, fast=True, timeout=120):
-    """Concatenate videos."""
+# Overlay inputs that are still images, looped into a video stream
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+
+
+@dataclass
+class OverlayLayer:
+    """
+    One video or image composited onto the background by overlay_videos.
+
+    scale is (width, height) in pixels. normalized_scale is (width, height)
+    as fractions of the background size, and scale wins when both are set.
+    The layer appears start seconds into the background. It lasts for
+    duration seconds, fading out over the last fade_duration seconds, or
+    until its input ends.
+    """
+
+    path: str
+    position: Position = Position.TopLeft
+    dx: int = 0
+    dy: int = 0
+    scale: Optional[tuple] = None
+    normalized_scale: Optional[tuple] = None
+    start: float = 0.0
+    duration: Optional[float] = None
+    fade_duration: float = 0.5
+    audio: bool = True
+
+    @property
+    def is_image(self):
+        return self.path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def overlay_position(position, dx=0, dy=0):
+    """Return the x and y expressions of the overlay filter for position."""
+    if position == Position.TopLeft:
+        return f"{dx}", f"{dy}"
+    elif position == Position.TopCenter:
+        return f"(W-w)/2+{dx}", f"{dy}"
+    elif position == Position.TopRight:
+        return f"(W-w)+{dx}", f"{dy}"
+    elif position == Position.RightCenter:
+        return f"(W-w)+{dx}", f"(H-h)/2+{dy}"
+    elif position == Position.BottomRight:
+        return f"(W-w)+{dx}", f"(H-h)+{dy}"
+    elif position == Position.BottomCenter:
+        return f"(W-w)/2+{dx}", f"(H-h)+{dy}"
+    elif position == Position.BottomLeft:
+        return f"{dx}", f"(H-h)+{dy}"
+    elif position == Position.LeftCenter:
+        return f"{dx}", f"(H-h)/2+{dy}"
+    return f"(W-w)/2+{dx}", f"(H-h)/2+{dy}"
+
+
+def overlay_command(background_video, layers, output_path, profile=None):
+    """
+    Build the FFmpeg arguments compositing every layer onto the background
+    in a single filtergraph. The audio of the background and of every
+    video layer with audio=True is mixed at its own level; inputs without
+    an audio stream (fast_probe, cached) are left out of the mix.
+    """
+    thread_opts = thread_args()
+    inputs = [f'{thread_opts}-i "{background_video}"']
+    filters = []
+    audio_labels = []
+    base = "[0:v]"
+
+    for i, layer in enumerate(layers, start=1):
+        input_args = ""
+        if layer.duration:
+            # Limit the input itself, so nothing past the window is decoded
+            input_args += f"-t {layer.duration} "
+        if layer.is_image:
+            input_args += "-loop 1 "
+        inputs.append(f'{input_args}{thread_opts}-i "{layer.path}"')
+
+        video = f"[{i}:v]"
+        if layer.scale:
+            w, h = layer.scale
+            filters.append(f"{video}scale={w}:{h}[l{i}s]")
+            video = f"[l{i}s]"
+        elif layer.normalized_scale:
+            # Sized against the composite so far, which has the background's
+            # dimensions, so the background is never probed
+            w, h = layer.normalized_scale
+            filters.append(
+                f"{video}{base}scale2ref=w=main_w*{w}:h=main_h*{h}[l{i}s][b{i}]"
+            )
+            video, base = f"[l{i}s]", f"[b{i}]"
+
+        chain = []
+        fade = min(layer.fade_duration or 0, layer.duration or 0)
+        fade_start = (layer.duration or 0) - fade
+        if fade:
+            # Fade the alpha, so the background shows through
+            chain.append(
+                f"format=yuva420p,fade=t=out:st={fade_start}:d={fade}:alpha=1"
+            )
+        if layer.start:
+            chain.append(f"setpts=PTS-STARTPTS+{layer.start}/TB")
+        if chain:
+            filters.append(f"{video}{','.join(chain)}[l{i}]")
+            video = f"[l{i}]"
+
+        x, y = overlay_position(layer.position, layer.dx, layer.dy)
+        options = f"x={x}:y={y}"
+        if layer.duration:
+            options += ":eof_action=pass"
+        elif layer.is_image:
+            # A looped image never ends, so stop with the background
+            options += ":shortest=1"
+        filters.append(f"{base}{video}overlay={options}[v{i}]")
+        base = f"[v{i}]"
+
+        if layer.audio and not layer.is_image and fast_probe(layer.path).has_audio:
+            chain = []
+            if fade:
+                chain.append(f"afade=t=out:st={fade_start}:d={fade}")
+            if layer.start:
+                chain.append(f"adelay={int(layer.start * 1000)}:all=1")
+            if chain:
+                filters.append(f"[{i}:a]{','.join(chain)}[a{i}]")
+                audio_labels.append(f"[a{i}]")
+            else:
+                audio_labels.append(f"[{i}:a]")
+
+    maps = f'-map "{base}" '
+    background = fast_probe(background_video) if audio_labels else None
+    if background and background.has_audio:
+        # normalize=0 keeps every input at its own level instead of 1/n
+        filters.append(
+            f"[0:a]{''.join(audio_labels)}"
+            f"amix=inputs={len(audio_labels) + 1}:duration=first:normalize=0[aout]"
+        )
+        maps += '-map "[aout]" '
+    elif background:
+        # No background audio to end the mix with, so pad or cut the
+        # layers' audio to the background's duration
+        mix = f"amix=inputs={len(audio_labels)}:duration=longest:normalize=0"
+        if background.duration:
+            mix += (
+                f",apad=whole_dur={background.duration}"
+                f",atrim=end={background.duration}"
+            )
+        filters.append(f"{''.join(audio_labels)}{mix}[aout]")
+        maps += '-map "[aout]" '
+    else:
+        maps += "-map 0:a? "
+
+    return (
+        f"{' '.join(inputs)} "
+        f'-filter_complex "{";".join(filters)}" '
+        f"{maps}"
+        f"{thread_opts}{encoding_args(profile)}"
+        f'-y "{output_path}"'
+    )
+
+
+def overlay_videos(
+    background_video, layers, output_path=None, timeout=None, profile=None
+):
+    """
+    Composite a list of OverlayLayer onto the background in one FFmpeg
+    run, so the background is decoded and encoded only once.
+    """
     try:
+        if not layers:
+            return -1, "No overlay layers given", ""
         if output_path is None:
-            base, _ = os.path.splitext(input_files[0])
+            base, ext = os.path.splitext(background_video)
+            output_path = f"{base}_overlay{ext}"
+
+        cmd = overlay_command(background_video, layers, output_path, profile)
+        code, log = run_ffmpeg(cmd, timeout)
+        return code, log, output_path
+
+    except Exception as e:
+        return -1, str(e), ""
+
+
+def overlay_video(
+    background_video,
+    overlay_video,
+    output_path=None,
+    position=Position.TopLeft,
+    dx=0,
+    dy=0,
+    overlay_scale=None,
+    normalized_scale=None,
+    duration=None,
+    fade_duration=0.5,
+    timeout=None,
+    profile=None,
+):
+    """Overlay one video onto another, encoding with the given profile."""
+    layer = OverlayLayer(
+        overlay_video,
+        position=position,
+        dx=dx,
+        dy=dy,
+        scale=overlay_scale,
+        normalized_scale=normalized_scale,
+        duration=duration,
+        fade_duration=fade_duration,
+    )
+    return overlay_videos(
+        background_video, [layer], output_path, timeout=timeout, profile=profile
+    )
+
+
+# Inputs merged by one FFmpeg process when re-encoding a concat
+CONCAT_GROUP_SIZE = 32
+
+
+def iter_existing(files):
+    for file in files:
+        if not os.path.exists(file):
+            raise FileNotFoundError(f"{file} not found")
+        yield file
+
+
+def concat_filter_command(input_files, output_path, profile=None, threads=None):
+    thread_opts = thread_args(threads)
+    inputs = " ".join([f'{thread_opts}-i "{f}"' for f in input_files])
+    filter_str = f"concat=n={len(input_files)}:v=1:a=1[vout][aout]"
+    return (
+        f"{inputs} "
+        f'-filter_complex "{filter_str}" '
+        f'-map "[vout]" -map "[aout]" '
+        f"{thread_opts}{encoding_args(profile)}"
+        f'-y "{output_path}"'
+    )
+
+
+def concat_videos(
+    input_files,
+    output_path=None,
+    fast=True,
+    timeout=None,
+    mode=None,
+    jobs=None,
+    report=None,
+    group_size=CONCAT_GROUP_SIZE,
+    profile=None,
+):
+    """
+    Concatenate videos. input_files can be any iterable, e.g. a file
+    being read line by line; "copy" and "reencode" consume it lazily.
+
+    mode:
+        "copy"     → Concat demuxer with stream copy; inputs must match
+        "smart"    → Probe the inputs, re-encode only those whose streams
+                     differ from the most common profile, then stream copy
+        "reencode" → Re-encode everything through the concat filter, with
+                     the encoding profile, in groups of group_size when
+                     there are more inputs
+    Without a mode, fast selects "copy" (default) or "reencode".
+    """
+    list_path = None
+    try:
+        inputs = iter_existing(input_files)
+        first = next(inputs, None)
+        if first is None:
+            raise ValueError("No input files")
+        inputs = chain([first], inputs)
+
+        if output_path is None:
+            base, _ = os.path.splitext(first)
             output_path = f"{base}_merged.mp4"
 
-        for file in input_files:
-            if not os.path.exists(file):
-                raise FileNotFoundError(f"{file} not found")
+        mode = mode or ("copy" if fast else "reencode")
+        if mode == "smart":
+            return smart_concat_videos(
+                list(inputs), output_path, jobs=jobs, timeout=timeout, report=report
+            )
 
-        if fast:
+        if mode == "copy":
             with tempfile.NamedTemporaryFile(
                 delete=False, mode="w", encoding="utf-8"
             ) as f:
-                for file in input_files:
-                    f.write(f"file '{os.path.abspath(file)}'\n")
                 list_path = f.name
+                for file in inputs:
+                    f.write(f"file '{os.path.abspath(file)}'\n")
 
             cmd = f'-f concat -safe 0 -i "{list_path}" -c copy -y "{output_path}"'
             code, log = run_ffmpeg(cmd, timeout)
-
-            os.remove(list_path)
             return code, log, output_path
 
         else:
-            inputs = " ".join([f'-i "{f}"' for f in input_files])
-            filter_str = f"concat=n={len(input_files)}:v=1:a=1[vout][aout]"
-
-            cmd = (
-                f"{inputs} "
-                f'-filter_complex "{filter_str}" '
-                f'-map "[vout]" -map "[aout]" '
-                f'-y "{output_path}"'
-            )
-
+            head = list(islice(inputs, group_size + 1))
+            if len(head) > group_size:
+                return tree_concat_videos(
+                    chain(head, inputs),
+                    output_path,
+                    group_size=group_size,
+                    jobs=jobs,
+                    timeout=timeout,
+                    report=report,
+                    profile=profile,
+                )
+
+            cmd = concat_filter_command(head, output_path, profile)
             code, log = run_ffmpeg(cmd, timeout)
             return code, log, output_path
 
     except Exception as e:
         return -1, str(e), ""
 
+    finally:
+        if list_path and os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def tree_concat_videos(
+    input_files,
+    output_path,
+    group_size=CONCAT_GROUP_SIZE,
+    jobs=None,
+    timeout=None,
+    report=None,
+    profile=None,
+):
+    """
+    Re-encode a concat of any number of inputs with bounded resources.
+
+    Groups of group_size inputs are merged with the concat filter on a
+    pool of workers, so no FFmpeg process has more than group_size inputs
+    open. Groups are read from input_files only as workers free up. The
+    merged groups share one encoding and are joined with the concat
+    demuxer and stream copied, which reads one file at a time.
+    """
+    jobs, threads = plan_workers(jobs)
+    report = report or (lambda line: None)
+    ext = os.path.splitext(output_path)[1] or ".mp4"
+
+    inputs = iter(input_files)
+    groups = iter(lambda: list(islice(inputs, group_size)), [])
+
+    logs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        merged = {}
+
+        def merge(group):
+            index, files = group
+            target = os.path.join(tmpdir, f"group{index:06d}{ext}")
+            cmd = concat_filter_command(files, target, profile, threads)
+            code, log = run_ffmpeg(cmd, timeout, threads=threads)
+            return code, log, target, len(files)
+
+        total = 0
+        for (index, _), result, error in bounded_map(merge, enumerate(groups), jobs):
+            if error is not None:
+                raise error
+            code, log, target, count = result
+            if code != 0:
+                return code, "\n".join(logs + [log]), output_path
+            merged[index] = target
+            total += count
+            report(f"Merged group {index + 1} ({count} inputs)")
+
+        list_path = os.path.join(tmpdir, "groups.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for index in sorted(merged):
+                f.write(f"file '{merged[index]}'\n")
+
+        cmd = f'-f concat -safe 0 -i "{list_path}" -c copy -y "{output_path}"'
+        code, log = run_ffmpeg(cmd, timeout)
+        logs.append(log)
+
+    summary = f"Tree concat: {total} inputs merged in {len(merged)} groups of up to {group_size}"
+    return code, "\n".join([summary] + logs), output_path
+
+
+# Stream parameters that must match for the concat demuxer to stream copy
+CONCAT_PROFILE_FIELDS = (
+    "video_codec",
+    "profile",
+    "level",
+    "width",
+    "height",
+    "pix_fmt",
+    "frame_rate",
+    "time_base",
+    "audio_codec",
+    "sample_rate",
+    "channels",
+)
+
+# Encoders used to normalize concat audio, by codec name
+AUDIO_ENCODERS = {
+    "aac": "aac",
+    "mp3": "libmp3lame",
+    "opus": "libopus",
+    "vorbis": "libvorbis",
+    "ac3": "ac3",
+    "flac": "flac",
+}
+
+
+def concat_profile(video_path):
+    """Return the stream parameters of video_path as a dict."""
+    info = probe_video(video_path)
+    video = video_stream(info) or {}
+    audio = next(
+        (s for s in info.get("streams", []) if s.get("codec_type") == "audio"), {}
+    )
+    return {
+        "video_codec": video.get("codec_name"),
+        "profile": video.get("profile"),
+        "level": video.get("level"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "pix_fmt": video.get("pix_fmt"),
+        "frame_rate": video.get("r_frame_rate"),
+        "time_base": video.get("time_base"),
+        "audio_codec": audio.get("codec_name"),
+        "sample_rate": audio.get("sample_rate"),
+        "channels": audio.get("channels"),
+        "channel_layout": audio.get("channel_layout"),
+        "duration": summarize_video_info(info)["duration"] or 0.0,
+    }
+
+
+def profile_key(profile):
+    return tuple(profile[field] for field in CONCAT_PROFILE_FIELDS)
+
+
+def profile_differences(profile, target):
+    return [
+        f"{field} {profile[field]} != {target[field]}"
+        for field in CONCAT_PROFILE_FIELDS
+        if profile[field] != target[field]
+    ]
+
+
+def profile_stream(profile):
+    """The video fields of a concat profile, named as in FFprobe streams."""
+    return {
+        "codec_name": profile["video_codec"],
+        "profile": profile["profile"],
+        "level": profile["level"],
+        "pix_fmt": profile["pix_fmt"],
+    }
+
+
+def normalize_command(video_path, profile, target, output_path, threads=None):
+    """
+    FFmpeg arguments that re-encode video_path to the target profile, with
+    the parameter sets in-band (see matching_encoder_args). Raises
+    ValueError when the target can't be encoded.
+    """
+    encode = matching_encoder_args(profile_stream(target))
+    width, height = target["width"], target["height"]
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={target['frame_rate']},format={target['pix_fmt']}"
+    )
+
+    thread_opts = thread_args(threads)
+    cmd = f'{thread_opts}-i "{video_path}" '
+    if target["audio_codec"] and not profile["audio_codec"]:
+        # Silent track so the joined audio stays in sync
+        layout = target["channel_layout"] or "mono"
+        cmd += f'-f lavfi -i "anullsrc=r={target["sample_rate"]}:cl={layout}" -shortest '
+    cmd += f'-map 0:v:0 -vf "{video_filter}" {encode} '
+    if target["audio_codec"]:
+        audio_encoder = AUDIO_ENCODERS.get(target["audio_codec"], target["audio_codec"])
+        cmd += "-map 1:a:0 " if not profile["audio_codec"] else "-map 0:a:0 "
+        cmd += (
+            f"-c:a {audio_encoder} -ar {target['sample_rate']} "
+            f"-ac {target['channels']} "
+        )
+    else:
+        cmd += "-an "
+    cmd += f'{thread_opts}-y "{output_path}"'
+    return cmd
+
+
+def smart_concat_videos(
+    input_files, output_path, jobs=None, timeout=None, report=None
+):
+    """
+    Probe the inputs concurrently and pick the profile (codecs, profile
+    and level, size, pixel format, frame rate, time base, audio format)
+    covering the most running time. Inputs with any other profile are
+    re-encoded to it concurrently, then everything is joined with the
+    concat demuxer and stream copied.
+
+    The concat demuxer keeps only the first file's codec extradata, so
+    when more than one file is joined every part is written to a Matroska
+    intermediate with its parameter sets in-band: normalized inputs by the
+    encoder, the others by a stream copy through the codec's bitstream
+    filter. Falls back to a full re-encode when the target profile can't
+    be encoded.
+    """
+    jobs, threads = plan_workers(jobs)
+    report = report or (lambda line: None)
+
+    profiles = {}
+    for video_path, profile, error in bounded_map(concat_profile, set(input_files), jobs):
+        if error is not None:
+            raise error
+        profiles[video_path] = profile
+
+    # Per list entry, so an input listed twice counts twice
+    running_time = {}
+    for video_path in input_files:
+        key = profile_key(profiles[video_path])
+        duration = profiles[video_path]["duration"]
+        running_time[key] = running_time.get(key, 0.0) + duration
+    target_key = max(running_time, key=running_time.get)
+    target = next(p for p in profiles.values() if profile_key(p) == target_key)
+
+    outliers = [
+        path for path in sorted(profiles) if profile_key(profiles[path]) != target_key
+    ]
+    if outliers:
+        try:
+            matching_encoder_args(profile_stream(target))
+        except ValueError as e:
+            report(f"Smart concat not possible ({e}), re-encoding every input")
+            return concat_videos(
+                input_files,
+                output_path,
+                mode="reencode",
+                jobs=jobs,
+                timeout=timeout,
+                report=report,
+            )
+
+    logs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # A single file needs no intermediate: its extradata is the one kept
+        parts = {}
+        if len(profiles) > 1:
+            parts = {
+                path: os.path.join(tmpdir, f"part{index}.mkv")
+                for index, path in enumerate(sorted(profiles))
+            }
+        for video_path in outliers:
+            reasons = "; ".join(profile_differences(profiles[video_path], target))
+            report(f"Normalizing {video_path}: {reasons}")
+
+        def prepare(video_path):
+            if video_path in outliers:
+                cmd = normalize_command(
+                    video_path, profiles[video_path], target, parts[video_path], threads
+                )
+                return run_ffmpeg(cmd, timeout, threads=threads)
+            return run_ffmpeg(
+                f'-i "{video_path}" -map 0:v:0 -map 0:a:0? -c copy '
+                f"{inband_copy_args(target['video_codec'])} "
+                f'-y "{parts[video_path]}"',
+                timeout,
+            )
+
+        for video_path, result, error in bounded_map(prepare, parts, jobs):
+            if error is not None:
+                raise error
+            code, log = result
+            logs.append(log)
+            if code != 0:
+                return code, "\n".join(logs), output_path
+
+        list_path = os.path.join(tmpdir, "inputs.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for video_path in input_files:
+                path = parts.get(video_path, os.path.abspath(video_path))
+                f.write(f"file '{path}'\n")
+
+        cmd = f'-f concat -safe 0 -i "{list_path}" -c copy '
+        if target["time_base"] and output_path.lower().endswith((".mp4", ".m4v", ".mov")):
+            cmd += f"-video_track_timescale {target['time_base'].split('/')[-1]} "
+        cmd += f'-y "{output_path}"'
+        code, log = run_ffmpeg(cmd, timeout)
+        logs.append(log)
+
+    summary = (
+        f"Smart concat: {len(input_files)} inputs, {len(outliers)} normalized "
+        f"to {target['video_codec']} {target['width']}x{target['height']} "
+        f"{target['frame_rate']} fps, audio {target['audio_codec'] or 'none'}"
+    )
+    report(summary)
+    return code, "\n".join([summary] + logs), output_path
+
 
 # ---------------- INFO / PLAYBACK ----------------
 
 
+def probe_video(video_path, timeout=60):
+    """
+    Return FFprobe's stream and format info as a dict. Results are kept in
+    the media cache, so an unchanged file is only probed once.
+    Raises RuntimeError if FFprobe fails.
+    """
+    cache = get_media_cache()
+    info = cache.get(video_path)
+    if info is not None:
+        return info
+
+    cmd = f'ffprobe -v error -show_streams -show_format -of json "{video_path}"'
+    code, out, err = run_command(cmd, timeout)
+    if code != 0:
+        raise RuntimeError(f"{cmd}\n{err}")
+    try:
+        info = json.loads(out)
+    except ValueError:
+        raise RuntimeError(f"{cmd}\nCould not parse FFprobe output: {out}")
+
+    cache.put(video_path, info)
+    return info
+
+
+def video_stream(info):
+    """Return the first video stream of a probe_video result, or None."""
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video":
+            return stream
+    return None
+
+
+def parse_rate(rate):
+    """Convert an FFprobe rate such as "30000/1001" to a float."""
+    try:
+        num, _, den = str(rate).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def summarize_video_info(info):
+    """Flatten a probe_video result into the commonly needed fields."""
+    fmt = info.get("format", {})
+    video = video_stream(info) or {}
+    audio = next(
+        (s for s in info.get("streams", []) if s.get("codec_type") == "audio"), {}
+    )
+
+    def number(value, cast=float):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "duration": number(fmt.get("duration") or video.get("duration")),
+        "width": number(video.get("width"), int),
+        "height": number(video.get("height"), int),
+        "codec": video.get("codec_name"),
+        "fps": parse_rate(video.get("avg_frame_rate"))
+        or parse_rate(video.get("r_frame_rate")),
+        "bitrate": number(fmt.get("bit_rate"), int),
+        "audio_codec": audio.get("codec_name"),
+        "size": number(fmt.get("size"), int),
+        "format": fmt.get("format_name"),
+        "pix_fmt": video.get("pix_fmt"),
+    }
+
+
+# Containers that carry complete stream headers, so a small probe suffices
+FAST_PROBE_EXTENSIONS = (".mp4", ".m4v", ".mov", ".mkv", ".webm")
+FAST_PROBESIZE = 1000000
+FAST_ANALYZEDURATION = 1000000
+FAST_PROBE_ENTRIES = (
+    "format=duration:"
+    "stream=codec_type,codec_name,width,height,pix_fmt,avg_frame_rate,r_frame_rate,duration"
+)
+
+
+@dataclass
+class VideoProbe:
+    """Compact, typed result of fast_probe."""
+
+    path: str
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    has_audio: bool = False
+    keyframe_interval: Optional[float] = None
+    pix_fmt: Optional[str] = None
+
+
+def probe_keyframes(video_path, read_intervals=None, timeout=60, with_dts=False):
+    """
+    Return the timestamps of video keyframes, read from packet flags so
+    nothing is decoded. read_intervals limits the scan, e.g. "%+30".
+    With with_dts=True each keyframe is a (pts, dts) tuple.
+    """
+    cmd = "ffprobe -v error -select_streams v:0 "
+    if read_intervals:
+        cmd += f"-read_intervals {read_intervals} "
+    cmd += f'-show_entries packet=pts_time,dts_time,flags -of csv=p=0 "{video_path}"'
+    code, out, err = run_command(cmd, timeout)
+    if code != 0:
+        raise RuntimeError(f"{cmd}\n{err}")
+
+    keyframes = []
+    for line in out.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3 or "K" not in fields[2]:
+            continue
+        try:
+            pts = float(fields[0])
+        except ValueError:
+            continue
+        try:
+            dts = float(fields[1])
+        except ValueError:
+            dts = pts
+        keyframes.append((pts, dts) if with_dts else pts)
+    return sorted(keyframes)
+
+
+def fast_probe(video_path, keyframes=False, timeout=60):
+    """
+    Probe only the fields vidtoolz needs and return a VideoProbe. Well
+    formed containers are probed with a small probesize/analyzeduration.
+    With keyframes=True the keyframe interval is estimated from the
+    packets of the first 30 seconds. Results are kept in the media cache.
+    Raises RuntimeError if FFprobe fails.
+    """
+    cache = get_media_cache()
+    cached = cache.get(video_path, kind="fast")
+    if cached is not None:
+        probe = VideoProbe(**cached)
+        if not keyframes or probe.keyframe_interval is not None:
+            return probe
+    else:
+        cmd = "ffprobe -v error "
+        if video_path.lower().endswith(FAST_PROBE_EXTENSIONS):
+            cmd += (
+                f"-probesize {FAST_PROBESIZE} "
+                f"-analyzeduration {FAST_ANALYZEDURATION} "
+            )
+        cmd += f'-show_entries {FAST_PROBE_ENTRIES} -of json "{video_path}"'
+        code, out, err = run_command(cmd, timeout)
+        if code != 0:
+            raise RuntimeError(f"{cmd}\n{err}")
+        try:
+            summary = summarize_video_info(json.loads(out))
+        except ValueError:
+            raise RuntimeError(f"{cmd}\nCould not parse FFprobe output: {out}")
+
+        probe = VideoProbe(
+            path=video_path,
+            duration=summary["duration"],
+            width=summary["width"],
+            height=summary["height"],
+            fps=summary["fps"],
+            video_codec=summary["codec"],
+            audio_codec=summary["audio_codec"],
+            has_audio=summary["audio_codec"] is not None,
+            pix_fmt=summary["pix_fmt"],
+        )
+
+    if keyframes:
+        times = probe_keyframes(video_path, read_intervals="%+30", timeout=timeout)
+        if len(times) > 1:
+            probe.keyframe_interval = (times[-1] - times[0]) / (len(times) - 1)
+
+    cache.put(video_path, asdict(probe), kind="fast")
+    return probe
+
+
 def get_video_info(video_path):
-    """Retrieve stream info via FFprobe."""
-    cmd = f'-v error -show_streams -of json "{video_path}"'
-    return run_ffprobe(cmd)
+    """Retrieve stream and format info via FFprobe (cached)."""
+    cmd = f'ffprobe -v error -show_streams -show_format -of json "{video_path}"'
+    try:
+        info = probe_video(video_path)
+    except RuntimeError as e:
+        return 1, str(e)
+    return 0, f"{cmd}\n{json.dumps(info, indent=4)}\n"
 
 
 def play_video(video_path, speed=1.0, loop=0):
@@ -309,8 +1752,348 @@ def play_video(video_path, speed=1.0, loop=0):
     return run_ffplay(cmd)
 
 
-def reverse_video(input_path, output_path=None, timeout=120):
-    """Reverse a video using FFmpeg."""
+# Scene score (0-1) a frame needs to start a new scene
+SCENE_THRESHOLD = 0.3
+
+# Width frames are scaled down to before they are compared
+SCENE_ANALYSIS_WIDTH = 160
+
+SCENE_LINE_RE = re.compile(r"pts_time:(\S+)")
+
+
+def filter_path(path):
+    """Quote a file path for use as a filter option value."""
+    return "'" + path.replace("\\", "/").replace(":", "\\:") + "'"
+
+
+def parse_scene_scores(text):
+    """Parse the output of the metadata=print filter into [(time, score)]."""
+    scenes = []
+    time_value = None
+    for line in text.splitlines():
+        match = SCENE_LINE_RE.search(line)
+        if match:
+            time_value = float(match.group(1))
+        elif line.startswith("lavfi.scene_score=") and time_value is not None:
+            scenes.append((time_value, float(line.partition("=")[2])))
+            time_value = None
+    return scenes
+
+
+def detect_scenes(video_path, threshold=SCENE_THRESHOLD, timeout=None, threads=None):
+    """
+    Analyze video_path and return [(time, score)] for every frame that
+    starts a new scene. The decode is kept cheap: non-reference frames and
+    the deblocking filter are skipped and frames are compared at
+    SCENE_ANALYSIS_WIDTH pixels wide, so a boundary may land a frame or
+    two after the actual cut. threads caps the FFmpeg threads (see
+    thread_args).
+    """
+    fd, scores_path = tempfile.mkstemp(suffix=".txt", prefix="vidtoolz_scenes_")
+    os.close(fd)
+    try:
+        cmd = (
+            f"-skip_frame noref -skip_loop_filter all {thread_args(threads)}"
+            f'-i "{video_path}" '
+            f'-map 0:v:0 -vf "scale={SCENE_ANALYSIS_WIDTH}:-2,'
+            f"select='gt(scene\\,{threshold})',"
+            f'metadata=print:file={filter_path(scores_path)}" '
+            f'-f null -y "-"'
+        )
+        code, log = run_ffmpeg(cmd, timeout, threads=threads)
+        if code != 0:
+            raise RuntimeError(f"Scene detection failed for {video_path}\n{log}")
+        with open(scores_path, "r", encoding="utf-8") as f:
+            return parse_scene_scores(f.read())
+    finally:
+        os.remove(scores_path)
+
+
+def scene_changes(
+    video_path, threshold=SCENE_THRESHOLD, refresh=False, timeout=None, threads=None
+):
+    """
+    Return [(time, score)] of the scene changes of video_path, from the
+    scene index when it has them. The index lives in the media cache, so
+    an entry is dropped as soon as the file's size or mtime changes.
+    """
+    cache = get_media_cache()
+    kind = f"scenes@{threshold:g}"
+    if not refresh:
+        scenes = cache.get(video_path, kind=kind)
+        if scenes is not None:
+            return [tuple(scene) for scene in scenes]
+
+    scenes = detect_scenes(video_path, threshold, timeout, threads)
+    cache.put(video_path, scenes, kind=kind)
+    return scenes
+
+
+def scene_ranges(video_path, threshold=SCENE_THRESHOLD, refresh=False, threads=None):
+    """Return the (start, end) of every scene of video_path, in order."""
+    duration = fast_probe(video_path).duration
+    if not duration:
+        raise ValueError(f"Unknown duration for {video_path}")
+    changes = scene_changes(video_path, threshold, refresh, threads=threads)
+    starts = [0.0] + [t for t, _ in changes]
+    ends = starts[1:] + [duration]
+    return [(start, end) for start, end in zip(starts, ends) if end > start]
+
+
+def snap_time(time_value, boundaries, tolerance=None):
+    """
+    Move time_value to the nearest of boundaries, unless that is more than
+    tolerance seconds away.
+    """
+    if not boundaries:
+        return time_value
+    nearest = min(boundaries, key=lambda b: abs(b - time_value))
+    if tolerance is not None and abs(nearest - time_value) > tolerance:
+        return time_value
+    return nearest
+
+
+def parse_scene_numbers(spec):
+    """Parse a scene selection such as "3" or "2-4,7" into [2, 3, 4, 7]."""
+    numbers = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    if not numbers or min(numbers) < 1:
+        raise ValueError(f"Invalid scene selection: {spec}")
+    return numbers
+
+
+THUMBNAIL_MODES = ("even", "scene")
+
+# Most frames taken with one seeking input each. Every input opens its own
+# demuxer and decoder, so more frames are taken from a single input
+THUMBNAIL_SEEK_INPUTS = 24
+
+
+def thumbnail_times(duration, count):
+    """Timestamps of count frames evenly spaced over duration seconds."""
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def sheet_layout(count, columns=None):
+    """Return (columns, rows) of a contact sheet holding count frames."""
+    columns = columns or math.ceil(math.sqrt(count))
+    return columns, math.ceil(count / columns)
+
+
+def pick_evenly(items, count):
+    """Return count items spread evenly over items (all of them if fewer)."""
+    if len(items) <= count:
+        return list(items)
+    if count == 1:
+        return [items[0]]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+def seek_frames(video_path, times, scale, keyframes=False):
+    """
+    Return (inputs, filters, chain) taking one frame at each of times, with
+    one input-side seek per frame. With keyframes=True each seek stops at
+    the keyframe before the time, so only that frame is decoded. All the
+    inputs are open at once, so keep times to THUMBNAIL_SEEK_INPUTS.
+    """
+    # One thread per decoder, so the open decoders don't each allocate a
+    # set of frame threads to decode a single frame
+    seek = "-noaccurate_seek -skip_frame nokey " if keyframes else ""
+    inputs = " ".join(
+        f'-ss {t:.3f} {seek}-threads 1 -i "{video_path}"' for t in times
+    )
+    labels = [f"[t{i}]" for i in range(len(times))]
+    filters = [
+        f"[{i}:v]trim=end_frame=1,{scale}{label}" for i, label in enumerate(labels)
+    ]
+    return inputs, filters, "".join(labels) + f"concat=n={len(times)}"
+
+
+def thumbnail_command(
+    video_path,
+    output_path,
+    count=12,
+    mode="even",
+    width=320,
+    sheet=True,
+    columns=None,
+    threshold=SCENE_THRESHOLD,
+    threads=None,
+):
+    """
+    Build the FFmpeg arguments that extract count frames of video_path.
+
+    "even" takes frames evenly spaced in time. When the keyframes are no
+    further apart than that spacing, only keyframes are decoded: up to
+    THUMBNAIL_SEEK_INPUTS frames are each the keyframe an input-side -ss
+    lands on, so only count frames are decoded; beyond that one input
+    decodes every keyframe and keeps the first in each step. Otherwise
+    the video is decoded once, front to back, and a frame is kept at each
+    step. "scene" takes the first frame of count scenes spread over the
+    video, from the scene index (see scene_changes), each with its own
+    input-side seek, or beyond THUMBNAIL_SEEK_INPUTS from one decode.
+    A single decoding input and the encoder get thread_args(threads).
+    """
+    scale = f"scale={width}:-2,setsar=1"
+    if mode == "even":
+        probe = fast_probe(video_path, keyframes=True)
+        if not probe.duration:
+            raise ValueError(f"Unknown duration for {video_path}")
+        spacing = probe.duration / count
+        keyframes = probe.keyframe_interval and probe.keyframe_interval <= spacing
+        if keyframes and count <= THUMBNAIL_SEEK_INPUTS:
+            inputs, filters, chain = seek_frames(
+                video_path,
+                thumbnail_times(probe.duration, count),
+                scale,
+                keyframes=True,
+            )
+        elif keyframes:
+            # Every step holds a keyframe: keep the first one of each
+            inputs = f'-skip_frame nokey {thread_args(threads)}-i "{video_path}"'
+            filters = []
+            step = f"{spacing:.3f}"
+            chain = (
+                f"[0:v]select='isnan(prev_selected_t)"
+                f"+gt(floor(t/{step})\\,floor(prev_selected_t/{step}))',{scale}"
+            )
+        else:
+            inputs = f'{thread_args(threads)}-i "{video_path}"'
+            filters = []
+            chain = (
+                f"[0:v]select='isnan(prev_selected_t)*gte(t\\,{spacing / 2:.3f})"
+                f"+gte(t-prev_selected_t\\,{spacing:.3f})',{scale}"
+            )
+    elif mode == "scene":
+        scenes = scene_ranges(video_path, threshold, threads=threads)
+        starts = [start for start, _ in scenes]
+        times = pick_evenly(starts, count)
+        count = len(times)
+        if count <= THUMBNAIL_SEEK_INPUTS:
+            inputs, filters, chain = seek_frames(video_path, times, scale)
+        else:
+            # The first frame at or after each scene start
+            starts = "+".join(
+                f"gte(t\\,{t:.3f})*(isnan(prev_t)+lt(prev_t\\,{t:.3f}))"
+                for t in times
+            )
+            inputs = f'{thread_args(threads)}-i "{video_path}"'
+            filters = []
+            chain = f"[0:v]select='{starts}',{scale}"
+    else:
+        raise ValueError(f"mode must be one of: {', '.join(THUMBNAIL_MODES)}")
+
+    # Renumber the frames back to back, so the output frame rate neither
+    # drops nor duplicates any of them
+    chain += ",setpts=N/FRAME_RATE/TB"
+    if sheet:
+        cols, rows = sheet_layout(count, columns)
+        chain += f",tile={cols}x{rows}:padding=4:margin=4"
+        output = "-frames:v 1 -update 1"
+    else:
+        output = f"-frames:v {count}"
+    filters.append(chain + "[out]")
+
+    return (
+        f"{inputs} -filter_complex \"{';'.join(filters)}\" "
+        f'-map "[out]" {output} -q:v 2 {thread_args(threads)}-y "{output_path}"'
+    )
+
+
+def extract_thumbnails(
+    video_path,
+    output_path=None,
+    count=12,
+    mode="even",
+    width=320,
+    sheet=True,
+    columns=None,
+    threshold=SCENE_THRESHOLD,
+    timeout=None,
+    threads=None,
+):
+    """
+    Write a contact sheet of count frames of video_path, or with
+    sheet=False the frames as individual images. output_path is the
+    sheet, or the directory the images go to as thumb_001.jpg, ...
+    Defaults: <name>_sheet.jpg and <name>_thumbs/ next to the video.
+    See thumbnail_command for the modes. threads caps the FFmpeg threads
+    (see thread_args).
+    """
+    try:
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        base = os.path.splitext(video_path)[0]
+        if sheet:
+            output_path = output_path or f"{base}_sheet.jpg"
+            target = output_path
+        else:
+            output_path = output_path or f"{base}_thumbs"
+            os.makedirs(output_path, exist_ok=True)
+            target = os.path.join(output_path, "thumb_%03d.jpg")
+
+        cmd = thumbnail_command(
+            video_path, target, count, mode, width, sheet, columns, threshold, threads
+        )
+        code, log = run_ffmpeg(cmd, timeout, threads=threads)
+        return code, log, output_path
+
+    except Exception as e:
+        return -1, str(e), ""
+
+
+# Decoded frames the reverse filter may buffer per FFmpeg process
+REVERSE_MEMORY_BUDGET = 512 * 1024**2
+
+
+def frame_bytes(probe):
+    """Approximate size of one decoded frame (8-bit 4:2:0 as a baseline)."""
+    bytes_per_pixel = 1.5
+    if probe.pix_fmt and ("444" in probe.pix_fmt or "rgb" in probe.pix_fmt):
+        bytes_per_pixel = 3
+    if probe.pix_fmt and ("10" in probe.pix_fmt or "12" in probe.pix_fmt):
+        bytes_per_pixel *= 2
+    return (probe.width or 1920) * (probe.height or 1080) * bytes_per_pixel
+
+
+def reverse_segment_seconds(probe, budget=REVERSE_MEMORY_BUDGET, jobs=1):
+    """
+    Return the chunk length (seconds) whose decoded frames fit in budget
+    when jobs chunks are reversed at the same time, or None when the whole
+    video fits in one process and needs no segmenting.
+    """
+    seconds = budget / (frame_bytes(probe) * (probe.fps or 30))
+    if probe.duration is not None and probe.duration <= seconds:
+        return None
+    return max(1.0, seconds / max(1, jobs))
+
+
+def reverse_video(
+    input_path,
+    output_path=None,
+    timeout=None,
+    mode="auto",
+    segment_seconds=None,
+    jobs=None,
+    profile=None,
+):
+    """
+    Reverse a video using FFmpeg, encoding with the given profile.
+
+    mode:
+        "auto"      → (default) Segment when the decoded frames would not
+                      fit in REVERSE_MEMORY_BUDGET; the budget is shared by
+                      the chunks reversed at the same time
+        "whole"     → Reverse in one pass; every frame is held in memory
+        "segmented" → Reverse keyframe-aligned chunks concurrently and join
+                      them in reverse order; memory is bounded by the chunk
+    """
     try:
         if output_path is None:
             base, ext = os.path.splitext(input_path)
@@ -319,10 +2102,24 @@ def reverse_video(input_path, output_path=None, timeout=120):
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"{input_path} not found")
 
+        if mode != "whole" and not segment_seconds:
+            jobs, _ = plan_workers(jobs)
+            segment_seconds = reverse_segment_seconds(
+                fast_probe(input_path), jobs=jobs
+            )
+            if segment_seconds is None and mode == "segmented":
+                segment_seconds = 10.0
+        if mode != "whole" and segment_seconds:
+            return segmented_reverse_video(
+                input_path, output_path, segment_seconds, jobs, timeout, profile
+            )
+
         # FFmpeg command to reverse video and audio
+        thread_opts = thread_args()
         cmd = (
-            f'-i "{input_path}" '
+            f'{thread_opts}-i "{input_path}" '
             "-vf reverse -af areverse "
+            f"{thread_opts}{encoding_args(profile)}"
             f'-y "{output_path}"'  # -y flag to overwrite without prompting
         )
 
@@ -333,8 +2130,256 @@ def reverse_video(input_path, output_path=None, timeout=120):
         return -1, str(e), ""
 
 
+def segmented_reverse_video(
+    input_path, output_path, segment_seconds, jobs=None, timeout=None, profile=None
+):
+    """
+    Split input_path into keyframe-aligned chunks of about segment_seconds
+    (stream copy), reverse the chunks on a pool of jobs FFmpeg processes and
+    concatenate them last chunk first.
+
+    The video chunks are reversed without audio. The audio is decoded to
+    PCM chunks that are reversed alongside them and joined sample-exact,
+    then encoded once when it is muxed back in, so there are no encoder
+    priming gaps or drift at chunk boundaries.
+    """
+    jobs, threads = plan_workers(jobs)
+    ext = os.path.splitext(output_path)[1] or ".mp4"
+    has_audio = fast_probe(input_path).has_audio
+    logs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cmd = (
+            f'-i "{input_path}" -map 0:v:0 -c copy '
+            f"-f segment -segment_time {segment_seconds} -reset_timestamps 1 "
+            f'-y "{os.path.join(tmpdir, "chunk%05d.mkv")}" '
+        )
+        if has_audio:
+            cmd += (
+                f"-map 0:a:0 -c:a pcm_f32le "
+                f"-f segment -segment_time {segment_seconds} "
+                f'-y "{os.path.join(tmpdir, "audio%05d.wav")}"'
+            )
+        code, log = run_ffmpeg(cmd, timeout)
+        logs.append(log)
+        if code != 0:
+            return code, "\n".join(logs), output_path
+
+        chunks = sorted(f for f in os.listdir(tmpdir) if f.startswith("chunk"))
+        audio_chunks = sorted(f for f in os.listdir(tmpdir) if f.startswith("audio"))
+
+        def reverse_chunk(name):
+            chunk = os.path.join(tmpdir, name)
+            thread_opts = thread_args(threads)
+            if name.startswith("audio"):
+                reversed_chunk = os.path.join(tmpdir, f"reversed_{name}")
+                cmd = f'-i "{chunk}" -af areverse -c:a pcm_f32le -y "{reversed_chunk}"'
+            else:
+                reversed_chunk = os.path.join(tmpdir, f"reversed_{name[:-4]}{ext}")
+                cmd = (
+                    f'{thread_opts}-i "{chunk}" -vf reverse -an '
+                    f"{thread_opts}{encoding_args(profile, audio=False)}"
+                    f'-y "{reversed_chunk}"'
+                )
+            code, log = run_ffmpeg(cmd, timeout, threads=threads)
+            return code, log, reversed_chunk
+
+        reversed_chunks = {}
+        for name, result, error in bounded_map(
+            reverse_chunk, chunks + audio_chunks, jobs
+        ):
+            if error is not None:
+                raise error
+            code, log, reversed_chunk = result
+            if code != 0:
+                return code, "\n".join(logs + [log]), output_path
+            reversed_chunks[name] = reversed_chunk
+
+        def write_list(list_name, names):
+            list_path = os.path.join(tmpdir, list_name)
+            with open(list_path, "w", encoding="utf-8") as f:
+                for name in reversed(names):
+                    f.write(f"file '{reversed_chunks[name]}'\n")
+            return list_path
+
+        cmd = f'-f concat -safe 0 -i "{write_list("reversed.txt", chunks)}" '
+        if audio_chunks:
+            # The output format's default audio codec unless a profile is set
+            profile = get_profile(profile)
+            audio_codec = f"{profile.audio_args()} " if profile else ""
+            cmd += (
+                f'-f concat -safe 0 -i "{write_list("audio.txt", audio_chunks)}" '
+                f"-map 0:v -map 1:a -c:v copy {audio_codec}"
+            )
+        else:
+            cmd += "-c copy "
+        code, log = run_ffmpeg(cmd + f'-y "{output_path}"', timeout)
+        logs.append(log)
+
+    summary = (
+        f"Segmented reverse: {len(chunks)} chunks of ~{segment_seconds:.1f}s, "
+        f"{jobs} at a time"
+    )
+    return code, "\n".join([summary] + logs), output_path
+
+
+def atempo_filters(speed):
+    """Build a safe atempo chain (0.5–2.0 per filter) for a speed factor."""
+    audio_filters = []
+    remaining_speed = speed
+
+    while remaining_speed > 2.0:
+        audio_filters.append("atempo=2.0")
+        remaining_speed /= 2.0
+
+    while remaining_speed < 0.5:
+        audio_filters.append("atempo=0.5")
+        remaining_speed /= 0.5
+
+    audio_filters.append(f"atempo={remaining_speed}")
+    return audio_filters
+
+
+def copy_speed_video(
+    video_path, speed, output_path, audio_mode="adjust", timeout=None, profile=None
+):
+    """
+    Change playback speed without re-encoding the video: -itsscale
+    rescales the input timestamps and the packets are stream copied.
+    Audio is read from a second, unscaled copy of the input, so "keep"
+    copies it unchanged and "adjust" re-encodes only the audio.
+    """
+    cmd = f'-itsscale {1 / speed} -i "{video_path}" '
+    if audio_mode == "adjust":
+        audio_codec = profile.audio_args() if profile else "-c:a aac"
+        cmd += (
+            f'-i "{video_path}" -map 0:v -map 1:a? '
+            f'-af "{",".join(atempo_filters(speed))}" {audio_codec} '
+        )
+    elif audio_mode == "keep":
+        cmd += f'-i "{video_path}" -map 0:v -map 1:a? -c:a copy '
+    elif audio_mode == "mute":
+        cmd += "-map 0:v -an "
+    else:
+        raise ValueError("audio_mode must be: adjust / mute / keep")
+
+    cmd += f'-c:v copy -y "{output_path}"'
+    code, log = run_ffmpeg(cmd, timeout)
+    return code, log, output_path
+
+
+# Speed factor from which a timelapse skips decoding non-reference frames
+TIMELAPSE_NONREF_SPEED = 4
+
+TIMELAPSE_DECODE = {
+    "nokey": "keyframes only",
+    "noref": "reference frames only",
+    None: "every frame",
+}
+
+# Most frames the tmix filter averages
+TMIX_MAX_FRAMES = 1024
+
+
+def timelapse_skip_frame(speed, fps, keyframe_interval):
+    """
+    Return the -skip_frame level for a timelapse, or None to decode every
+    frame. Keyframes alone are enough when there is at least one per
+    output frame; otherwise, at high speeds, frames nothing refers to
+    can still go undecoded.
+    """
+    if keyframe_interval and fps and keyframe_interval <= speed / fps:
+        return "nokey"
+    if speed >= TIMELAPSE_NONREF_SPEED:
+        return "noref"
+    return None
+
+
+def timelapse_blend_frames(blend, speed, fps, keyframe_interval=None, skip=None):
+    """
+    Return the tmix window, in decoded frames, spanning blend output frame
+    intervals. Each interval is speed source frames, of which only the
+    keyframes are decoded with skip="nokey".
+    """
+    frames = blend * speed
+    if skip == "nokey" and keyframe_interval and fps:
+        frames /= keyframe_interval * fps
+    return max(1, min(TMIX_MAX_FRAMES, round(frames)))
+
+
+def timelapse_video(
+    video_path,
+    speed,
+    output_path=None,
+    blend=None,
+    timeout=None,
+    report=None,
+    profile=None,
+):
+    """
+    Speed a video up by a large factor without decoding the frames that
+    are dropped. The decoder skips everything but keyframes (or reference
+    frames) when that still leaves enough frames for the output rate, and
+    the survivors are retimed and resampled to the source frame rate.
+    blend averages the source over that many output frame intervals into
+    each output frame, like a long shutter, for smoother motion. Blending
+    decodes every frame unless keyframes alone are decoded, as only then
+    is it known how many decoded frames an interval holds. The audio is
+    dropped.
+    """
+    try:
+        speed = float(speed)
+        if speed <= 1:
+            raise ValueError("Timelapse speed must be > 1")
+
+        if output_path is None:
+            base, ext = os.path.splitext(video_path)
+            output_path = f"{base}_timelapse_{speed}{ext}"
+
+        probe = fast_probe(video_path, keyframes=True)
+        fps = probe.fps or 30
+        skip = timelapse_skip_frame(speed, fps, probe.keyframe_interval)
+        if blend and skip == "noref":
+            skip = None
+        if report:
+            report(f"Timelapse at {speed:g}x, decoding {TIMELAPSE_DECODE[skip]}")
+
+        filters = []
+        if blend:
+            frames = timelapse_blend_frames(
+                blend, speed, fps, probe.keyframe_interval, skip
+            )
+            if frames > 1:
+                filters.append(f"tmix=frames={frames}")
+        filters += [f"setpts=(PTS-STARTPTS)/{speed}", f"fps={fps}"]
+
+        thread_opts = thread_args()
+        cmd = f"-skip_frame {skip} " if skip else ""
+        cmd += (
+            f'{thread_opts}-i "{video_path}" -vf "{",".join(filters)}" -an '
+            f"{thread_opts}{encoding_args(profile, audio=False)}"
+            f'-y "{output_path}"'
+        )
+        duration = probe.duration / speed if probe.duration else None
+        code, log = run_ffmpeg(cmd, timeout, duration=duration)
+        return code, log, output_path
+
+    except Exception as e:
+        return -1, str(e), ""
+
+
 def change_video_speed(
-    video_path, speed=1.0, output_path=None, audio_mode="adjust", timeout=120
+    video_path,
+    speed=1.0,
+    output_path=None,
+    audio_mode="adjust",
+    timeout=None,
+    parallel=False,
+    chunks=None,
+    jobs=None,
+    report=None,
+    profile=None,
+    mode="reencode",
+    blend=None,
 ):
     """
     Change video playback speed.
@@ -346,6 +2391,18 @@ def change_video_speed(
         "adjust"  → (default) Adjust audio speed
         "mute"    → Remove audio
         "keep"    → Keep original audio unchanged
+    parallel (bool): Encode chunks of the video concurrently
+        (see parallel_encode)
+    profile: Encoding profile (name or EncodingProfile) for the output
+    mode (str):
+        "reencode"  → (default) Retime the video through setpts
+        "copy"      → Rescale the timestamps and stream copy the video
+                      (see copy_speed_video), re-encoding instead when
+                      the codec or container can't take it
+        "timelapse" → Skip decoding the dropped frames, without audio
+                      (see timelapse_video)
+    blend (int): Output frame intervals averaged into each output frame in
+        timelapse mode
     """
 
     try:
@@ -360,35 +2417,208 @@ def change_video_speed(
 
         video_filter = f"setpts={1/speed}*PTS"
 
-        cmd = f'-i "{video_path}" '
-
-        if audio_mode == "adjust":
-            # Build safe atempo chain (0.5–2.0 per filter)
-            audio_filters = []
-            remaining_speed = speed
-
-            while remaining_speed > 2.0:
-                audio_filters.append("atempo=2.0")
-                remaining_speed /= 2.0
+        profile = get_profile(profile)
+        if mode == "timelapse":
+            if parallel or chunks or jobs:
+                raise ValueError("Timelapse mode doesn't encode in parallel chunks")
+            if audio_mode != "mute" and report:
+                report(f"Timelapse drops the audio (audio mode {audio_mode} ignored)")
+            return timelapse_video(
+                video_path,
+                speed,
+                output_path,
+                blend=blend,
+                timeout=timeout,
+                report=report,
+                profile=profile,
+            )
+        if mode == "copy":
+            code, log, path = copy_speed_video(
+                video_path, speed, output_path, audio_mode, timeout, profile
+            )
+            if code == 0:
+                return code, log, path
+            if report:
+                reason = ffmpeg_error(log) or f"return code {code}"
+                report(f"Stream copy not possible ({reason}), re-encoding")
+        elif mode != "reencode":
+            raise ValueError("mode must be: reencode / copy / timelapse")
+
+        if parallel:
+            audio_codec = profile.audio_args() if profile else "-c:a aac"
+            audio_args = {
+                "adjust": f'-af "{",".join(atempo_filters(speed))}" {audio_codec}',
+                "mute": None,
+                "keep": "-c:a copy",
+            }
+            if audio_mode not in audio_args:
+                raise ValueError("audio_mode must be: adjust / mute / keep")
+            return parallel_encode(
+                video_path,
+                output_path,
+                video_filter,
+                audio_args=audio_args[audio_mode],
+                chunks=chunks,
+                jobs=jobs,
+                timeout=timeout,
+                report=report,
+                profile=profile,
+            )
 
-            while remaining_speed < 0.5:
-                audio_filters.append("atempo=0.5")
-                remaining_speed /= 0.5
+        thread_opts = thread_args()
+        cmd = f'{thread_opts}-i "{video_path}" '
 
-            audio_filters.append(f"atempo={remaining_speed}")
-            audio_filter_chain = ",".join(audio_filters)
+        if audio_mode == "adjust":
+            audio_filter_chain = ",".join(atempo_filters(speed))
 
             cmd += f'-vf "{video_filter}" ' f'-af "{audio_filter_chain}" '
+            cmd += encoding_args(profile)
 
         elif audio_mode == "mute":
             cmd += f'-vf "{video_filter}" ' f"-an "
+            cmd += encoding_args(profile, audio=False)
 
         elif audio_mode == "keep":
             cmd += f'-vf "{video_filter}" ' f"-c:a copy "
+            cmd += encoding_args(profile, audio=False)
 
         else:
             raise ValueError("audio_mode must be: adjust / mute / keep")
 
+        cmd += f'{thread_opts}-y "{output_path}"'
+
+        code, log = run_ffmpeg(cmd, timeout)
+        return code, log, output_path
+
+    except Exception as e:
+        return -1, str(e), ""
+
+
+# ---------------- PIPELINES ----------------
+
+
+CHAIN_OPERATIONS = ("clip", "scale", "speed", "reverse")
+
+
+def clip_window(params):
+    """Return (start, end) in seconds for clip params; end may be None."""
+    start = convert_to_seconds(params.get("start") or 0)
+    end = params.get("end")
+    if end is not None:
+        end = convert_to_seconds(end)
+    elif params.get("duration") is not None:
+        end = start + convert_to_seconds(params["duration"])
+    if end is not None and end <= start:
+        raise ValueError(f"Clip end ({end}) must be after start ({start})")
+    return start, end
+
+
+def compile_chain(operations, audio_mode="adjust"):
+    """
+    Compile an ordered list of (name, params) operations into input
+    options, a video filter chain and an audio filter chain.
+
+    Clips at the front of the list become an input seek (-ss/-t), so the
+    skipped part of the source is never decoded. Later clips become
+    trim/atrim filters on the timeline produced by the earlier steps.
+    """
+    input_opts = ""
+    video_filters = []
+    audio_filters = []
+
+    # Fold leading clips into one input window
+    window_start, window_end = 0.0, None
+    index = 0
+    while index < len(operations) and operations[index][0] == "clip":
+        start, end = clip_window(operations[index][1])
+        new_start = window_start + start
+        new_end = window_start + end if end is not None else None
+        if window_end is not None:
+            # A later clip is relative to the earlier one and can't reach
+            # past it into footage that was clipped away
+            if new_start >= window_end:
+                raise ValueError(
+                    f"Clip {index + 1} starts at {start}s, past the end of the "
+                    f"{window_end - window_start:g}s left by the clips before it"
+                )
+            new_end = min(new_end, window_end) if new_end is not None else window_end
+        window_start, window_end = new_start, new_end
+        index += 1
+
+    if window_start:
+        input_opts += f"-ss {window_start} "
+    if window_end is not None:
+        input_opts += f"-t {window_end - window_start} "
+
+    for name, params in operations[index:]:
+        if name == "clip":
+            start, end = clip_window(params)
+            trim = f"start={start}" + (f":end={end}" if end is not None else "")
+            video_filters.append(f"trim={trim},setpts=PTS-STARTPTS")
+            audio_filters.append(f"atrim={trim},asetpts=PTS-STARTPTS")
+        elif name == "scale":
+            width = int(params.get("width", -2))
+            height = int(params.get("height", -2))
+            video_filters.append(f"scale={width}:{height}")
+        elif name == "speed":
+            speed = float(params["speed"])
+            if speed <= 0:
+                raise ValueError("Speed must be > 0")
+            video_filters.append(f"setpts={1/speed}*PTS")
+            audio_filters.extend(atempo_filters(speed))
+        elif name == "reverse":
+            video_filters.append("reverse")
+            audio_filters.append("areverse")
+        else:
+            raise ValueError(
+                f"Unknown operation {name}, expected one of: {', '.join(CHAIN_OPERATIONS)}"
+            )
+
+    if audio_mode not in ("adjust", "mute"):
+        raise ValueError("audio_mode must be: adjust / mute")
+    return input_opts, ",".join(video_filters), ",".join(audio_filters)
+
+
+def chain_video(
+    video_path,
+    operations,
+    output_path=None,
+    audio_mode="adjust",
+    timeout=None,
+    profile=None,
+):
+    """
+    Apply an ordered list of operations in a single FFmpeg decode and
+    encode, instead of writing an intermediate file per step.
+
+    operations is a list of (name, params) tuples, e.g.
+        [("clip", {"start": 10, "duration": 5}),
+         ("scale", {"width": 640, "height": -2}),
+         ("speed", {"speed": 2.0}),
+         ("reverse", {})]
+    """
+    try:
+        if not operations:
+            raise ValueError("No operations given")
+
+        if output_path is None:
+            base, ext = os.path.splitext(video_path)
+            output_path = f"{base}_chain{ext}"
+
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"{video_path} not found")
+
+        input_opts, video_filter, audio_filter = compile_chain(operations, audio_mode)
+
+        thread_opts = thread_args()
+        cmd = f'{input_opts}{thread_opts}-i "{video_path}" '
+        if video_filter:
+            cmd += f'-vf "{video_filter}" '
+        if audio_mode == "mute":
+            cmd += "-an "
+        elif audio_filter:
+            cmd += f'-af "{audio_filter}" '
+        cmd += thread_opts + encoding_args(profile, audio=audio_mode != "mute")
         cmd += f'-y "{output_path}"'
 
         code, log = run_ffmpeg(cmd, timeout)
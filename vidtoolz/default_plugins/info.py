@@ -1,18 +1,80 @@
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.utils import iter_media_files, bounded_map
 import argparse
-from .ffmpegtools import get_video_info
+import csv
+import json
+import os
+import sys
+from .ffmpegtools import get_video_info, probe_video, summarize_video_info
+
+INFO_COLUMNS = (
+    "path",
+    "duration",
+    "width",
+    "height",
+    "codec",
+    "fps",
+    "bitrate",
+    "audio_codec",
+    "size",
+    "format",
+)
+DEFAULT_COLUMNS = "path,duration,width,height,codec,fps,bitrate"
 
 
 @hookimpl
 def register_commands(subparser):
     info_parser = subparser.add_parser("info", description="Get video information")
-    info_parser.add_argument("video_file", help="Path to the video file")
+    info_parser.add_argument(
+        "video_file",
+        nargs="+",
+        help="Video files, glob patterns or directories (searched recursively)",
+    )
+    info_parser.add_argument(
+        "-f",
+        "--format",
+        choices=["raw", "jsonl", "csv"],
+        help="Output format (default: raw for a single file, jsonl otherwise)",
+    )
+    info_parser.add_argument(
+        "-c",
+        "--columns",
+        default=DEFAULT_COLUMNS,
+        help=f"Comma separated fields for jsonl/csv output, from: {','.join(INFO_COLUMNS)}",
+    )
+    info_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(32, (os.cpu_count() or 1) * 2),
+        help="Number of files probed concurrently",
+    )
     info_parser.set_defaults(func=get_video_info_command)
 
 
 def get_video_info_command(args):
+    output_format = args.format
+    if output_format is None:
+        single = len(args.video_file) == 1 and os.path.isfile(args.video_file[0])
+        output_format = "raw" if single else "jsonl"
+
+    if output_format == "raw":
+        for video_file in iter_media_files(args.video_file):
+            print_video_info(video_file)
+        return
+
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in INFO_COLUMNS]
+    if unknown:
+        print(f"Error: Unknown columns: {', '.join(unknown)}")
+        return
+
+    bulk_video_info(args.video_file, columns, output_format, args.jobs)
+
+
+def print_video_info(video_file):
     try:
-        code, log = get_video_info(args.video_file)
+        code, log = get_video_info(video_file)
 
         if code == 0:
             print("Video information:")
@@ -23,6 +85,47 @@ def get_video_info_command(args):
             print(log)
 
     except FileNotFoundError:
-        print(f"Error: Video file {args.video_file} not found.")
+        print(f"Error: Video file {video_file} not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
+
+
+def probe_summary(video_file):
+    summary = summarize_video_info(probe_video(video_file))
+    summary["path"] = video_file
+    return summary
+
+
+def bulk_video_info(sources, columns, output_format, jobs, out=None):
+    """
+    Probe every file in sources concurrently and stream one record per
+    file to out as JSON lines or CSV. Failed files get an "error" field.
+    """
+    out = out or sys.stdout
+    writer = None
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns + ["error"])
+
+    total = failed = 0
+    for video_file, summary, error in bounded_map(
+        probe_summary, iter_media_files(sources), jobs
+    ):
+        total += 1
+        if error is not None:
+            failed += 1
+            summary = {"path": video_file}
+            lines = str(error).strip().splitlines()
+            error = lines[-1] if lines else repr(error)
+
+        if writer:
+            writer.writerow([summary.get(c) for c in columns] + [error or ""])
+        else:
+            record = {c: summary.get(c) for c in columns}
+            if error:
+                record["error"] = error
+            out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    print(f"Probed {total} files, {failed} failed.", file=sys.stderr)
+    return total, failed
@@ -1,6 +1,22 @@
+import os
+
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
 import argparse
-from .ffmpegtools import overlay_video, Position
+from .ffmpegtools import OverlayLayer, overlay_videos, Position
+
+# KEY=VALUE options of --layer and the OverlayLayer field each one sets
+LAYER_KEYS = {
+    "position": "position",
+    "x": "dx",
+    "y": "dy",
+    "scale": "scale",
+    "nscale": "normalized_scale",
+    "start": "start",
+    "duration": "duration",
+    "fade": "fade_duration",
+    "audio": "audio",
+}
 
 
 @hookimpl
@@ -59,9 +75,64 @@ def register_commands(subparser):
         help="Fade-out duration in seconds at the end of overlay (default: 0.5)",
     )
 
+    overlay_parser.add_argument(
+        "-l",
+        "--layer",
+        nargs="+",
+        action="append",
+        default=[],
+        metavar=("FILE", "KEY=VALUE"),
+        help="Another video or image to composite in the same pass. Options: "
+        "position=NAME x=PX y=PX scale=WxH nscale=WxH (fractions of the "
+        "background) start=S duration=S fade=S audio=no. Repeat for more layers",
+    )
+
+    add_encoding_profile_argument(overlay_parser)
     overlay_parser.set_defaults(func=overlay_video_command)
 
 
+def parse_size(value, kind):
+    w, sep, h = value.lower().partition("x")
+    if not sep:
+        raise ValueError(f"Expected WIDTHxHEIGHT, got {value!r}")
+    return kind(w), kind(h)
+
+
+def parse_layer(values):
+    """Turn the FILE KEY=VALUE... of one --layer into an OverlayLayer."""
+    path, options = values[0], values[1:]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Overlay file not found: {path}")
+
+    layer = OverlayLayer(path)
+    for option in options:
+        key, sep, value = option.partition("=")
+        if not sep or key not in LAYER_KEYS:
+            raise ValueError(
+                f"Invalid layer option {option!r}, expected one of "
+                f"{', '.join(f'{k}=...' for k in LAYER_KEYS)}"
+            )
+        if key == "position":
+            if value not in Position.__members__:
+                raise ValueError(
+                    f"Invalid layer position {value!r}, expected one of "
+                    f"{', '.join(Position.__members__)}"
+                )
+            value = Position[value]
+        elif key in ("x", "y"):
+            value = int(value)
+        elif key == "scale":
+            value = parse_size(value, int)
+        elif key == "nscale":
+            value = parse_size(value, float)
+        elif key == "audio":
+            value = value.lower() not in ("0", "no", "false", "off")
+        else:
+            value = float(value)
+        setattr(layer, LAYER_KEYS[key], value)
+    return layer
+
+
 def overlay_video_command(args):
     try:
         position = Position[args.position]
@@ -70,17 +141,25 @@ def overlay_video_command(args):
             tuple(args.normalized_scale) if args.normalized_scale else None
         )
 
-        code, log, output_path = overlay_video(
+        layers = [
+            OverlayLayer(
+                args.overlay_file,
+                position=position,
+                dx=args.dx,
+                dy=args.dy,
+                scale=overlay_scale,
+                normalized_scale=normalized_scale,
+                duration=args.duration,
+                fade_duration=args.fade_duration,
+            )
+        ]
+        layers += [parse_layer(values) for values in args.layer]
+
+        code, log, output_path = overlay_videos(
             args.background_file,
-            args.overlay_file,
+            layers,
             output_path=args.output_file,
-            position=position,
-            dx=args.dx,
-            dy=args.dy,
-            overlay_scale=overlay_scale,
-            normalized_scale=normalized_scale,
-            duration=args.duration,
-            fade_duration=args.fade_duration,
+            profile=args.profile,
         )
 
         if code == 0:
@@ -89,8 +168,11 @@ def overlay_video_command(args):
             print(f"Error creating FFmpeg overlay. Return code: {code}")
             print("FFmpeg output:")
             print(log)
+        return code
 
     except FileNotFoundError as e:
         print(f"Error: {e}")
+        return 1
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
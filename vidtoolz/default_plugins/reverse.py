@@ -1,9 +1,10 @@
 import os
 
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
+from vidtoolz.utils import write_clip
 import argparse
 from .ffmpegtools import reverse_video as ffmpeg_reverse_video
-from moviepy import VideoFileClip, vfx, afx
 
 
 @hookimpl
@@ -18,13 +19,35 @@ def register_commands(subparser):
         action="store_true",
         help="Use MoviePy instead of FFmpeg (slower but may work better for some files)",
     )
+    reverse_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=["auto", "whole", "segmented"],
+        default="auto",
+        help="auto: segment long or high resolution videos (default). "
+        "whole: reverse in one pass, holding every frame in memory. "
+        "segmented: reverse keyframe-aligned chunks and join them",
+    )
+    reverse_parser.add_argument(
+        "--segment-seconds",
+        type=float,
+        help="Chunk length for segmented mode (default: sized to fit in memory)",
+    )
+    reverse_parser.add_argument(
+        "-j", "--jobs", type=int, help="Chunks reversed at the same time"
+    )
+    add_encoding_profile_argument(reverse_parser)
     reverse_parser.set_defaults(func=reverse_video_command)
 
 
 def reverse_video_command(args):
     try:
         if args.use_moviepy:
-            # Use the original MoviePy implementation
+            # Use the original MoviePy implementation. MoviePy (and NumPy,
+            # imageio) is only imported here so that loading the plugin
+            # stays cheap for every other command.
+            from moviepy import VideoFileClip
+
             clip = VideoFileClip(args.input_file)
             new_clip = clip.time_transform(
                 lambda t: clip.duration - t,
@@ -37,14 +60,18 @@ def reverse_video_command(args):
                 base, ext = os.path.splitext(args.input_file)
                 output_path = f"{base}_reversed{ext}"
 
-            new_clip.write_videofile(
-                output_path, codec="libx264", fps=clip.fps, audio_codec="aac"
-            )
+            write_clip(new_clip, output_path, clip.fps, args.profile)
             print(f"Video reversed and saved to {output_path}")
+            return 0
         else:
             # Use the new FFmpeg implementation (default)
             code, log, output_path = ffmpeg_reverse_video(
-                args.input_file, output_path=args.output_file
+                args.input_file,
+                output_path=args.output_file,
+                mode=args.mode,
+                segment_seconds=args.segment_seconds,
+                jobs=args.jobs,
+                profile=args.profile,
             )
 
             if code == 0:
@@ -53,8 +80,11 @@ def reverse_video_command(args):
                 print(f"Error reversing video. Return code: {code}")
                 print("FFmpeg output:")
                 print(log)
+            return code
 
     except FileNotFoundError:
         print(f"Error: Input file {args.input_file} not found.")
+        return 1
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
@@ -1,4 +1,5 @@
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
 import argparse
 from .ffmpegtools import scale_video
 
@@ -18,13 +19,34 @@ def register_commands(subparser):
         default=-2,
         help="Target height (default: -2 for auto)",
     )
+    scale_parser.add_argument(
+        "-p",
+        "--parallel",
+        action="store_true",
+        help="Encode keyframe-aligned chunks concurrently, for multi-core hosts",
+    )
+    scale_parser.add_argument(
+        "--chunks", type=int, help="Number of chunks in parallel mode (default: 2 per worker)"
+    )
+    scale_parser.add_argument(
+        "-j", "--jobs", type=int, help="Chunks encoded at the same time in parallel mode"
+    )
+    add_encoding_profile_argument(scale_parser)
     scale_parser.set_defaults(func=scale_video_command)
 
 
 def scale_video_command(args):
     try:
         code, log, output_path = scale_video(
-            args.input_file, args.width, args.height, output_path=args.output_file
+            args.input_file,
+            args.width,
+            args.height,
+            output_path=args.output_file,
+            parallel=args.parallel or bool(args.chunks or args.jobs),
+            chunks=args.chunks,
+            jobs=args.jobs,
+            report=print,
+            profile=args.profile,
         )
 
         if code == 0:
@@ -33,8 +55,11 @@ def scale_video_command(args):
             print(f"Error scaling video. Return code: {code}")
             print("FFmpeg output:")
             print(log)
+        return code
 
     except FileNotFoundError:
         print(f"Error: Input file {args.input_file} not found.")
+        return 1
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
@@ -0,0 +1,87 @@
+from vidtoolz.hookspecs import hookimpl
+from vidtoolz.resources import plan_workers
+from vidtoolz.utils import bounded_map, iter_media_files
+import argparse
+import json
+import os
+from functools import partial
+from .ffmpegtools import SCENE_THRESHOLD, scene_ranges
+
+
+@hookimpl
+def register_commands(subparser):
+    scenes_parser = subparser.add_parser(
+        "scenes",
+        description="Find scene changes once and keep them in the scene index",
+    )
+    scenes_parser.add_argument(
+        "video_file",
+        nargs="+",
+        help="Video files, glob patterns or directories (searched recursively)",
+    )
+    scenes_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=SCENE_THRESHOLD,
+        help=f"Scene change score (0-1) that starts a new scene (default: {SCENE_THRESHOLD})",
+    )
+    scenes_parser.add_argument(
+        "-f",
+        "--format",
+        choices=["text", "jsonl"],
+        help="Output format (default: text for a single file, jsonl otherwise)",
+    )
+    scenes_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Analyze again even if the index has the file",
+    )
+    scenes_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Videos analyzed concurrently (default: one per 4 available CPUs)",
+    )
+    scenes_parser.set_defaults(func=scenes_command)
+
+
+def print_scenes(video_file, scenes):
+    print(f"{len(scenes)} scenes in {video_file}:")
+    print(f"{'Scene':>5}  {'Start':>9}  {'End':>9}  {'Length':>8}")
+    for number, (start, end) in enumerate(scenes, 1):
+        print(f"{number:>5}  {start:>9.3f}  {end:>9.3f}  {end - start:>8.3f}")
+
+
+def scenes_command(args):
+    output_format = args.format
+    if output_format is None:
+        single = len(args.video_file) == 1 and os.path.isfile(args.video_file[0])
+        output_format = "text" if single else "jsonl"
+
+    workers, threads = plan_workers(args.jobs)
+    failed = 0
+    job = partial(
+        scene_ranges, threshold=args.threshold, refresh=args.refresh, threads=threads
+    )
+    for video_file, scenes, error in bounded_map(
+        job, iter_media_files(args.video_file), workers
+    ):
+        if error is not None:
+            failed += 1
+            lines = str(error).strip().splitlines()
+            error = lines[0] if lines else repr(error)
+
+        if output_format == "jsonl":
+            record = {"path": video_file}
+            if error:
+                record["error"] = error
+            else:
+                record["scenes"] = [[round(s, 3), round(e, 3)] for s, e in scenes]
+            print(json.dumps(record), flush=True)
+        elif error:
+            print(f"Error analyzing {video_file}: {error}")
+        else:
+            print_scenes(video_file, scenes)
+
+    return 1 if failed else 0
@@ -1,4 +1,5 @@
 from vidtoolz.hookspecs import hookimpl
+from vidtoolz.profiles import add_encoding_profile_argument
 import argparse
 from .ffmpegtools import change_video_speed
 
@@ -20,6 +21,37 @@ def register_commands(subparser):
         default="adjust",
         help="Audio handling mode: adjust (default), mute, or keep",
     )
+    speed_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=["reencode", "copy", "timelapse"],
+        default="reencode",
+        help="reencode: retime the video through a filter (default); "
+        "copy: rescale timestamps and stream copy the video, re-encoding "
+        "only when the codec or container can't take it; "
+        "timelapse: for large factors, skip decoding the dropped frames "
+        "(no audio)",
+    )
+    speed_parser.add_argument(
+        "--blend",
+        type=int,
+        help="In timelapse mode, average the source over this many output "
+        "frame intervals into each output frame (1: the interval the frame "
+        "stands for, like a long shutter) for smoother motion",
+    )
+    speed_parser.add_argument(
+        "-p",
+        "--parallel",
+        action="store_true",
+        help="Encode keyframe-aligned chunks concurrently, for multi-core hosts",
+    )
+    speed_parser.add_argument(
+        "--chunks", type=int, help="Number of chunks in parallel mode (default: 2 per worker)"
+    )
+    speed_parser.add_argument(
+        "-j", "--jobs", type=int, help="Chunks encoded at the same time in parallel mode"
+    )
+    add_encoding_profile_argument(speed_parser)
     speed_parser.set_defaults(func=speed_video_command)
 
 
@@ -30,6 +62,13 @@ def speed_video_command(args):
             speed=args.speed,
             audio_mode=args.audio_mode,
             output_path=args.output_file,
+            parallel=args.parallel or bool(args.chunks or args.jobs),
+            chunks=args.chunks,
+            jobs=args.jobs,
+            report=print,
+            profile=args.profile,
+            mode=args.mode,
+            blend=args.blend,
         )
 
         if code == 0:
@@ -38,8 +77,11 @@ def speed_video_command(args):
             print(f"Error changing video speed. Return code: {code}")
             print("FFmpeg output:")
             print(log)
+        return code
 
     except FileNotFoundError:
         print(f"Error: Input file {args.input_file} not found.")
+        return 1
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+        return 1
\ No newline at end of file
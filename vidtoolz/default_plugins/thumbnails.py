@@ -0,0 +1,136 @@
+from vidtoolz.hookspecs import hookimpl
+from vidtoolz.resources import plan_workers
+from vidtoolz.utils import bounded_map, iter_media_files
+import argparse
+import os
+from functools import partial
+from .ffmpegtools import (
+    SCENE_THRESHOLD,
+    THUMBNAIL_MODES,
+    extract_thumbnails,
+    ffmpeg_error,
+)
+
+
+@hookimpl
+def register_commands(subparser):
+    thumbnails_parser = subparser.add_parser(
+        "thumbnails", description="Make contact sheets or thumbnails of videos"
+    )
+    thumbnails_parser.add_argument(
+        "video_file",
+        nargs="+",
+        help="Video files, glob patterns or directories (searched recursively)",
+    )
+    thumbnails_parser.add_argument(
+        "-o",
+        "--output",
+        help="Sheet file (or images directory) for a single video; the output "
+        "directory when there are several (default: next to each video)",
+    )
+    thumbnails_parser.add_argument(
+        "-n", "--count", type=int, default=12, help="Number of frames (default: 12)"
+    )
+    thumbnails_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=THUMBNAIL_MODES,
+        default="even",
+        help="even: evenly spaced frames (default); scene: the first frame "
+        "of scenes spread over the video, from the scene index",
+    )
+    thumbnails_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=SCENE_THRESHOLD,
+        help="Scene change score (0-1) a frame needs in scene mode "
+        f"(default: {SCENE_THRESHOLD})",
+    )
+    thumbnails_parser.add_argument(
+        "-w", "--width", type=int, default=320, help="Thumbnail width (default: 320)"
+    )
+    thumbnails_parser.add_argument(
+        "-c", "--columns", type=int, help="Sheet columns (default: square layout)"
+    )
+    thumbnails_parser.add_argument(
+        "--images",
+        action="store_true",
+        help="Write the frames as individual images instead of a sheet",
+    )
+    thumbnails_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Videos processed concurrently (default: one per 4 available CPUs)",
+    )
+    thumbnails_parser.set_defaults(func=thumbnails_command)
+
+
+def thumbnail_output(video_file, output, sheet, bulk, taken=None):
+    """
+    Output path for video_file; output is a directory in bulk mode. taken
+    is the set of names used so far in that directory: a video whose name
+    is taken, e.g. a/x.mp4 after b/x.mp4, gets x_2, x_3, ...
+    """
+    if not output or not bulk:
+        return output
+    name = os.path.splitext(os.path.basename(video_file))[0]
+    if taken is not None:
+        unique, number = name, 1
+        while unique in taken:
+            number += 1
+            unique = f"{name}_{number}"
+        taken.add(unique)
+        name = unique
+    return os.path.join(output, f"{name}_sheet.jpg" if sheet else f"{name}_thumbs")
+
+
+def thumbnail_jobs(video_files, args, bulk):
+    """Yield (video_file, output path), naming the outputs in input order."""
+    taken = set()
+    for video_file in video_files:
+        yield video_file, thumbnail_output(
+            video_file, args.output, not args.images, bulk, taken
+        )
+
+
+def make_thumbnails(job, args, threads=None):
+    video_file, output_path = job
+    sheet = not args.images
+    return extract_thumbnails(
+        video_file,
+        output_path,
+        count=args.count,
+        mode=args.mode,
+        width=args.width,
+        sheet=sheet,
+        columns=args.columns,
+        threshold=args.threshold,
+        threads=threads,
+    )
+
+
+def thumbnails_command(args):
+    bulk = not (len(args.video_file) == 1 and os.path.isfile(args.video_file[0]))
+    if bulk and args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    workers, threads = plan_workers(args.jobs)
+    succeeded = failed = 0
+    jobs = thumbnail_jobs(iter_media_files(args.video_file), args, bulk)
+    for (video_file, _), result, error in bounded_map(
+        partial(make_thumbnails, args=args, threads=threads), jobs, workers
+    ):
+        if error is None:
+            code, log, output_path = result
+            if code == 0:
+                succeeded += 1
+                print(f"[ok] {video_file} -> {output_path}")
+                continue
+            error = ffmpeg_error(log) or log.strip() or f"return code {code}"
+        failed += 1
+        print(f"[failed] {video_file}: {error}")
+
+    print(f"Thumbnails done: {succeeded} succeeded, {failed} failed")
+    return 1 if failed else 0
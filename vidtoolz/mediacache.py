@@ -0,0 +1,182 @@
+import atexit
+import json
+import os
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from .utils import get_cache_dir
+
+MEDIA_CACHE_FILE = "media.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def file_signature(path):
+    """Return (absolute path, size, mtime in ns) identifying a file's contents."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class MediaCache:
+    """
+    SQLite store of parsed ffprobe results keyed by path, size and mtime.
+    Entries are ignored as soon as the file changes on disk. Hit and miss
+    counts are kept alongside so they survive across runs; lookups only
+    count them in memory, and they are written in one transaction when
+    the process exits (or stats are read), so a hit never writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+        atexit.register(self.flush_stats)
+
+    def connect(self):
+        # Imported here: sqlite3 isn't needed until a command probes a file
+        import sqlite3
+
+        # sqlite connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def count(self, name):
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def flush_stats(self):
+        """Add the hits and misses counted in memory to the stored totals."""
+        import sqlite3
+
+        with self._counts_lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        try:
+            conn = self.connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO stats (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    counts.items(),
+                )
+        except (sqlite3.Error, OSError):
+            # Losing the counters is better than failing at exit
+            pass
+
+    def get(self, video_path, kind="full"):
+        """Return the cached data for video_path, or None on a miss."""
+        try:
+            path, size, mtime = file_signature(video_path)
+        except OSError:
+            return None
+
+        conn = self.connect()
+        row = conn.execute(
+            "SELECT data FROM probes WHERE path = ? AND kind = ? "
+            "AND size = ? AND mtime = ?",
+            (path, kind, size, mtime),
+        ).fetchone()
+        self.count("hits" if row else "misses")
+        return json.loads(row[0]) if row else None
+
+    def put(self, video_path, data, kind="full"):
+        try:
+            path, size, mtime = file_signature(video_path)
+        except OSError:
+            return
+
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO probes (path, kind, size, mtime, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, kind, size, mtime, json.dumps(data)),
+            )
+
+    def stats(self):
+        self.flush_stats()
+        conn = self.connect()
+        counts = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+        }
+
+    def prune(self):
+        """Delete entries whose file is gone or has changed. Returns the count."""
+        conn = self.connect()
+        stale = []
+        for path, size, mtime in conn.execute(
+            "SELECT DISTINCT path, size, mtime FROM probes"
+        ).fetchall():
+            try:
+                _, cur_size, cur_mtime = file_signature(path)
+            except OSError:
+                stale.append((path, size, mtime))
+                continue
+            if (cur_size, cur_mtime) != (size, mtime):
+                stale.append((path, size, mtime))
+
+        removed = 0
+        with conn:
+            for key in stale:
+                removed += conn.execute(
+                    "DELETE FROM probes WHERE path = ? AND size = ? AND mtime = ?",
+                    key,
+                ).rowcount
+        return removed
+
+    def clear(self):
+        with self._counts_lock:
+            self._counts.clear()
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM probes")
+            conn.execute("DELETE FROM stats")
+
+
+class NullCache:
+    """Stand-in used when the media cache is disabled."""
+
+    def get(self, video_path, kind="full"):
+        return None
+
+    def put(self, video_path, data, kind="full"):
+        pass
+
+
+@lru_cache(maxsize=None)
+def open_media_cache(path):
+    return MediaCache(path)
+
+
+def get_media_cache():
+    """
+    Return the shared media cache, or a no-op cache when
+    VIDTOOLZ_NO_MEDIA_CACHE is set.
+    """
+    if os.environ.get("VIDTOOLZ_NO_MEDIA_CACHE"):
+        return NullCache()
+    return open_media_cache(os.path.join(get_cache_dir(), MEDIA_CACHE_FILE))
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# Environment variable naming the JSONL file metrics are appended to
+# ("-" for stderr). The --metrics flag sets it, so it also reaches batch
+# worker processes.
+METRICS_ENV = "VIDTOOLZ_METRICS"
+
+OUTPUT_RE = re.compile(r'-y "([^"]+)"')
+
+
+@dataclass
+class JobMetrics:
+    """Cost of one FFmpeg or FFprobe run."""
+
+    command: str
+    returncode: int
+    wall_seconds: float
+    user_cpu_seconds: Optional[float] = None
+    system_cpu_seconds: Optional[float] = None
+    peak_rss_bytes: Optional[int] = None
+    input_duration: Optional[float] = None
+    output_bytes: Optional[int] = None
+    frames: Optional[int] = None
+    fps: Optional[float] = None
+    realtime_factor: Optional[float] = None
+    ffmpeg_version: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+_sink = None
+_lock = threading.Lock()
+
+
+def set_metrics_sink(sink):
+    """
+    Send metrics to sink, a callable taking a JobMetrics, instead of the
+    VIDTOOLZ_METRICS file. None restores the default.
+    """
+    global _sink
+    _sink = sink
+
+
+def metrics_enabled():
+    return _sink is not None or bool(os.environ.get(METRICS_ENV))
+
+
+def usage_fields(rusage):
+    """CPU times and peak RSS (in bytes) from an os.wait4 resource usage."""
+    if rusage is None:
+        return {}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "user_cpu_seconds": rusage.ru_utime,
+        "system_cpu_seconds": rusage.ru_stime,
+        "peak_rss_bytes": rusage.ru_maxrss * scale,
+    }
+
+
+def output_bytes(command):
+    """Total size of the output files of an FFmpeg command that exist."""
+    sizes = [
+        os.path.getsize(path)
+        for path in OUTPUT_RE.findall(command)
+        if os.path.isfile(path)
+    ]
+    return sum(sizes) if sizes else None
+
+
+def ffmpeg_version():
+    from .utils import load_ffmpeg_state
+
+    state = load_ffmpeg_state() or {}
+    return state.get("version")
+
+
+def record_job(
+    command,
+    returncode,
+    wall_seconds,
+    rusage=None,
+    input_duration=None,
+    progress=None,
+):
+    """
+    Build the metrics for a finished run and send them to the sink. Does
+    nothing when no sink is configured. progress is the last
+    FFmpegProgress report of an FFmpeg run.
+    """
+    if not metrics_enabled():
+        return None
+
+    metrics = JobMetrics(
+        command=command,
+        returncode=returncode,
+        wall_seconds=wall_seconds,
+        input_duration=input_duration,
+        output_bytes=output_bytes(command),
+        ffmpeg_version=ffmpeg_version(),
+        **usage_fields(rusage),
+    )
+    if progress is not None and wall_seconds > 0:
+        metrics.frames = progress.frame
+        if progress.frame is not None:
+            metrics.fps = progress.frame / wall_seconds
+        if progress.out_time is not None:
+            metrics.realtime_factor = progress.out_time / wall_seconds
+
+    emit(metrics)
+    return metrics
+
+
+def emit(metrics):
+    if _sink is not None:
+        _sink(metrics)
+        return
+
+    line = json.dumps(asdict(metrics)) + "\n"
+    path = os.environ.get(METRICS_ENV)
+    with _lock:
+        if path == "-":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            return
+        # One write per record, so lines from concurrent jobs don't mix
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument(
+        "--metrics",
+        help='Append a JSON line of metrics for every FFmpeg/FFprobe run to this file ("-" for stderr)',
+    )
+
+
+def apply_metrics_arguments(args):
+    path = getattr(args, "metrics", None)
+    if path:
+        os.environ[METRICS_ENV] = path if path == "-" else os.path.abspath(path)
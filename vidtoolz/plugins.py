@@ -1,10 +1,16 @@
 import pluggy
+import hashlib
 import importlib
+import json
+import os
 import sys
 from functools import lru_cache
+from importlib import metadata
 from runpy import run_module
 
 from .hookspecs import vidtoolzSpec
+from .profiling import profiler
+from .utils import get_cache_dir, write_json_atomic
 
 DEFAULT_PLUGINS = (
     "vidtoolz.default_plugins.reverse",
@@ -15,38 +21,162 @@ DEFAULT_PLUGINS = (
     "vidtoolz.default_plugins.info",
     "vidtoolz.default_plugins.play",
     "vidtoolz.default_plugins.speed",
+    "vidtoolz.default_plugins.cache",
+    "vidtoolz.default_plugins.chain",
+    "vidtoolz.default_plugins.thumbnails",
+    "vidtoolz.default_plugins.scenes",
 )
 
+ENTRYPOINT_GROUP = "vidtoolz_plugins"
+PLUGIN_INDEX_FILE = "plugin_index.json"
+
 pm = pluggy.PluginManager("vidtoolz")
 pm.add_hookspecs(vidtoolzSpec)
 
+# Plugin name -> {"name": distribution name, "version": version} for plugins
+# registered from entry points.
+plugin_distinfo = {}
+
+
+def plugin_index_path():
+    return os.path.join(get_cache_dir(), PLUGIN_INDEX_FILE)
+
+
+def environment_key():
+    """
+    Fingerprint the installed packages by the modification times of the
+    directories on sys.path. Installing or removing a distribution touches
+    its site-packages directory, which changes the key.
+    """
+    cwd = os.getcwd()
+    digest = hashlib.sha1(sys.executable.encode())
+    for entry in sys.path:
+        if not entry or entry == cwd:
+            continue
+        try:
+            mtime = os.stat(entry).st_mtime_ns
+        except OSError:
+            continue
+        digest.update(f"{entry}\0{mtime}\0".encode())
+    return digest.hexdigest()
+
+
+def build_plugin_index():
+    """Scan installed distributions for vidtoolz entry points and save the index."""
+    entries = []
+    for dist in metadata.distributions():
+        for ep in dist.entry_points:
+            if ep.group != ENTRYPOINT_GROUP:
+                continue
+            entries.append(
+                {
+                    "name": ep.name,
+                    "value": ep.value,
+                    "dist": dist.metadata["name"],
+                    "version": dist.version,
+                }
+            )
+
+    index = {"key": environment_key(), "entries": entries}
+    try:
+        write_json_atomic(plugin_index_path(), index)
+    except OSError:
+        # A read-only cache only costs us the rescan next time
+        pass
+    return entries
+
+
+def read_plugin_index():
+    """Return the saved index entries, or None if missing or stale."""
+    try:
+        with open(plugin_index_path(), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("key") != environment_key():
+        return None
+    return index.get("entries")
+
+
+def invalidate_plugin_index():
+    try:
+        os.remove(plugin_index_path())
+    except OSError:
+        pass
+
+
+def load_entrypoint_plugins(rebuild=False):
+    """
+    Register third-party plugins from the cached entry point index,
+    rebuilding it when the environment changed (or rebuild is set).
+    Plugins that are already registered are skipped, so this can run again
+    after a rebuild. Returns "fresh" or "rebuilt".
+    """
+    with profiler.stage("entry point discovery"):
+        entries = None if rebuild else read_plugin_index()
+        status = "fresh"
+        if entries is None:
+            entries = build_plugin_index()
+            status = "rebuilt"
+
+    for entry in entries:
+        if pm.get_plugin(entry["name"]) or pm.is_blocked(entry["name"]):
+            continue
+        ep = metadata.EntryPoint(
+            name=entry["name"], value=entry["value"], group=ENTRYPOINT_GROUP
+        )
+        try:
+            with profiler.stage(f"import {entry['name']}"):
+                plugin = ep.load()
+        except ImportError as e:
+            print(f"[Plugin Load Error] Could not load {entry['name']}: {e}")
+            continue
+        pm.register(plugin, name=entry["name"])
+        plugin_distinfo[entry["name"]] = {
+            "name": entry["dist"],
+            "version": entry["version"],
+        }
+    return status
+
 
 @lru_cache(maxsize=1)
 def load_plugins():
-    """Load plugins only once using lru_cache instead of a global flag."""
+    """
+    Load plugins only once using lru_cache instead of a global flag.
+    Returns the state of the plugin index ("fresh" or "rebuilt").
+    """
+    status = None
     if not getattr(sys, "_called_from_test", False):
-        pm.load_setuptools_entrypoints("vidtoolz_plugins")
+        status = load_entrypoint_plugins()
         for plugin in DEFAULT_PLUGINS:
             try:
-                mod = importlib.import_module(plugin)
+                with profiler.stage(f"import {plugin}"):
+                    mod = importlib.import_module(plugin)
                 pm.register(mod, plugin)
             except ImportError as e:
                 print(f"[Plugin Load Error] Could not load {plugin}: {e}")
+    return status
 
 
 def get_plugins(args=None):
     plugins = []
+    index_status = None
     if not getattr(sys, "_called_from_test", False):
-        plugin_to_distinfo = dict(pm.list_plugin_distinfo())
+        index_status = load_plugins()
+        if getattr(args, "rebuild_index", False):
+            # Rescan first, then register whatever the old index missed,
+            # so the listing below is already complete
+            index_status = load_entrypoint_plugins(rebuild=True)
         for plugin in pm.get_plugins():
+            plugin_name = pm.get_name(plugin)
             plugin_info = {
                 "name": plugin.__name__,
                 "hooks": [h.name for h in pm.get_hookcallers(plugin)],
             }
-            distinfo = plugin_to_distinfo.get(plugin)
+            distinfo = plugin_distinfo.get(plugin_name)
             if distinfo:
-                plugin_info["version"] = distinfo.version
-                plugin_info["name"] = distinfo.project_name
+                plugin_info["version"] = distinfo["version"]
+                plugin_info["name"] = distinfo["name"]
             plugins.append(plugin_info)
 
     if plugins:
@@ -56,6 +186,9 @@ def get_plugins(args=None):
     else:
         print("No external plugins in environment.")
 
+    if index_status:
+        print(f"Plugin index: {index_status} ({plugin_index_path()})")
+
     return plugins
 
 
@@ -63,6 +196,9 @@ def install_plugin(
     packages, upgrade=False, editable=None, force_reinstall=False, no_cache_dir=False
 ):
     """Install packages from PyPI into the same environment as vidtoolz."""
+    # pip exits the interpreter when it finishes, so drop the index up front;
+    # the next run rescans the new environment.
+    invalidate_plugin_index()
     args = ["pip", "install"]
     if upgrade:
         args.append("--upgrade")
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+from .config import config_section
+
+
+@dataclass
+class EncodingProfile:
+    """Codec, speed and quality settings used when a command re-encodes."""
+
+    name: str
+    video_codec: str = "libx264"
+    preset: Optional[str] = None
+    crf: Optional[int] = None
+    tune: Optional[str] = None
+    pix_fmt: Optional[str] = None
+    audio_codec: str = "aac"
+    audio_bitrate: Optional[str] = None
+    extra_args: str = ""
+
+    def video_args(self):
+        args = [f"-c:v {self.video_codec}"]
+        if self.preset:
+            args.append(f"-preset {self.preset}")
+        if self.crf is not None:
+            args.append(f"-crf {self.crf}")
+        if self.tune:
+            args.append(f"-tune {self.tune}")
+        if self.pix_fmt:
+            args.append(f"-pix_fmt {self.pix_fmt}")
+        if self.extra_args:
+            args.append(self.extra_args)
+        return " ".join(args)
+
+    def audio_args(self):
+        args = [f"-c:a {self.audio_codec}"]
+        if self.audio_bitrate:
+            args.append(f"-b:a {self.audio_bitrate}")
+        return " ".join(args)
+
+    def args(self):
+        return f"{self.video_args()} {self.audio_args()}"
+
+    def moviepy_kwargs(self):
+        """Arguments for MoviePy's write_videofile."""
+        params = []
+        if self.crf is not None:
+            params += ["-crf", str(self.crf)]
+        if self.tune:
+            params += ["-tune", self.tune]
+        if self.pix_fmt:
+            params += ["-pix_fmt", self.pix_fmt]
+        params += self.extra_args.split()
+        kwargs = {
+            "codec": self.video_codec,
+            "audio_codec": self.audio_codec,
+            "ffmpeg_params": params or None,
+        }
+        if self.preset:
+            kwargs["preset"] = self.preset
+        if self.audio_bitrate:
+            kwargs["audio_bitrate"] = self.audio_bitrate
+        return kwargs
+
+
+BUILTIN_PROFILES = {
+    # Proxies and previews: fastest encode and decode, lowest quality
+    "draft": EncodingProfile(
+        name="draft", preset="ultrafast", tune="fastdecode", crf=28, audio_bitrate="96k"
+    ),
+    "balanced": EncodingProfile(
+        name="balanced", preset="medium", crf=23, audio_bitrate="128k"
+    ),
+    # Masters: slow encode, visually lossless
+    "archive": EncodingProfile(
+        name="archive", preset="slow", crf=18, audio_bitrate="192k"
+    ),
+}
+
+
+def available_profiles():
+    """
+    Return all profiles by name: the built-in ones, overridden or extended
+    by the "profiles" section of the config file. A config profile starts
+    from the built-in profile of the same name, or from the one named by
+    its "base" key.
+    """
+    profiles = dict(BUILTIN_PROFILES)
+    known = {f.name for f in fields(EncodingProfile)}
+    for name, settings in config_section("profiles").items():
+        if not isinstance(settings, dict):
+            continue
+        base = profiles.get(settings.get("base", name)) or EncodingProfile(name=name)
+        values = {k: v for k, v in settings.items() if k in known and k != "name"}
+        profiles[name] = replace(base, name=name, **values)
+    return profiles
+
+
+def get_profile(profile):
+    """
+    Resolve a profile name (or an EncodingProfile, or None) to an
+    EncodingProfile or None. Raises ValueError for an unknown name.
+    """
+    if profile is None or isinstance(profile, EncodingProfile):
+        return profile
+    profiles = available_profiles()
+    if profile not in profiles:
+        raise ValueError(
+            f"Unknown profile {profile!r}. Available: {', '.join(sorted(profiles))}"
+        )
+    return profiles[profile]
+
+
+def encoding_args(profile, audio=True):
+    """FFmpeg output options for profile ("" when no profile is selected)."""
+    profile = get_profile(profile)
+    if profile is None:
+        return ""
+    return (profile.args() if audio else profile.video_args()) + " "
+
+
+def add_encoding_profile_argument(parser):
+    parser.add_argument(
+        "--profile",
+        help="Encoding profile: draft, balanced, archive or one from the config file "
+        "(default: FFmpeg's defaults)",
+    )
@@ -0,0 +1,76 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Record wall time and Python memory allocated by each startup stage.
+    Does nothing until enabled, so the stage markers cost nothing on a
+    normal run.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = []
+
+    def enable(self):
+        self.enabled = True
+        self.stages = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start_mem, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            end_mem, peak_mem = tracemalloc.get_traced_memory()
+            self.stages.append(
+                {
+                    "stage": name,
+                    "seconds": elapsed,
+                    "memory_bytes": end_mem - start_mem,
+                    "peak_bytes": peak_mem - start_mem,
+                }
+            )
+
+    def report(self, fmt="table", file=None):
+        file = file or sys.stderr
+        stages = sorted(self.stages, key=lambda s: s["seconds"], reverse=True)
+        total = sum(s["seconds"] for s in self.stages)
+
+        if fmt == "json":
+            json.dump({"total_seconds": total, "stages": stages}, file, indent=2)
+            print(file=file)
+            return
+
+        width = max([len(s["stage"]) for s in stages] + [len("stage")])
+        print(
+            f"{'stage':<{width}}  {'time (ms)':>10}  {'mem (KiB)':>10}  {'peak (KiB)':>10}",
+            file=file,
+        )
+        for s in stages:
+            print(
+                f"{s['stage']:<{width}}  {s['seconds'] * 1000:>10.2f}  "
+                f"{s['memory_bytes'] / 1024:>10.1f}  {s['peak_bytes'] / 1024:>10.1f}",
+                file=file,
+            )
+        print(f"{'total':<{width}}  {total * 1000:>10.2f}", file=file)
+
+
+profiler = StartupProfiler()
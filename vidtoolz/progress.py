@@ -0,0 +1,279 @@
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import config_section
+
+# Environment variable naming a file that receives FFmpeg's full stderr.
+# The --ffmpeg-log flag sets it, so it also reaches batch worker processes.
+FFMPEG_LOG_ENV = "VIDTOOLZ_FFMPEG_LOG"
+
+# Lines of FFmpeg stderr kept in memory for the returned log
+STDERR_TAIL_LINES = 200
+
+# Environment variables for the watchdog settings. The CLI flags set
+# these, so they also reach batch worker processes.
+WATCHDOG_ENV = {
+    "stall_timeout": "VIDTOOLZ_STALL_TIMEOUT",
+    "deadline_factor": "VIDTOOLZ_DEADLINE_FACTOR",
+}
+
+# Seconds without progress before an FFmpeg run is considered hung
+DEFAULT_STALL_TIMEOUT = 120
+
+# Seconds of encoding used to measure the speed the deadline is based on
+DEADLINE_WARMUP = 10
+
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+@dataclass
+class FFmpegProgress:
+    """One progress report from a running FFmpeg process."""
+
+    frame: Optional[int] = None
+    fps: Optional[float] = None
+    speed: Optional[float] = None
+    out_time: Optional[float] = None
+    bitrate: Optional[str] = None
+    total_size: Optional[int] = None
+    duration: Optional[float] = None
+    eta: Optional[float] = None
+    done: bool = False
+
+    @property
+    def fraction(self):
+        if not self.duration or self.out_time is None:
+            return None
+        return min(1.0, max(0.0, self.out_time / self.duration))
+
+
+def number(value, kind=float):
+    try:
+        return kind(str(value).strip().rstrip("x"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProgressParser:
+    """
+    Turn the key=value lines of `ffmpeg -progress` into FFmpegProgress
+    reports. A report is complete at each "progress=" line.
+    """
+
+    def __init__(self, duration=None):
+        self.duration = duration
+        self.values = {}
+
+    def feed(self, line):
+        """Add one line; returns an FFmpegProgress when a block ends."""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        if key != "progress":
+            self.values[key] = value
+            return None
+
+        values, self.values = self.values, {}
+        out_time = number(values.get("out_time_us"), int)
+        out_time = out_time / 1e6 if out_time is not None and out_time >= 0 else None
+        speed = number(values.get("speed"))
+        report = FFmpegProgress(
+            frame=number(values.get("frame"), int),
+            fps=number(values.get("fps")),
+            speed=speed,
+            out_time=out_time,
+            bitrate=values.get("bitrate"),
+            total_size=number(values.get("total_size"), int),
+            duration=self.duration,
+            done=value == "end",
+        )
+        if self.duration and out_time is not None and speed:
+            report.eta = max(0.0, (self.duration - out_time) / speed)
+        return report
+
+
+def parse_duration(line):
+    """Return the seconds of an FFmpeg "Duration: HH:MM:SS.xx" line, or None."""
+    match = DURATION_RE.search(line)
+    if not match:
+        return None
+    h, m, s = match.groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressDisplay:
+    """Progress callback that keeps one status line updated on a terminal."""
+
+    def __init__(self, file=None):
+        self.file = file or sys.stderr
+        self.lock = threading.Lock()
+
+    def __call__(self, progress):
+        fraction = progress.fraction
+        percent = f"{fraction * 100:5.1f}%" if fraction is not None else "   ?  "
+        line = (
+            f"{percent} time={format_seconds(progress.out_time)}"
+            f"/{format_seconds(progress.duration)} "
+            f"frame={progress.frame or 0} fps={progress.fps or 0:.0f} "
+            f"speed={progress.speed or 0:.2f}x bitrate={progress.bitrate or 'N/A'} "
+            f"ETA {format_seconds(progress.eta)}"
+        )
+        with self.lock:
+            self.file.write(f"\r{line}\x1b[K")
+            if progress.done:
+                self.file.write("\n")
+            self.file.flush()
+
+
+class Watchdog:
+    """
+    Decide when a running FFmpeg job should be aborted, from its progress
+    reports rather than a fixed timeout.
+
+    stall_timeout: abort when neither the output (position, size) nor the
+        input side has moved for this many seconds. Filters such as
+        reverse read the whole input before they output a frame, so the
+        caller reports input activity (bytes read, stderr output) with
+        touch().
+    deadline_factor: once DEADLINE_WARMUP seconds of encoding have measured
+        its speed, abort when the job runs longer than deadline_factor
+        times the expected time for the whole input.
+    """
+
+    def __init__(self, stall_timeout=DEFAULT_STALL_TIMEOUT, deadline_factor=None):
+        self.stall_timeout = stall_timeout
+        self.deadline_factor = deadline_factor
+        self.start = self.last_change = time.monotonic()
+        self.position = None
+        self.deadline = None
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Build the watchdog from the "watchdog" section of the config file,
+        overridden by the VIDTOOLZ_* environment variables.
+        """
+        values = dict(config_section("watchdog"))
+        for field, var in WATCHDOG_ENV.items():
+            if os.environ.get(var):
+                values[field] = os.environ[var]
+
+        defaults = {"stall_timeout": DEFAULT_STALL_TIMEOUT, "deadline_factor": 0}
+        settings = {}
+        for field, var in WATCHDOG_ENV.items():
+            value = values.get(field)
+            if value in (None, ""):
+                value = defaults[field]
+            setting = number(value)
+            if setting is None or not setting >= 0:
+                source = var if os.environ.get(var) else f"[watchdog] {field}"
+                raise ValueError(
+                    f"{source} must be a number >= 0 (0 disables), got {value!r}"
+                )
+            settings[field] = setting or None
+        return cls(**settings)
+
+    def touch(self):
+        """Note activity that isn't visible in the progress reports."""
+        self.last_change = time.monotonic()
+
+    def update(self, progress):
+        now = time.monotonic()
+        position = (progress.frame, progress.out_time, progress.total_size)
+        if position != self.position:
+            self.position = position
+            self.last_change = now
+
+        elapsed = now - self.start
+        if (
+            self.deadline_factor
+            and self.deadline is None
+            and progress.duration
+            and progress.out_time
+            and elapsed >= DEADLINE_WARMUP
+        ):
+            expected = progress.duration / (progress.out_time / elapsed)
+            self.deadline = self.start + self.deadline_factor * expected
+
+    def check(self):
+        """Return why the job should be aborted, or None."""
+        now = time.monotonic()
+        if self.stall_timeout and now - self.last_change > self.stall_timeout:
+            return f"No progress for {self.stall_timeout:.0f}s"
+        if self.deadline and now > self.deadline:
+            allowed = self.deadline - self.start
+            return (
+                f"Exceeded deadline of {allowed:.0f}s "
+                f"({self.deadline_factor:g}x the expected encode time)"
+            )
+        return None
+
+
+_handler = None
+
+
+def set_progress_handler(handler):
+    """Set the callback run_ffmpeg reports progress to by default (or None)."""
+    global _handler
+    _handler = handler
+
+
+def get_progress_handler():
+    return _handler
+
+
+def add_progress_arguments(parser):
+    group = parser.add_argument_group("progress and logging of FFmpeg jobs")
+    group.add_argument(
+        "--progress",
+        action="store_true",
+        default=None,
+        help="Show FFmpeg progress (default: when stderr is a terminal)",
+    )
+    group.add_argument(
+        "--no-progress",
+        action="store_false",
+        dest="progress",
+        help="Never show FFmpeg progress",
+    )
+    group.add_argument(
+        "--stall-timeout",
+        type=float,
+        help="Abort FFmpeg after this many seconds without progress "
+        f"(default: {DEFAULT_STALL_TIMEOUT}, 0 disables)",
+    )
+    group.add_argument(
+        "--deadline-factor",
+        type=float,
+        help="Abort FFmpeg when it runs longer than this many times the "
+        "encode time expected from the input duration and measured speed",
+    )
+    group.add_argument(
+        "--ffmpeg-log",
+        help="Append the full stderr of every FFmpeg run to this file",
+    )
+
+
+def apply_progress_arguments(args):
+    show = getattr(args, "progress", None)
+    if show is None:
+        show = sys.stderr.isatty()
+    set_progress_handler(ProgressDisplay() if show else None)
+    for field, var in WATCHDOG_ENV.items():
+        value = getattr(args, field, None)
+        if value is not None:
+            os.environ[var] = str(value)
+    if getattr(args, "ffmpeg_log", None):
+        os.environ[FFMPEG_LOG_ENV] = os.path.abspath(args.ffmpeg_log)
@@ -0,0 +1,215 @@
+import os
+import shlex
+import shutil
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+
+from .config import config_section
+from .utils import available_cpus
+
+# Environment variables for each policy field. The CLI flags set these,
+# so they also reach batch worker processes.
+RESOURCE_ENV = {
+    "threads": "VIDTOOLZ_FFMPEG_THREADS",
+    "cpus": "VIDTOOLZ_CPUS",
+    "nice": "VIDTOOLZ_NICE",
+    "ionice": "VIDTOOLZ_IONICE",
+    "memory_limit": "VIDTOOLZ_MEMORY_LIMIT",
+}
+
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+MEMORY_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_cpus(value):
+    """Parse a CPU list such as "0-3,6" into [0, 1, 2, 3, 6]."""
+    if isinstance(value, (list, tuple)):
+        return sorted({int(c) for c in value})
+    cpus = set()
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def parse_memory(value):
+    """Parse a size such as "4G", "512M" or a byte count into bytes."""
+    text = str(value).strip().upper().rstrip("B")
+    if text and text[-1] in MEMORY_UNITS:
+        return int(float(text[:-1]) * MEMORY_UNITS[text[-1]])
+    return int(text)
+
+
+def parse_ionice(value):
+    """Parse "idle", "best-effort:7" or "2:7" into (class, level)."""
+    name, _, level = str(value).partition(":")
+    name = name.strip().lower()
+    io_class = IONICE_CLASSES.get(name) or int(name)
+    if io_class not in IONICE_CLASSES.values():
+        raise ValueError(f"Unknown ionice class: {value}")
+    return io_class, int(level) if level else None
+
+
+@lru_cache(maxsize=None)
+def has_tool(name):
+    return shutil.which(name) is not None
+
+
+def format_memory(size):
+    for unit in ("T", "G", "M", "K"):
+        if size >= MEMORY_UNITS[unit]:
+            return f"{size / MEMORY_UNITS[unit]:.1f}{unit}"
+    return str(size)
+
+
+@dataclass
+class ResourcePolicy:
+    """Limits applied to every FFmpeg/FFprobe child process."""
+
+    threads: Optional[int] = None
+    cpus: Optional[List[int]] = None
+    nice: Optional[int] = None
+    ionice: Optional[str] = None
+    memory_limit: Optional[int] = None
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Build the policy from the "resources" section of the config file,
+        overridden by the VIDTOOLZ_* environment variables.
+        """
+        values = dict(config_section("resources"))
+        for field, var in RESOURCE_ENV.items():
+            if os.environ.get(var):
+                values[field] = os.environ[var]
+
+        policy = cls()
+        if values.get("threads"):
+            policy.threads = int(values["threads"])
+        if values.get("cpus") not in (None, ""):
+            policy.cpus = parse_cpus(values["cpus"])
+        if values.get("nice") not in (None, ""):
+            policy.nice = int(values["nice"])
+        if values.get("ionice"):
+            parse_ionice(values["ionice"])
+            policy.ionice = str(values["ionice"])
+        if values.get("memory_limit"):
+            policy.memory_limit = parse_memory(values["memory_limit"])
+        return policy
+
+    def is_empty(self):
+        return not any(
+            v is not None
+            for v in (self.threads, self.cpus, self.nice, self.ionice, self.memory_limit)
+        )
+
+    def describe(self):
+        parts = []
+        if self.threads:
+            parts.append(f"threads={self.threads}")
+        if self.cpus:
+            parts.append(f"cpus={','.join(map(str, self.cpus))}")
+        if self.nice is not None:
+            parts.append(f"nice={self.nice}")
+        if self.ionice:
+            parts.append(f"ionice={self.ionice}")
+        if self.memory_limit:
+            parts.append(f"memory={format_memory(self.memory_limit)}")
+        return " ".join(parts) or "none"
+
+    def wrap_command(self, command):
+        """
+        Wrap a shell command so the limits hold from its first instruction:
+        the shell's ulimit sets the memory limit, and nice, taskset and
+        ionice start a shell that runs the command. Limits whose tool is
+        not installed are left to apply_to. Only done on POSIX.
+        """
+        if os.name != "posix":
+            return command
+        tools = []
+        if self.nice and has_tool("nice"):
+            tools.append(f"nice -n {self.nice}")
+        if self.cpus and has_tool("taskset"):
+            tools.append(f"taskset -c {','.join(map(str, self.cpus))}")
+        if self.ionice and has_tool("ionice"):
+            io_class, level = parse_ionice(self.ionice)
+            tool = f"ionice -c {io_class}"
+            if level is not None and io_class != IONICE_CLASSES["idle"]:
+                tool += f" -n {level}"
+            tools.append(tool)
+        if tools:
+            command = f"exec {' '.join(tools)} /bin/sh -c {shlex.quote(command)}"
+        if self.memory_limit:
+            command = f"ulimit -v {self.memory_limit // 1024} && {command}"
+        return command
+
+    def apply_to(self, pid):
+        """
+        Apply the niceness and affinity that wrap_command had no tool for
+        to a process that is already running. Best effort: threads it
+        started before this call keep their old settings.
+        """
+        if os.name != "posix":
+            return
+        try:
+            if self.nice and not has_tool("nice"):
+                niceness = os.getpriority(os.PRIO_PROCESS, pid) + self.nice
+                os.setpriority(os.PRIO_PROCESS, pid, min(niceness, 19))
+            if (
+                self.cpus
+                and not has_tool("taskset")
+                and hasattr(os, "sched_setaffinity")
+            ):
+                os.sched_setaffinity(pid, self.cpus)
+        except ProcessLookupError:
+            # Already finished
+            pass
+
+
+def current_policy():
+    return ResourcePolicy.from_environment()
+
+
+def plan_workers(jobs=None, cpus=None, max_threads=None):
+    """
+    Return (jobs, threads per job) so that jobs * threads does not exceed
+    the CPUs available to this process (or pinned by the resource policy).
+    """
+    if not cpus:
+        policy = current_policy()
+        cpus = len(policy.cpus) if policy.cpus else available_cpus()
+        max_threads = max_threads or policy.threads
+    if not jobs:
+        # Give every FFmpeg process a handful of threads to work with
+        jobs = max(1, cpus // 4)
+    jobs = max(1, min(jobs, cpus))
+    threads = max(1, cpus // jobs)
+    if max_threads:
+        threads = min(threads, max_threads)
+    return jobs, threads
+
+
+def add_resource_arguments(parser):
+    group = parser.add_argument_group("resource limits for FFmpeg jobs")
+    group.add_argument("--threads", type=int, help="Threads per FFmpeg process")
+    group.add_argument("--cpus", help='CPUs FFmpeg may run on, e.g. "0-3,6"')
+    group.add_argument("--nice", type=int, help="Niceness increment for FFmpeg")
+    group.add_argument(
+        "--ionice", help='IO priority: "idle", "best-effort:N" or "realtime:N"'
+    )
+    group.add_argument(
+        "--memory-limit", help='Address space limit per FFmpeg process, e.g. "4G"'
+    )
+
+
+def apply_resource_arguments(args):
+    """Export resource flags given on the command line as VIDTOOLZ_* variables."""
+    for field, var in RESOURCE_ENV.items():
+        value = getattr(args, field, None)
+        if value is not None:
+            os.environ[var] = str(value)
@@ -1,23 +1,124 @@
+import glob
+import json
 import os
+import shutil
 import sys
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from itertools import islice
+
+from .profiles import get_profile
+
+
+def get_cache_dir():
+    """
+    Return the directory vidtoolz keeps its on-disk caches in, creating it
+    if needed. Honours VIDTOOLZ_CACHE_DIR, then XDG_CACHE_HOME.
+    """
+    path = os.environ.get("VIDTOOLZ_CACHE_DIR")
+    if not path:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        path = os.path.join(base, "vidtoolz")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to path, replacing any existing file atomically."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+FFMPEG_STATE_FILE = "ffmpeg.json"
+
+
+def ffmpeg_state_path():
+    return os.path.join(get_cache_dir(), FFMPEG_STATE_FILE)
+
+
+def binary_info(name):
+    path = shutil.which(name)
+    if path is None:
+        return None
+    return {"path": path, "mtime": os.stat(path).st_mtime_ns}
+
+
+def add_binary_dir_to_path(path):
+    bin_dir = os.path.dirname(path)
+    if bin_dir not in os.environ.get("PATH", "").split(os.pathsep):
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+
+def load_ffmpeg_state():
+    """
+    Return the cached ffmpeg state if the ffmpeg and ffprobe binaries are
+    still the ones it was recorded for, else None.
+    """
+    try:
+        with open(ffmpeg_state_path(), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    ffmpeg = state.get("ffmpeg") or {}
+    # static-ffmpeg binaries are only on PATH once added, so put them back
+    if shutil.which("ffmpeg") is None and os.path.exists(ffmpeg.get("path", "")):
+        add_binary_dir_to_path(ffmpeg["path"])
+
+    for name in ("ffmpeg", "ffprobe"):
+        try:
+            if binary_info(name) != state.get(name):
+                return None
+        except OSError:
+            return None
+    return state
+
+
+def save_ffmpeg_state(state):
+    try:
+        write_json_atomic(ffmpeg_state_path(), state)
+    except OSError:
+        # A read-only cache only costs us the probe next time
+        pass
+
+
+def probe_ffmpeg():
+    result = subprocess.run(
+        ["ffmpeg", "-version"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    )
+    first_line = (result.stdout.splitlines() or [""])[0].split()
+    return {
+        "ffmpeg": binary_info("ffmpeg"),
+        "ffprobe": binary_info("ffprobe"),
+        "version": first_line[2] if len(first_line) > 2 else "unknown",
+        "capabilities": {},
+    }
 
 
 # Ensure FFmpeg is available, either from system or via static-ffmpeg
 def ensure_ffmpeg_available():
     """
     Ensure FFmpeg is available by checking if it's in the system path,
-    and if not, use static-ffmpeg as a fallback.
+    and if not, use static-ffmpeg as a fallback. The result is cached in
+    the vidtoolz cache directory against the path and mtime of the
+    binaries, so the check only spawns ffmpeg when they change.
     """
+    if load_ffmpeg_state() is not None:
+        return True
+
     try:
         # Check if ffmpeg is already available in the system
-        subprocess.run(
-            ["ffmpeg", "-version"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True,
-        )
-        return True
+        state = probe_ffmpeg()
     except (subprocess.CalledProcessError, FileNotFoundError):
         try:
             # Try to use static-ffmpeg as fallback
@@ -26,18 +127,172 @@ def ensure_ffmpeg_available():
             static_ffmpeg.add_paths()
 
             # Verify it worked
-            subprocess.run(
-                ["ffmpeg", "-version"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True,
-            )
-            return True
+            state = probe_ffmpeg()
         except Exception as e:
             sys.exit(
                 f"Error: FFmpeg is not available and static-ffmpeg fallback failed: {e}"
             )
 
+    save_ffmpeg_state(state)
+    return True
+
+
+def parse_ffmpeg_list(kind, output):
+    """Parse the names out of ``ffmpeg -encoders``, ``-filters`` or ``-muxers``."""
+    names = set()
+    # Encoders and muxers list their entries after a line of dashes
+    started = kind == "filters"
+    for line in output.splitlines():
+        parts = line.split()
+        if not started:
+            started = bool(parts) and set(parts[0]) == {"-"}
+            continue
+        if len(parts) < 2:
+            continue
+        if kind == "filters" and (len(parts) < 3 or "->" not in parts[2]):
+            continue
+        names.update(parts[1].split(","))
+    return names
+
+
+@lru_cache(maxsize=None)
+def get_ffmpeg_capabilities(kind):
+    """
+    Return the names ffmpeg supports for kind ("encoders", "filters" or
+    "muxers"). Probed once per ffmpeg binary and kept in the state cache.
+    """
+    state = load_ffmpeg_state()
+    if state is None:
+        ensure_ffmpeg_available()
+        state = load_ffmpeg_state() or {}
+
+    capabilities = state.setdefault("capabilities", {})
+    if kind not in capabilities:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", f"-{kind}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        capabilities[kind] = sorted(parse_ffmpeg_list(kind, result.stdout))
+        save_ffmpeg_state(state)
+    return frozenset(capabilities[kind])
+
+
+def has_encoder(name):
+    return name in get_ffmpeg_capabilities("encoders")
+
+
+def has_filter(name):
+    return name in get_ffmpeg_capabilities("filters")
+
+
+def has_muxer(name):
+    return name in get_ffmpeg_capabilities("muxers")
+
+
+VIDEO_EXTENSIONS = (
+    ".mp4",
+    ".mov",
+    ".mkv",
+    ".avi",
+    ".webm",
+    ".m4v",
+    ".mts",
+    ".m2ts",
+    ".ts",
+    ".wmv",
+    ".flv",
+    ".mpg",
+    ".mpeg",
+)
+
+
+def iter_media_files(sources, extensions=VIDEO_EXTENSIONS):
+    """
+    Yield file paths from a mix of files, glob patterns and directories.
+    Directories are walked recursively and filtered by extension. Paths
+    are produced lazily, so huge trees are never held in memory.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(source):
+            for path in glob.iglob(source, recursive=True):
+                if os.path.isdir(path):
+                    yield from iter_media_files([path], extensions)
+                else:
+                    yield path
+        else:
+            yield source
+
+
+def cgroup_cpu_limit():
+    """Return the CPU quota of this process's cgroup (v2 or v1), or None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return float(quota) / float(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus():
+    """
+    Number of CPUs this process may actually use, honouring CPU affinity
+    and container (cgroup) quotas.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    limit = cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, max(1, int(limit)))
+    return max(1, cpus)
+
+
+def bounded_map(func, items, workers, executor=ThreadPoolExecutor):
+    """
+    Apply func to each item on a pool of workers (threads by default) and
+    yield (item, result, error) tuples as they complete. At most
+    2 * workers items are in flight, so memory stays flat for any number
+    of inputs.
+    """
+    workers = max(1, int(workers))
+    items = iter(items)
+    with executor(max_workers=workers) as pool:
+        pending = {pool.submit(func, item): item for item in islice(items, 2 * workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+            for item in islice(items, len(done)):
+                pending[pool.submit(func, item)] = item
+
 
 def determine_output_path(input_file, output_file, suffix):
     input_dir, input_filename = os.path.split(input_file)
@@ -52,17 +307,26 @@ def determine_output_path(input_file, output_file, suffix):
         return os.path.join(input_dir, f"{name}_{suffix}.mp4")
 
 
-def write_clip(video_with_text, output_video_path, fps):
+def write_clip(video_with_text, output_video_path, fps, profile=None):
+    """
+    Write a MoviePy clip with libx264/aac, or with the settings of an
+    encoding profile (a name or vidtoolz.profiles.EncodingProfile). The
+    temporary audio file goes to a private directory, not the current one.
+    """
+    profile = get_profile(profile)
+    options = {"codec": "libx264", "audio_codec": "aac"}
+    if profile is not None:
+        options = profile.moviepy_kwargs()
     try:
         # Write the result to a file
-        video_with_text.write_videofile(
-            output_video_path,
-            codec="libx264",
-            fps=fps,
-            audio_codec="aac",
-            temp_audiofile="temp_audio.m4a",
-            remove_temp=True,
-        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            video_with_text.write_videofile(
+                output_video_path,
+                fps=fps,
+                temp_audiofile=os.path.join(tmpdir, "temp_audio.m4a"),
+                remove_temp=True,
+                **options,
+            )
     except Exception as e:
         sys.exit("Error writing video file: " + str(e))
     video_with_text.close()